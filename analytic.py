@@ -0,0 +1,249 @@
+"""解析解を持つ宇宙モデルの登録と評価を行うモジュール．
+
+初期条件 Y(0) = 1, dY/dX(0) = 1 のもとで，フリードマン方程式
+Y'' = -sigma_0/Y^2 + (sigma_0 - q_0)Y が初等関数で解ける場合を扱う．
+"""
+import numpy as np
+
+# 解析解の戻り値で時間座標Xを標本化する点の数
+DEFAULT_NUM_SAMPLES = 201
+
+
+class AnalyticResult:
+    """
+    解析的に得られた解をsolve_ivpの戻り値と同じ形で保持するクラス
+    """
+
+    def __init__(self, name, solution_function, time_direction, domain,
+                 num_samples=DEFAULT_NUM_SAMPLES):
+        """
+        コンストラクタ
+        Args:
+            name: 解の名前
+            solution_function: 時間座標Xの配列から (Y, dY_dX) を返す関数
+            time_direction: 時間方向を表すタプル (t0, t1)
+            domain: 解が定義される時間座標の範囲 (X_min, X_max)．端は特異点
+            num_samples: 時間座標Xを標本化する点の数
+        """
+        t0, t1 = float(time_direction[0]), float(time_direction[1])
+        t_end = float(np.clip(t1, domain[0], domain[1]))
+        self.name = name
+        self.solution_function = solution_function
+        self.t = np.linspace(t0, t_end, num_samples)
+        self.y = self.sol(self.t)
+        self.nfev = 0
+        self.njev = 0
+        self.nlu = 0
+        self.t_events = None
+        self.y_events = None
+        self.success = True
+        # 積分区間の終点が定義域の端（特異点）にちょうど一致する場合（Milne宇宙の X = -1 など）も
+        # 特異点に到達したものとする
+        if t_end != t1 or t_end in (float(domain[0]), float(domain[1])):
+            self.status = 1
+            self.message = '{}: 特異点 X = {:.6g} に到達しました。'.format(name, t_end)
+        else:
+            self.status = 0
+            self.message = '{}: 計算が完了しました。'.format(name)
+
+    def sol(self, t):
+        """
+        密な出力：任意の時間座標Xにおける [Y, dY_dX] を返すメソッド
+        Args:
+            t: 時間座標X（スカラーまたは配列）
+
+        Returns:
+            np.array: [Y, dY_dX]（tが配列の場合は形状 (2, len(t))）
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale_factor, derivative = self.solution_function(np.asarray(t, dtype=float))
+        return np.array([scale_factor, derivative])
+
+
+def _eta_minus_sin(eta):
+    """η - sin(η) を桁落ちなく計算する関数"""
+    eta = np.asarray(eta, dtype=float)
+    small = np.abs(eta) < 0.1
+    eta2 = eta**2
+    series = eta**3 / 6 * (1 - eta2 / 20 * (1 - eta2 / 42 * (1 - eta2 / 72)))
+    return np.where(small, series, eta - np.sin(eta))
+
+
+def _sinh_minus_eta(eta):
+    """sinh(η) - η を桁落ちなく計算する関数"""
+    eta = np.asarray(eta, dtype=float)
+    small = np.abs(eta) < 0.1
+    eta2 = eta**2
+    series = eta**3 / 6 * (1 + eta2 / 20 * (1 + eta2 / 42 * (1 + eta2 / 72)))
+    return np.where(small, series, np.sinh(eta) - eta)
+
+
+def _invert_monotonic(function, target, upper, iterations=64):
+    """
+    単調増加関数 function(η) = target を [0, upper] の範囲で二分法により解く関数
+    """
+    lower = np.zeros_like(target)
+    upper = np.broadcast_to(upper, target.shape).astype(float)
+    for _ in range(iterations):
+        middle = 0.5 * (lower + upper)
+        below = function(middle) < target
+        lower = np.where(below, middle, lower)
+        upper = np.where(below, upper, middle)
+    return 0.5 * (lower + upper)
+
+
+def vacuum_solution(sigma_0, q_0):
+    """
+    物質を含まない (sigma_0 = 0) 宇宙の解．Milne宇宙とde Sitter宇宙を含む
+    Y'' = -q_0 Y の線形方程式となるため，指数関数・三角関数で表せる
+
+    Returns:
+        tuple: (X → (Y, dY_dX) の関数, 定義域 (X_min, X_max))
+    """
+    if q_0 == 0.0:
+        # Milne宇宙：Y = 1 + X
+        def solution(time):
+            return 1.0 + time, np.ones_like(time)
+        return solution, (-1.0, np.inf)
+    if q_0 == -1.0:
+        # de Sitter宇宙：Y = exp(X)
+        def solution(time):
+            exponential = np.exp(time)
+            return exponential, exponential
+        return solution, (-np.inf, np.inf)
+    if q_0 < 0.0:
+        omega = np.sqrt(-q_0)
+
+        def solution(time):
+            return (np.cosh(omega * time) + np.sinh(omega * time) / omega,
+                    omega * np.sinh(omega * time) + np.cosh(omega * time))
+        # omega < 1 の場合は過去の tanh(omega X) = -omega で Y = 0 となる
+        start = -np.arctanh(omega) / omega if omega < 1.0 else -np.inf
+        return solution, (start, np.inf)
+    omega = np.sqrt(q_0)
+
+    def solution(time):
+        return (np.cos(omega * time) + np.sin(omega * time) / omega,
+                -omega * np.sin(omega * time) + np.cos(omega * time))
+    # tan(omega X) = -omega となる前後の点で Y = 0 となる
+    return solution, (-np.arctan(omega) / omega, (np.pi - np.arctan(omega)) / omega)
+
+
+def einstein_de_sitter_solution(sigma_0, q_0):
+    """
+    Einstein-de Sitter宇宙 (sigma_0 = q_0 = 1/2) の解：Y = (1 + 3X/2)^(2/3)
+
+    Returns:
+        tuple: (X → (Y, dY_dX) の関数, 定義域 (X_min, X_max))
+    """
+    def solution(time):
+        base = 1.0 + 1.5 * time
+        return np.cbrt(base)**2, 1.0 / np.cbrt(base)
+    return solution, (-2.0 / 3.0, np.inf)
+
+
+def dust_solution(sigma_0, q_0):
+    """
+    宇宙項のない (sigma_0 = q_0) 物質優勢宇宙の解
+    第一積分 Y'^2 = 2 sigma_0/Y - k から，sigma_0 > 1/2 の閉じた宇宙ではサイクロイド解，
+    sigma_0 < 1/2 の開いた宇宙では双曲線関数による解をパラメーター表示で求める
+
+    Returns:
+        tuple: (X → (Y, dY_dX) の関数, 定義域 (X_min, X_max))
+    """
+    k = abs(2.0 * sigma_0 - 1.0)
+    length = sigma_0 / k
+    duration = sigma_0 / k**1.5
+    closed = sigma_0 > 0.5
+    if closed:
+        # Y = (sigma_0/k)(1 - cos η), X - X_b = (sigma_0/k^1.5)(η - sin η)
+        eta_0 = 2.0 * np.arcsin(np.sqrt(k / sigma_0 / 2.0))
+        big_bang_time = -duration * _eta_minus_sin(eta_0)
+        domain = (big_bang_time, big_bang_time + 2.0 * np.pi * duration)
+        mean_anomaly, upper = _eta_minus_sin, 2.0 * np.pi
+    else:
+        # Y = (sigma_0/k)(cosh η - 1), X - X_b = (sigma_0/k^1.5)(sinh η - η)
+        eta_0 = 2.0 * np.arcsinh(np.sqrt(k / sigma_0 / 2.0))
+        big_bang_time = -duration * _sinh_minus_eta(eta_0)
+        domain = (big_bang_time, np.inf)
+        mean_anomaly, upper = _sinh_minus_eta, None
+
+    def solution(time):
+        time = np.asarray(time, dtype=float)
+        target = np.clip((time - big_bang_time) / duration, 0.0, None)
+        if closed:
+            target = np.minimum(target, 2.0 * np.pi)
+            eta = _invert_monotonic(mean_anomaly, target, upper)
+            half_angle = np.sin(eta / 2.0)
+            derivative = np.sqrt(k) / np.tan(eta / 2.0)
+        else:
+            eta = _invert_monotonic(mean_anomaly, target, np.arcsinh(2.0 * target) + 3.0)
+            half_angle = np.sinh(eta / 2.0)
+            derivative = np.sqrt(k) / np.tanh(eta / 2.0)
+        return 2.0 * length * half_angle**2, derivative
+    return solution, domain
+
+
+# 解析解の登録表：(名前, 判定関数, 特殊値に寄せたパラメーターを返す関数, 解を作る関数)
+# 判定関数は許容誤差 tol の範囲で特殊な場合に一致するかを返す．上から順に照合する
+ANALYTIC_SOLUTIONS = [
+    ('Milne',
+     lambda sigma_0, q_0, tol: abs(sigma_0) <= tol and abs(q_0) <= tol,
+     lambda sigma_0, q_0: (0.0, 0.0),
+     vacuum_solution),
+    ('deSitter',
+     lambda sigma_0, q_0, tol: abs(sigma_0) <= tol and abs(q_0 + 1.0) <= tol,
+     lambda sigma_0, q_0: (0.0, -1.0),
+     vacuum_solution),
+    ('vacuum',
+     lambda sigma_0, q_0, tol: abs(sigma_0) <= tol,
+     lambda sigma_0, q_0: (0.0, q_0),
+     vacuum_solution),
+    ('Einstein-deSitter',
+     lambda sigma_0, q_0, tol: abs(sigma_0 - 0.5) <= tol and abs(q_0 - 0.5) <= tol,
+     lambda sigma_0, q_0: (0.5, 0.5),
+     einstein_de_sitter_solution),
+    ('dust',
+     lambda sigma_0, q_0, tol: sigma_0 > tol and abs(sigma_0 - q_0) <= tol,
+     lambda sigma_0, q_0: (sigma_0, sigma_0),
+     dust_solution),
+]
+
+
+def find_analytic_solution(sigma_0, q_0, tolerance=1e-10):
+    """
+    パラメーターが解析解を持つ場合に一致するかを登録表から探す関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        tolerance: 特殊な場合とみなすパラメーターの許容誤差
+
+    Returns:
+        tuple or None: 一致した場合は (名前, X → (Y, dY_dX) の関数, 定義域)，一致しない場合はNone
+    """
+    for name, matches, snap, builder in ANALYTIC_SOLUTIONS:
+        if matches(sigma_0, q_0, tolerance):
+            solution, domain = builder(*snap(sigma_0, q_0))
+            return name, solution, domain
+    return None
+
+
+def solve_analytic(sigma_0, q_0, time_direction, tolerance=1e-10,
+                   num_samples=DEFAULT_NUM_SAMPLES):
+    """
+    解析解があればsolve_ivpと同じ形の結果を返す関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        time_direction: 時間方向を表すタプル (t0, t1)
+        tolerance: 特殊な場合とみなすパラメーターの許容誤差
+        num_samples: 時間座標Xを標本化する点の数
+
+    Returns:
+        AnalyticResult or None: 解析解の結果．解析解がない場合はNone
+    """
+    found = find_analytic_solution(sigma_0, q_0, tolerance)
+    if found is None:
+        return None
+    name, solution, domain = found
+    return AnalyticResult(name, solution, time_direction, domain, num_samples)
@@ -0,0 +1,333 @@
+"""宇宙の時間発展のアニメーションを書き出すためのモジュール．
+
+時間座標Xが進むにつれて回転面が伸びていく様子を，連番のPNG画像，GIFまたはMP4として
+書き出す．対話的なキャンバスを用いず，matplotlibのFigureとAggだけで描画するため，
+ディスプレイのない計算機でも実行できる．
+フレームは連続した範囲ごとにプロセスプールの各プロセスへ割り当てる．各プロセスは
+figure，座標軸とカラーバーを１組だけ作り，フレームごとに回転面だけを差し替える．
+
+使い方:
+    python animation.py config.ini -s Lemaitre -o animations --format gif
+    python animation.py config.ini -o animations --format png --frames 240 -j 4
+"""
+import argparse
+import configparser
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d import Axes3D
+import numpy as np
+from render import (
+    DEFAULT_POLYGON_BUDGET,
+    plot_surface,
+    set_radial_axes,
+    setup_surface_axes,
+)
+
+# 既定のフレーム数とフレームレート
+DEFAULT_FRAMES = 120
+DEFAULT_FPS = 24
+# 書き出せる形式（pngは連番の画像）
+EXPORT_FORMATS = ("png", "gif", "mp4")
+# 連番の画像のファイル名
+FRAME_PATTERN = "frame_{:05d}.png"
+
+
+class FrameRenderer:
+    """
+    １つの回転面のアニメーションのフレームを描画するクラス
+    座標軸の範囲と色の対応はすべてのフレームで共通とし，回転面だけを差し替える
+    """
+
+    def __init__(self, surface, polygon_budget=DEFAULT_POLYGON_BUDGET, dpi=100):
+        """
+        コンストラクタ
+        Args:
+            surface: 回転面（RevolutionSurfaceまたはMeshSurface）
+            polygon_budget: 多角形の数の上限
+            dpi: 解像度
+        """
+        self.surface = surface.finite_rows()
+        self.time_array, radial = self.surface.profile()
+        self.polygon_budget = polygon_budget
+        self.dpi = dpi
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111, projection=Axes3D.name)
+        setup_surface_axes(self.ax)
+        set_radial_axes(self.ax, self.surface)
+        # 回転面が伸びても座標軸が動かないよう，最後のフレームの範囲に固定する
+        # 描画できる行がない場合は空の座標軸だけを描く
+        limit = max(float(np.max(radial, initial=0.0)), np.finfo(float).tiny)
+        start, end = _time_range(self.time_array)
+        self.ax.set_xlim(-limit, limit)
+        self.ax.set_ylim(-limit, limit)
+        self.ax.set_zlim(start, end)
+        self.norm = Normalize(start, end)
+        self.figure.colorbar(ScalarMappable(norm=self.norm, cmap='Blues'),
+                             ax=self.ax, shrink=0.75)
+        self.artist = None
+
+    def draw(self, end_time):
+        """
+        時間座標Xがend_time以下の部分の回転面を描画するメソッド
+        """
+        rows = np.flatnonzero(self.time_array <= end_time)
+        if len(rows) < 2:
+            # 回転面の描画には少なくとも２行が必要
+            rows = np.sort(np.argsort(self.time_array)[:2])
+        if self.artist is not None:
+            self.artist.remove()
+        # 行が２行未満の回転面ではplot_surfaceはNoneを返す
+        self.artist = plot_surface(self.ax, self.surface.take(rows), self.polygon_budget,
+                                   norm=self.norm)
+        self.ax.set_title(r'$cosmic \ time = {:.3f}$'.format(end_time))
+
+    def save(self, end_time, path):
+        """
+        フレームを描画して画像ファイルに保存するメソッド
+        """
+        self.draw(end_time)
+        self.figure.savefig(path, dpi=self.dpi)
+
+
+def _time_range(time_array):
+    """時間座標Xの最小値と最大値（有限の行がない場合は0と1）"""
+    if len(time_array) == 0:
+        return 0.0, 1.0
+    return float(np.min(time_array)), float(np.max(time_array))
+
+
+def frame_times(surface, frames=DEFAULT_FRAMES):
+    """
+    各フレームで描画する回転面の端の時間座標Xを求める関数
+    Args:
+        surface: 回転面（RevolutionSurfaceまたはMeshSurface）
+        frames: フレーム数
+
+    Returns:
+        np.ndarray: 等間隔に並んだ時間座標X（最後のフレームは回転面全体）
+    """
+    start, end = _time_range(surface.finite_rows().profile()[0])
+    return np.linspace(start, end, frames + 1)[1:]
+
+
+# プロセスプールの各プロセスが保持するFrameRenderer
+_renderer = None
+
+
+def _initialize_worker(surface, polygon_budget, dpi):
+    """プロセスプールの各プロセスで，最初に１度だけfigureを作成する"""
+    global _renderer
+    _renderer = FrameRenderer(surface, polygon_budget, dpi)
+
+
+def _render_frames(tasks):
+    """
+    連続したフレームを描画して保存する（プロセスプールの各プロセスで実行する）
+    Args:
+        tasks: (時間座標X, 保存先のパス) のリスト
+
+    Returns:
+        int: 描画したフレーム数
+    """
+    for end_time, path in tasks:
+        _renderer.save(end_time, path)
+    return len(tasks)
+
+
+def _export_format(output):
+    """出力先のパスの拡張子から形式を決める（拡張子がなければ連番の画像とする）"""
+    extension = os.path.splitext(output)[1].lower().lstrip(".")
+    if extension in ("gif", "mp4"):
+        return extension
+    return "png"
+
+
+def _ffmpeg_path():
+    """ffmpegの実行ファイルのパス．見つからない場合はNone"""
+    return shutil.which(matplotlib.rcParams['animation.ffmpeg_path'])
+
+
+def available_formats():
+    """
+    この環境で書き出せる形式の一覧を返す関数
+    GIFはPillow（matplotlibの依存パッケージ），MP4はffmpegを用いる
+    """
+    formats = ["png"]
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        formats.append("gif")
+    if _ffmpeg_path() is not None:
+        formats.append("mp4")
+    return formats
+
+
+def _encode_gif(frame_paths, output, fps):
+    """連番の画像をGIFにまとめる"""
+    from PIL import Image
+
+    images = [Image.open(path) for path in frame_paths]
+    try:
+        images[0].save(output, save_all=True, append_images=images[1:],
+                       duration=round(1000 / fps), loop=0)
+    finally:
+        for image in images:
+            image.close()
+
+
+def _encode_mp4(frame_directory, output, fps):
+    """連番の画像をffmpegでMP4にまとめる"""
+    subprocess.run([_ffmpeg_path(), "-y", "-loglevel", "error",
+                    "-framerate", str(fps),
+                    "-i", os.path.join(frame_directory, "frame_%05d.png"),
+                    # H.264の幅と高さは偶数でなければならない
+                    "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                    "-pix_fmt", "yuv420p", output], check=True)
+
+
+def export_animation(surface, output, frames=DEFAULT_FRAMES, fps=DEFAULT_FPS, workers=None,
+                     polygon_budget=DEFAULT_POLYGON_BUDGET, dpi=100):
+    """
+    回転面が伸びていくアニメーションを書き出す関数
+    Args:
+        surface: 回転面（RevolutionSurfaceまたはMeshSurface）
+        output: 出力先．拡張子が.gifまたは.mp4の場合は動画，それ以外の場合は
+                連番のPNG画像を書き出すディレクトリ
+        frames: フレーム数
+        fps: 動画のフレームレート
+        workers: プロセス数．1の場合はプロセスプールを使わずに描画する
+        polygon_budget: １フレームの多角形の数の上限
+        dpi: 解像度
+
+    Returns:
+        dict: 出力先，フレーム数，プロセス数，描画と書き出しにかかった時間（秒）と
+              描画のスループット（フレーム毎秒）
+    """
+    export_format = _export_format(output)
+    if export_format not in available_formats():
+        raise ValueError("{}を書き出すためのライブラリが見つかりません（利用可能: {}）".format(
+            export_format, ", ".join(available_formats())))
+    if frames < 1:
+        raise ValueError("フレーム数は1以上を指定してください")
+    workers = min(workers or os.cpu_count() or 1, frames)
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        if export_format == "png":
+            frame_directory = output
+            os.makedirs(frame_directory, exist_ok=True)
+        else:
+            frame_directory = temporary_directory
+        frame_paths = [os.path.join(frame_directory, FRAME_PATTERN.format(index))
+                       for index in range(frames)]
+        tasks = list(zip(frame_times(surface, frames), frame_paths))
+
+        start = time.perf_counter()
+        if workers == 1:
+            _initialize_worker(surface, polygon_budget, dpi)
+            _render_frames(tasks)
+        else:
+            # 各プロセスに連続したフレームをまとめて割り当てる
+            chunks = [list(chunk) for chunk in np.array_split(np.arange(frames), workers)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                     initargs=(surface, polygon_budget, dpi)) as executor:
+                list(executor.map(_render_frames,
+                                  [[tasks[index] for index in chunk] for chunk in chunks]))
+        render_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if export_format == "gif":
+            _encode_gif(frame_paths, output, fps)
+        elif export_format == "mp4":
+            _encode_mp4(frame_directory, output, fps)
+        encode_time = time.perf_counter() - start
+
+    return {"output": output, "format": export_format, "frames": frames, "workers": workers,
+            "render_time": render_time, "encode_time": encode_time,
+            "frames_per_second": frames / render_time}
+
+
+def _output_name(section, export_format):
+    """モデル名から出力先のファイル名（連番の画像の場合はディレクトリ名）を作る"""
+    name = re.sub(r"[^\w.-]", "_", section)
+    return name if export_format == "png" else "{}.{}".format(name, export_format)
+
+
+def parse_arguments(argv=None):
+    """
+    コマンドライン引数を解析する関数
+    """
+    parser = argparse.ArgumentParser(
+        description="宇宙の時間発展のアニメーションをGUIなしで書き出す")
+    parser.add_argument("config", help="設定ファイルのパス")
+    parser.add_argument("-s", "--section", action="append", dest="sections",
+                        help="書き出すモデル名（複数指定可．既定: すべて）")
+    parser.add_argument("-o", "--output-dir", default="animations",
+                        help="出力先のディレクトリ（既定: animations）")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="gif",
+                        help="書き出す形式（既定: gif）")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES,
+                        help="フレーム数（既定: {}）".format(DEFAULT_FRAMES))
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS,
+                        help="動画のフレームレート（既定: {}）".format(DEFAULT_FPS))
+    parser.add_argument("--dpi", type=int, default=100,
+                        help="解像度（既定: 100）")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="プロセス数（既定: CPUの数）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    メイン関数．設定ファイルのモデルを計算し，モデルごとにアニメーションを書き出す
+    """
+    from calculate import (
+        FriedmannEquationIntegrator,
+        friedmann_equation,
+        rotate_coordinates,
+    )
+    from headless import EXIT_USAGE, load_jobs
+    from phase import curvature_and_lambda
+
+    args = parse_arguments(argv)
+    try:
+        jobs = load_jobs([args.config], args.sections)
+    except (FileNotFoundError, configparser.Error, ValueError) as error:
+        print(error, file=sys.stderr)
+        return EXIT_USAGE
+    if args.format not in available_formats():
+        print("{}を書き出すためのライブラリが見つかりません（利用可能: {}）".format(
+            args.format, ", ".join(available_formats())), file=sys.stderr)
+        return EXIT_USAGE
+    os.makedirs(args.output_dir, exist_ok=True)
+    for _, section, sigma_0, q_0 in jobs:
+        K, Lambda = curvature_and_lambda(sigma_0, q_0)
+        instance = FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K, Lambda,
+            sampling="adaptive")
+        result = export_animation(
+            instance.calculate_surface(),
+            os.path.join(args.output_dir, _output_name(section, args.format)),
+            args.frames, args.fps, args.workers, dpi=args.dpi)
+        print("{:<20} {:>5} frames {:>8.2f} s {:>8.1f} frames/s ({} workers) -> {}".format(
+            section, result["frames"], result["render_time"], result["frames_per_second"],
+            result["workers"], result["output"]))
+    return 0
+
+
+"""プログラムの実行"""
+if __name__ == "__main__":
+    sys.exit(main())
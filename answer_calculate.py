@@ -1,6 +1,46 @@
 """フリードマン方程式の数値計算用モジュール．"""
+import os
 import numpy as np
 from scipy.integrate import solve_ivp
+from scipy.optimize import brentq
+from analytic import AnalyticResult, solve_analytic
+from quadrature import first_integral, solve_quadrature
+from regularized import solve_regularized
+from streaming import integrate_streaming
+from surface import MeshSurface, RevolutionSurface, curve_segment_weights
+import timing
+
+# 計算結果に影響する実装を変更した場合に更新する版数（キャッシュのキーに含める）
+ENGINE_VERSION = 2
+# 時間座標Xの標本化の方法
+#   "steps": 積分器の刻み点をそのまま用いる
+#   "uniform": Xについて等間隔
+#   "log": log Yの変化量について等間隔
+#   "adaptive": 正規化した (X, Y) 平面上の弧長と曲率に応じて配置
+SAMPLING_POLICIES = ("steps", "uniform", "log", "adaptive")
+# solve_ivpで用いる積分法
+INTEGRATION_METHODS = ("RK45", "DOP853", "LSODA")
+# 用途ごとの精度の段階（積分法と許容誤差）
+#   "preview": 見た目が変わらない範囲で粗くしたライブプレビュー用
+#   "standard": 通常の計算
+#   "publication": 論文の図などに用いる高精度の計算
+ACCURACY_PRESETS = {
+    "preview": {"method": "RK45", "rtol": 1e-4, "atol": 1e-6},
+    "standard": {"method": "RK45", "rtol": 1e-8, "atol": 1e-10},
+    "publication": {"method": "DOP853", "rtol": 1e-12, "atol": 1e-14},
+}
+# 精度を自動で選ぶ場合に試す (積分法, 相対許容誤差) の候補．計算時間の短い順に並べ，
+# 計算時間と第一積分のずれの両方で他より劣る組み合わせは除いてある（絶対許容誤差は相対の1/100）
+AUTOTUNE_LADDER = (("RK45", 1e-4), ("RK45", 1e-6), ("DOP853", 1e-6),
+                   ("DOP853", 1e-8), ("DOP853", 1e-10), ("DOP853", 1e-12))
+# 回転面の半径の表し方
+#   "linear": スケール因子Yを半径とする
+#   "log": log(1 + Y) を半径とする（Yが倍精度の範囲を超える長時間の指数関数的膨張用）
+#   "auto": ストリーミング積分でlog YがLOG_RADIUS_THRESHOLDを超える範囲では"log"，それ以外は"linear"
+RADIAL_SCALES = ("auto", "linear", "log")
+# "auto"で対数の半径に切り替えるlog Yの値．描画時に座標の２乗を求めても桁あふれしないよう，
+# 倍精度の最大値の平方根に相当する値とする
+LOG_RADIUS_THRESHOLD = 0.5 * np.log(np.finfo(float).max)
 
 
 def friedmann_equation(time, variables, sigma_0, q_0):
@@ -25,17 +65,225 @@ def rotate_coordinates(theta, coordinate_matrix):
     """
     座標をz軸周りに回転変換する関数
     Args:
-        theta: 回転角度（ラジアン）
+        theta: 回転角度（ラジアン）．スカラーまたは角度の配列（形状 (M,)）
         coordinate_matrix: 変換する座標を表す行列（3xNのNumPy配列）
 
     Returns:
-        np.array: 回転変換後の座標行列（3xNのNumPy配列）
+        np.array: 回転変換後の座標行列．thetaがスカラーの場合は3xN，
+                  配列の場合は角度ごとにまとめた (M, 3, N) のNumPy配列
+    """
+    theta = np.asarray(theta, dtype=float)
+    cos_theta = np.cos(theta)
+    sin_theta = np.sin(theta)
+    zeros = np.zeros_like(theta)
+    ones = np.ones_like(theta)
+    # 回転行列の定義（Z軸周り）．角度の配列に対しては (M, 3, 3) の行列をまとめて作る
+    rotation_matrix = np.stack([
+        np.stack([cos_theta, -sin_theta, zeros], axis=-1),
+        np.stack([sin_theta, cos_theta, zeros], axis=-1),
+        np.stack([zeros, zeros, ones], axis=-1),
+    ], axis=-2)
+    return rotation_matrix @ np.asarray(coordinate_matrix, dtype=float)
+
+
+def make_singularity_event(threshold):
+    """
+    スケール因子Yが特異点（Y→0）に近づいたことを検出するイベント関数を作る関数
+    Args:
+        threshold: 特異点に達したとみなすYの値
+
+    Returns:
+        function: solve_ivpに渡す終端イベント関数
+    """
+    def singularity_event(time, variables, *args):
+        return variables[0] - threshold
+    singularity_event.terminal = True
+    singularity_event.direction = -1
+    return singularity_event
+
+
+def make_turning_point_event():
+    """
+    dY/dXの符号の変化（膨張から収縮への転回，収縮から膨張へのバウンス）を検出するイベント関数を作る関数
+
+    Returns:
+        function: solve_ivpに渡すイベント関数（積分は継続する）
+    """
+    def turning_point_event(time, variables, *args):
+        return variables[1]
+    turning_point_event.terminal = False
+    turning_point_event.direction = 0
+    return turning_point_event
+
+
+def make_runaway_event(threshold):
+    """
+    スケール因子Yが発散的に大きくなったことを検出するイベント関数を作る関数
+    Args:
+        threshold: 発散とみなすYの値
+
+    Returns:
+        function: solve_ivpに渡す終端イベント関数
+    """
+    def runaway_event(time, variables, *args):
+        return variables[0] - threshold
+    runaway_event.terminal = True
+    runaway_event.direction = 1
+    return runaway_event
+
+
+def make_progress_event(progress_callback, stage, time_direction):
+    """
+    積分の進み具合を通知するためのイベント関数を作る関数
+    solve_ivpはイベント関数を各ステップで呼び出すので，その時点の時間座標から進捗の割合を求める．
+    progress_callbackが例外を送出すると積分はその場で中断される
+    Args:
+        progress_callback: (段階名, 進捗の割合) を受け取る関数
+        stage: 段階名
+        time_direction: 時間方向を表すタプル (t0, t1)
+
+    Returns:
+        function: solve_ivpに渡すイベント関数（根を持たない）
+    """
+    t0, t1 = float(time_direction[0]), float(time_direction[1])
+
+    def progress_event(time, variables, *args):
+        # 共形時間で積分する場合は3番目の変数が時間座標X
+        current = variables[2] if len(variables) == 3 else time
+        progress_callback(stage, min(max((current - t0) / (t1 - t0), 0.0), 1.0))
+        return 1.0
+    progress_event.terminal = False
+    progress_event.direction = 0
+    return progress_event
+
+
+def radius_from_log(log_scale_factor, radial_scale):
+    """
+    log Yから回転面の半径を求める関数
+    Args:
+        log_scale_factor: log Yの配列
+        radial_scale: "linear"（半径はY）または "log"（半径は log(1 + Y)）
+
+    Returns:
+        np.ndarray: 半径の配列
+    """
+    if radial_scale == "log":
+        # log(1 + Y) = log(exp(0) + exp(log Y)) をYを求めずに計算する
+        return np.logaddexp(0.0, log_scale_factor)
+    with np.errstate(over="ignore"):
+        return np.exp(log_scale_factor)
+
+
+def _equidistribute(reference_times, weights, num_samples):
+    """
+    基準の時刻の各区間に与えた重みの累積が等間隔になるよう，標本の時刻を配置する関数
+    Args:
+        reference_times: 昇順の基準の時刻の配列
+        weights: 各区間の重み（長さは len(reference_times) - 1）
+        num_samples: 標本の数
+
+    Returns:
+        np.ndarray: 標本の時刻（両端を含む）
+    """
+    # 重みが0の区間で標本が重ならないよう，区間の長さに比例するわずかな重みを加える
+    lengths = np.diff(reference_times)
+    weights = weights + 1e-3 * weights.sum() * lengths / lengths.sum()
+    cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+    return np.interp(np.linspace(0.0, cumulative[-1], num_samples), cumulative, reference_times)
+
+
+def _sampling_weights(policy, reference_times, scale_factor, singularity_threshold,
+                      radial_scale="linear"):
+    """
+    標本化の方法に応じた基準の各区間の重みを求める関数
+    Args:
+        policy: "log" または "adaptive"
+        reference_times: 昇順の基準の時刻の配列
+        scale_factor: 基準の時刻におけるスケール因子Y（radial_scaleが"log"の場合はlog Y）
+        singularity_threshold: log Yを求めるときのYの下限
+        radial_scale: 回転面の半径の表し方．"adaptive"では半径の曲線の曲がり具合を重みとする
+
+    Returns:
+        np.ndarray: 各区間の重み
+    """
+    if radial_scale == "log":
+        if policy == "log":
+            return np.abs(np.diff(np.maximum(scale_factor, np.log(singularity_threshold))))
+        return curve_segment_weights(reference_times, radius_from_log(scale_factor, "log"))
+    if policy == "log":
+        return np.abs(np.diff(np.log(np.maximum(scale_factor, singularity_threshold))))
+    return curve_segment_weights(reference_times, scale_factor)
+
+
+def invariant_drift(sol, sigma_0, q_0):
     """
-    # 回転行列の定義（Z軸周り）
-    rotation_matrix = np.array([[np.cos(theta), -np.sin(theta), 0.0],
-                                [np.sin(theta),  np.cos(theta), 0.0],
-                                [0.0, 0.0, 1.0]])
-    return rotation_matrix @ coordinate_matrix
+    積分結果の刻み点での第一積分 E = Y'^2/2 - sigma_0/Y - (sigma_0 - q_0)Y^2/2 のずれを求める関数
+    厳密解ではEは一定なので，そのずれは参照解を求めずに得られる積分誤差の目安となる
+    Args:
+        sol: 積分結果（刻み点の時刻tと変数yを持つもの）
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+
+    Returns:
+        float or None: 初期値からのずれの最大値を，各時刻でのEの３つの項の絶対値の最大値で
+                       割った相対誤差．ストリーミング積分の結果など，刻み点を読み込まない場合はNone
+    """
+    if hasattr(sol, "window"):
+        # ストリーミング積分の結果は全履歴を読み込まないよう評価しない
+        return None
+    variables = np.asarray(sol.y)
+    if variables.ndim != 2 or variables.shape[1] == 0:
+        return None
+    # 特異点（Y = 0）を含む解析解では有限でない値となる点があるため，それらは除く
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        energy = first_integral(variables, sigma_0, q_0)
+        scale = np.maximum.reduce([variables[1]**2 / 2, np.abs(sigma_0 / variables[0]),
+                                   np.abs((sigma_0 - q_0) * variables[0]**2 / 2)])
+        drift = np.abs(energy - energy[0]) / scale
+    drift = drift[np.isfinite(drift)]
+    return float(np.max(drift)) if len(drift) else None
+
+
+def _log_of_scale_factor(scale_factor):
+    """メモリ上の積分結果のYからlog Yを求める（特異点を越えた0以下のYは-infとする）"""
+    with np.errstate(divide="ignore"):
+        return np.log(np.maximum(scale_factor, 0.0))
+
+
+def _time_span(sol):
+    """積分結果の時間座標Xの最小値と最大値を返す（ストリーミング積分では保存先の一覧から求める）"""
+    if hasattr(sol, "span"):
+        return sol.span
+    return float(np.min(sol.t)), float(np.max(sol.t))
+
+
+def _steps_in_window(sol, window, log_scale=False):
+    """
+    積分結果の刻み点のうち，時間座標Xが範囲内のものを昇順に返す
+    Args:
+        sol: 積分結果
+        window: 時間座標Xの範囲 (X_min, X_max)．Noneの場合はすべての刻み点
+        log_scale: Trueの場合はYの代わりにlog Yを返す
+                   （ストリーミング積分では保存した対数形式のまま読み出す）
+
+    Returns:
+        time_array: 昇順の時間座標X
+        scale_array: スケール因子Y（log_scaleがTrueの場合はlog Y）
+    """
+    x_min, x_max = (-np.inf, np.inf) if window is None else window
+    if hasattr(sol, "window"):
+        # ストリーミング積分の結果は範囲に重なるチャンクだけを読み込む
+        time_array, variables = sol.window(x_min, x_max, log_scale=log_scale)
+        return time_array, variables[0]
+    time_array, scale_array = sol.t, sol.y[0]
+    if log_scale:
+        scale_array = _log_of_scale_factor(scale_array)
+    if len(time_array) > 1 and time_array[-1] < time_array[0]:
+        time_array, scale_array = time_array[::-1], scale_array[::-1]
+    if window is None:
+        return time_array, scale_array
+    inside = (time_array >= x_min) & (time_array <= x_max)
+    return time_array[inside], scale_array[inside]
 
 
 class FriedmannEquationIntegrator:
@@ -49,16 +297,75 @@ class FriedmannEquationIntegrator:
                  sigma_0,
                  q_0,
                  K,
-                 Lambda):
+                 Lambda,
+                 num_points=50,
+                 time_plus=(0.0, 6.0),
+                 time_minus=(0.0, -1.0),
+                 use_analytic=True,
+                 analytic_tolerance=1e-10,
+                 engine="rk45",
+                 singularity_threshold=1e-3,
+                 runaway_threshold=1e8,
+                 regularization=None,
+                 rtol=1e-8,
+                 atol=1e-10,
+                 progress_callback=None,
+                 sampling="steps",
+                 num_samples=400,
+                 storage_dir=None,
+                 chunk_span=10.0,
+                 method="RK45",
+                 accuracy=None,
+                 target_drift=1e-8,
+                 radial_scale="auto"):
         """
         コンストラクタ：インスタンス化されたときに最初に呼ばれる特別なメソッド，データの初期化を行う
         Args:
             ode_function: 常微分方程式を定義した関数
-            coordinate_function: 座標変換を定義した関数
+            coordinate_function: 座標変換を定義した関数 f(theta, coordinate_matrix)．
+                                 回転角の配列（形状 (M,)）と3xNの座標行列を受け取り，
+                                 (M, 3, N) の配列を返す関数はすべての角度について１回で呼び出す．
+                                 スカラーの角度だけに対応した関数（3xNを返すもの）は，
+                                 配列での呼び出しが失敗した場合に角度ごとに呼び出す
             sigma_0: 密度パラメーター
             q_0: 減速パラメーター
             K：宇宙の空間曲率
             Lambda:宇宙項
+            num_points: 回転角phiの分割数
+            time_plus: 未来方向の積分区間 (0, X_max)
+            time_minus: 過去方向の積分区間 (0, X_min)
+            use_analytic: 解析解を持つモデルでは数値積分の代わりに解析解を用いるかどうか
+            analytic_tolerance: 解析解を持つ特殊な場合とみなすパラメーターの許容誤差
+            engine: 数値計算の方法．"rk45"はsolve_ivpによる積分，
+                    "quadrature"は第一積分の求積による計算
+            singularity_threshold: Yがこの値を下回ったら特異点（ビッグバン・ビッグクランチ）として積分を打ち切る
+            runaway_threshold: Yがこの値を上回ったら発散として積分を打ち切る
+            regularization: integrateで既定として用いる独立変数の正則化．
+                            Noneは時間座標Xのまま，"conformal"は共形時間 dη = dX/Y で積分する
+            rtol: 数値積分の相対許容誤差
+            atol: 数値積分の絶対許容誤差
+            progress_callback: 計算の進捗を (段階名, 進捗の割合) で受け取る関数．
+                               段階名は "future"，"past"，"rotate" のいずれか．
+                               この関数が例外を送出すると計算を中断する
+            sampling: 時間座標Xの標本化の方法（SAMPLING_POLICIESのいずれか）．
+                      "steps"以外では積分結果の密な出力をnum_samples点で評価するため，
+                      メッシュの大きさがパラメーターによらず一定になる
+            num_samples: "steps"以外の場合の時間方向の標本の数（過去と未来の合計）
+            storage_dir: 指定した場合はストリーミング積分を行い，積分結果をこのディレクトリに
+                         チャンクごとに書き出す（未来方向は future，過去方向は past の下）．
+                         長い積分区間でも全履歴をメモリに保持しない．解析解・求積・正則化は用いない
+            chunk_span: ストリーミング積分で１つのチャンクとする時間座標Xの幅
+            method: solve_ivpの積分法（INTEGRATION_METHODSのいずれか）
+            accuracy: 精度の段階．ACCURACY_PRESETSの名前を指定するとmethod，rtol，atolを
+                      その値で置き換える．"auto"の場合はAUTOTUNE_LADDERの候補から，第一積分の
+                      ずれがtarget_drift以下となる最も計算時間の短いものを選ぶ．
+                      Noneの場合はmethod，rtol，atolをそのまま用いる
+            target_drift: accuracyが"auto"の場合に許容する第一積分の相対的なずれ．
+                          積分結果ごとの実際のずれはaccuracy_reportに記録する
+                          （ストリーミング積分では全履歴を読み込まないよう記録せず，自動選択も行わない）
+            radial_scale: 回転面の半径の表し方（RADIAL_SCALESのいずれか）．
+                          "auto"ではストリーミング積分の保存先のlog Yから，Yが倍精度の範囲を
+                          超えて描画できない場合に log(1 + Y) を半径とする
         """
         self.ode_function = ode_function
         self.coordinate_function = coordinate_function
@@ -67,48 +374,423 @@ class FriedmannEquationIntegrator:
         self.K = K
         self.Lambda = Lambda
         self.initial_variables = np.array([1.0, 1.0])
-        self.time_plus = np.array([0.0, 6.0])
-        self.time_minus = np.array([0.0, -1.0])
-        self.num_points = 50
+        self.time_plus = np.array(time_plus, dtype=float)
+        self.time_minus = np.array(time_minus, dtype=float)
+        self.num_points = int(num_points)
+        self.use_analytic = use_analytic
+        self.analytic_tolerance = analytic_tolerance
+        if engine not in ("rk45", "quadrature"):
+            raise ValueError("engineには'rk45'または'quadrature'を指定してください: {}".format(engine))
+        self.engine = engine
+        self.singularity_threshold = singularity_threshold
+        self.runaway_threshold = runaway_threshold
+        self.events = [make_singularity_event(singularity_threshold),
+                       make_turning_point_event(),
+                       make_runaway_event(runaway_threshold)]
+        self.event_times = None
+        self.regularization = regularization
+        if method not in INTEGRATION_METHODS:
+            raise ValueError("methodには{}のいずれかを指定してください: {}".format(
+                INTEGRATION_METHODS, method))
+        if accuracy is not None and accuracy != "auto" and accuracy not in ACCURACY_PRESETS:
+            raise ValueError("accuracyには{}または'auto'を指定してください: {}".format(
+                tuple(ACCURACY_PRESETS), accuracy))
+        self.accuracy = accuracy
+        self.target_drift = float(target_drift)
+        preset = ACCURACY_PRESETS.get(accuracy, {})
+        self.method = preset.get("method", method)
+        self.rtol = preset.get("rtol", rtol)
+        self.atol = preset.get("atol", atol)
+        # 時間方向ごとに実際に用いた積分法・許容誤差と第一積分のずれ
+        self.accuracy_report = {}
+        self.progress_callback = progress_callback
+        if sampling not in SAMPLING_POLICIES:
+            raise ValueError("samplingには{}のいずれかを指定してください: {}".format(
+                SAMPLING_POLICIES, sampling))
+        self.sampling = sampling
+        self.num_samples = int(num_samples)
+        if radial_scale not in RADIAL_SCALES:
+            raise ValueError("radial_scaleには{}のいずれかを指定してください: {}".format(
+                RADIAL_SCALES, radial_scale))
+        self.radial_scale = radial_scale
+        # 直前の計算で実際に用いた半径の表し方（"linear"または"log"）
+        self.resolved_radial_scale = "linear"
+        self.storage_dir = storage_dir
+        self.chunk_span = float(chunk_span)
         self.phi = np.linspace(0, 2*np.pi, self.num_points).reshape(1, self.num_points)
 
-    def integrate(self, time_direction):
+    def integrate(self, time_direction, regularization=None):
         """
         時間方向にフリードマン方程式を積分するメソッド
         Args:
             time_direction: 時間方向を表すタプル (t0, t1)
+            regularization: 独立変数の正則化．Noneの場合はコンストラクタで指定したものを用いる
 
         Returns:
             sol: 積分結果を含むオブジェクト
         """
+        stage = self._stage(time_direction)
+        with timing.span("integrate", stage=stage) as record:
+            if (self.accuracy == "auto" and self.ode_function is friedmann_equation and
+                    self.storage_dir is None):
+                sol, report = self._autotune(time_direction, regularization)
+            else:
+                sol = self._solve(time_direction, regularization,
+                                  self.method, self.rtol, self.atol)
+                report = self._accuracy_entry(sol, self.method, self.rtol, self.atol)
+            self.accuracy_report[stage] = report
+            if record is not None:
+                record.update(nfev=int(getattr(sol, "nfev", 0)),
+                              steps=len(getattr(sol, "t", ())), method=report["method"],
+                              rtol=report["rtol"], drift=report["drift"])
+        return sol
+
+    def _accuracy_entry(self, sol, method, rtol, atol, trials=1):
+        """積分結果に記録する積分法・許容誤差と第一積分のずれ"""
+        drift = (invariant_drift(sol, self.sigma_0, self.q_0)
+                 if self.ode_function is friedmann_equation else None)
+        if isinstance(sol, AnalyticResult):
+            # 解析解・求積による解は積分法と許容誤差によらない
+            method, rtol, atol = ("quadrature" if self.engine == "quadrature" else "analytic",
+                                  None, None)
+        return {"method": method, "rtol": rtol, "atol": atol,
+                "nfev": int(getattr(sol, "nfev", 0)), "drift": drift, "trials": trials}
+
+    def _autotune(self, time_direction, regularization):
+        """
+        AUTOTUNE_LADDERの候補を計算時間の短い順に試し，第一積分のずれがtarget_drift以下となった
+        最初の結果を返す．ずれは許容誤差にほぼ比例するため，満たさなかった場合は必要な許容誤差を
+        見積もり，それより粗い候補は飛ばす．どの候補でも満たさなければ最も精度の高い結果を返す
+        """
+        index, trials, total_nfev = 0, 0, 0
+        while True:
+            method, rtol = AUTOTUNE_LADDER[index]
+            sol = self._solve(time_direction, regularization, method, rtol, rtol * 1e-2)
+            trials += 1
+            total_nfev += int(getattr(sol, "nfev", 0))
+            report = self._accuracy_entry(sol, method, rtol, rtol * 1e-2, trials)
+            drift = report["drift"]
+            if drift is None or drift <= self.target_drift or index == len(AUTOTUNE_LADDER) - 1:
+                break
+            required = rtol * self.target_drift / drift
+            index = next((later for later in range(index + 1, len(AUTOTUNE_LADDER))
+                          if AUTOTUNE_LADDER[later][1] <= required), len(AUTOTUNE_LADDER) - 1)
+        # 試行した積分の評価回数の合計も記録する
+        report["total_nfev"] = total_nfev
+        return sol, report
+
+    def _solve(self, time_direction, regularization, method, rtol, atol):
+        """積分の方法を選び，時間方向にフリードマン方程式を積分する"""
+        if self.storage_dir is not None and self.ode_function is friedmann_equation:
+            # 対数形式でチャンクごとに積分し，結果をディスクに書き出す
+            stage = self._stage(time_direction)
+            return integrate_streaming(
+                self.sigma_0, self.q_0, time_direction, self.initial_variables,
+                os.path.join(self.storage_dir, stage), chunk_span=self.chunk_span,
+                singularity_threshold=self.singularity_threshold,
+                rtol=rtol, atol=atol, method=method,
+                progress=lambda fraction: self._report_progress(stage, fraction))
+        # 解析解を持つモデルは数値積分を行わずに解析解を返す
+        if (self.use_analytic and
+                self.ode_function is friedmann_equation and
+                np.array_equal(self.initial_variables, [1.0, 1.0])):
+            sol = solve_analytic(self.sigma_0, self.q_0, time_direction,
+                                 self.analytic_tolerance)
+            if sol is not None:
+                return sol
+        if self.engine == "quadrature" and self.ode_function is friedmann_equation:
+            return solve_quadrature(self.sigma_0, self.q_0, time_direction,
+                                    self.initial_variables)
+        events = self.events
+        if self.progress_callback is not None:
+            events = events + [make_progress_event(
+                self.progress_callback, self._stage(time_direction), time_direction)]
+        if regularization is None:
+            regularization = self.regularization
+        if regularization == "conformal" and self.ode_function is friedmann_equation:
+            # 特異点近傍でも右辺が有限となる共形時間で積分し，時間座標Xに戻す
+            return solve_regularized(self.sigma_0, self.q_0, time_direction,
+                                     self.initial_variables, events=events,
+                                     method=method, rtol=rtol, atol=atol)
         sol = solve_ivp(self.ode_function,
                         time_direction,
                         self.initial_variables,
-                        method='RK45',
+                        method=method,
                         t_eval=None,
-                        rtol=1e-8,
-                        atol=1e-10,
+                        rtol=rtol,
+                        atol=atol,
                         args=(self.sigma_0, self.q_0),
-                        dense_output=True)
+                        dense_output=True,
+                        events=events)
         return sol
 
-    def concatenate_sol_array(self):
+    @staticmethod
+    def _stage(time_direction):
+        """積分区間の向きから進捗通知に用いる段階名を返す"""
+        return "future" if time_direction[1] >= time_direction[0] else "past"
+
+    def _report_progress(self, stage, fraction):
+        """進捗通知用の関数が指定されていれば呼び出す"""
+        if self.progress_callback is not None:
+            self.progress_callback(stage, fraction)
+
+    def cache_parameters(self):
+        """
+        計算結果を一意に決めるパラメーターを辞書にまとめるメソッド（キャッシュのキーに用いる）
+
+        Returns:
+            dict: パラメーターの辞書
+        """
+        return {
+            "engine_version": ENGINE_VERSION,
+            "ode_function": getattr(self.ode_function, "__qualname__", repr(self.ode_function)),
+            "coordinate_function": getattr(self.coordinate_function, "__qualname__",
+                                           repr(self.coordinate_function)),
+            "sigma_0": float(self.sigma_0),
+            "q_0": float(self.q_0),
+            "initial_variables": self.initial_variables.tolist(),
+            "time_plus": self.time_plus.tolist(),
+            "time_minus": self.time_minus.tolist(),
+            "num_points": self.num_points,
+            "rtol": self.rtol,
+            "atol": self.atol,
+            "method": self.method,
+            "accuracy": self.accuracy,
+            "target_drift": self.target_drift if self.accuracy == "auto" else None,
+            "engine": self.engine,
+            "regularization": self.regularization,
+            "use_analytic": self.use_analytic,
+            "analytic_tolerance": self.analytic_tolerance,
+            "singularity_threshold": self.singularity_threshold,
+            "runaway_threshold": self.runaway_threshold,
+            "sampling": self.sampling,
+            "num_samples": self.num_samples if self.sampling != "steps" else None,
+            # 保存先のディレクトリは結果に影響しないため含めない
+            "streaming": self.storage_dir is not None,
+            "chunk_span": self.chunk_span if self.storage_dir is not None else None,
+            "radial_scale": self.radial_scale,
+        }
+
+    def detect_events(self, sol_plus, sol_minus):
+        """
+        未来方向・過去方向の積分結果から，宇宙の特徴的な時刻を取り出すメソッド
+        Args:
+            sol_plus: 未来方向の積分結果
+            sol_minus: 過去方向の積分結果
+
+        Returns:
+            dict: 次のキーを持つ辞書（該当しない場合はNoneまたは空のリスト）
+                big_bang: ビッグバンの時刻X
+                age: 宇宙年齢（現在からビッグバンまでの時間 -X）
+                big_crunch: ビッグクランチの時刻X
+                turnaround: 膨張から収縮に転じる時刻Xのリスト
+                bounce: 収縮から膨張に転じる時刻Xのリスト
+                runaway: Yが発散的に大きくなった時刻X
+        """
+        event_times = {"big_bang": None, "age": None, "big_crunch": None,
+                       "turnaround": [], "bounce": [], "runaway": None}
+        for sol, singularity_key in ((sol_minus, "big_bang"), (sol_plus, "big_crunch")):
+            t_events = getattr(sol, "t_events", None)
+            if t_events is not None:
+                # 進捗通知用のイベントが追加されている場合があるため，先頭の3つだけを用いる
+                singular_times, turning_times, runaway_times = t_events[:3]
+            else:
+                # 解析解・求積による解は，定義域の端で止まった場合が特異点となる
+                singular_times = sol.t[-1:] if sol.status == 1 else []
+                turning_times = self._find_turning_points(sol)
+                runaway_times = []
+            if len(singular_times) > 0:
+                event_times[singularity_key] = float(singular_times[0])
+            if len(runaway_times) > 0:
+                event_times["runaway"] = float(runaway_times[0])
+            for time in turning_times:
+                # Y'' < 0 なら極大（転回），Y'' > 0 なら極小（バウンス）
+                scale_factor = sol.sol(time)[0]
+                acceleration = self.ode_function(
+                    time, [scale_factor, 0.0], self.sigma_0, self.q_0)[1]
+                key = "turnaround" if acceleration < 0 else "bounce"
+                event_times[key].append(float(time))
+        if event_times["big_bang"] is not None:
+            event_times["age"] = -event_times["big_bang"]
+        return event_times
+
+    @staticmethod
+    def _find_turning_points(sol):
+        """
+        密な出力からdY/dXの符号が変わる時刻をブレント法で求めるメソッド
+        """
+        derivative = sol.y[1]
+        crossing = np.flatnonzero(np.sign(derivative[:-1]) * np.sign(derivative[1:]) < 0)
+        return [brentq(lambda time: sol.sol(time)[1], sol.t[i], sol.t[i + 1], xtol=1e-12)
+                for i in crossing]
+
+    def _integrate_with_progress(self, time_direction):
+        """段階の開始と終了を通知しながら積分する"""
+        stage = self._stage(time_direction)
+        self._report_progress(stage, 0.0)
+        sol = self.integrate(time_direction)
+        self._report_progress(stage, 1.0)
+        return sol
+
+    def concatenate_sol_array(self, window=None):
         """
         積分して得られたndarray型の配列を結合し，回転変換前のx,y,z座標を求めるメソッド
+        Args:
+            window: 時間座標Xの範囲 (X_min, X_max)．指定した場合はこの範囲だけを読み出す
+                    （ストリーミング積分では範囲に重なるチャンクだけを読み込む）
 
         Returns:
             time_array: 過去の計算結果と未来の計算結果を結合した時間座標Xの配列
             coordinate: 過去の計算結果と未来の計算結果を結合し，条件に沿って定義した回転変換前の３次元座標の配列
+                        （x座標は半径．resolved_radial_scaleが"log"の場合は log(1 + Y)）
         """
-        sol_plus = self.integrate(self.time_plus)
-        sol_minus = self.integrate(self.time_minus)
-        time_array = np.concatenate([sol_minus.t[::-1], sol_plus.t])
-        scale_array = np.concatenate([sol_minus.y[0][::-1], sol_plus.y[0]])
-        coordinate = np.array(
-            [scale_array, np.zeros(len(time_array)), time_array]
-        ).reshape(3, len(time_array))
+        sol_plus = self._integrate_with_progress(self.time_plus)
+        sol_minus = self._integrate_with_progress(self.time_minus)
+        with timing.span("concatenate", sampling=self.sampling) as record:
+            self.event_times = self.detect_events(sol_plus, sol_minus)
+            radial_scale = self.resolved_radial_scale = self._resolve_radial_scale(
+                sol_plus, sol_minus, window)
+            # 対数の半径ではYを求めずに，保存先のlog Yから半径を求める
+            log_scale = radial_scale == "log"
+            if self.sampling == "steps":
+                time_minus, scale_minus = _steps_in_window(sol_minus, window, log_scale)
+                time_plus, scale_plus = _steps_in_window(sol_plus, window, log_scale)
+                time_array = np.concatenate([time_minus, time_plus])
+                scale_array = np.concatenate([scale_minus, scale_plus])
+            else:
+                time_array = self.sample_times(sol_plus, sol_minus, window)
+                scale_array = self._evaluate_dense_output(sol_plus, sol_minus, time_array,
+                                                          log_scale)
+            if log_scale:
+                scale_array = radius_from_log(scale_array, "log")
+            coordinate = np.array(
+                [scale_array, np.zeros(len(time_array)), time_array]
+            ).reshape(3, len(time_array))
+            if record is not None:
+                record["samples"] = len(time_array)
         return time_array, coordinate
 
+    def sample_times(self, sol_plus, sol_minus, window=None):
+        """
+        標本化の方法に従って，積分された範囲の時間座標Xの標本を求めるメソッド
+        Args:
+            sol_plus: 未来方向の積分結果
+            sol_minus: 過去方向の積分結果
+            window: 時間座標Xの範囲 (X_min, X_max)．Noneの場合は積分された範囲全体
+
+        Returns:
+            np.ndarray: 昇順のnum_samples点の時間座標X．windowが積分された範囲と重ならない場合は
+                        "steps"と同じく空の配列
+        """
+        start, end = _time_span(sol_minus)[0], _time_span(sol_plus)[1]
+        if window is not None:
+            start, end = max(start, float(window[0])), min(end, float(window[1]))
+        if end <= start:
+            return np.empty(0)
+        if self.sampling == "uniform":
+            # start，endは積分された範囲に収めてあるため，標本は範囲の外に出ない
+            return np.linspace(start, end, self.num_samples)
+        # 積分器の刻み点と等間隔の点を合わせた基準の点でYを求め，重みの累積が等間隔になるよう配置する
+        reference_times = np.unique(np.concatenate([
+            _steps_in_window(sol_minus, (start, end))[0],
+            _steps_in_window(sol_plus, (start, end))[0],
+            np.linspace(start, end, 4 * self.num_samples)]))
+        log_scale = self.resolved_radial_scale == "log"
+        scale_factor = self._evaluate_dense_output(sol_plus, sol_minus, reference_times,
+                                                   log_scale)
+        weights = _sampling_weights(self.sampling, reference_times, scale_factor,
+                                    self.singularity_threshold, self.resolved_radial_scale)
+        return _equidistribute(reference_times, weights, self.num_samples)
+
+    @staticmethod
+    def _evaluate_dense_output(sol_plus, sol_minus, time_array, log_scale=False):
+        """
+        昇順の時間座標Xにおけるスケール因子Yを，過去・未来の積分結果の密な出力から
+        それぞれ１回の呼び出しでまとめて求める
+        log_scaleがTrueの場合はlog Yを求める（ストリーミング積分ではYを経由しない）
+        """
+        past = time_array < 0.0
+        scale_array = np.empty(len(time_array))
+        for sol, rows in ((sol_minus, past), (sol_plus, ~past)):
+            if not rows.any():
+                continue
+            if log_scale and hasattr(sol, "window"):
+                scale_array[rows] = np.atleast_2d(sol.sol(time_array[rows], log_scale=True))[0]
+            elif log_scale:
+                scale_array[rows] = _log_of_scale_factor(
+                    np.atleast_2d(sol.sol(time_array[rows]))[0])
+            else:
+                scale_array[rows] = np.atleast_2d(sol.sol(time_array[rows]))[0]
+        return scale_array
+
+    def _resolve_radial_scale(self, sol_plus, sol_minus, window):
+        """
+        回転面の半径の表し方を決める
+        "auto"では，ストリーミング積分の保存先の範囲内のlog YがLOG_RADIUS_THRESHOLDを超える場合に"log"とする
+        （メモリ上の積分結果は発散のイベントで打ち切られるため，常に"linear"とする）
+        """
+        if self.radial_scale != "auto":
+            return self.radial_scale
+        x_min, x_max = (-np.inf, np.inf) if window is None else window
+        for sol in (sol_minus, sol_plus):
+            if hasattr(sol, "window"):
+                log_scale_factor = sol.window(x_min, x_max, log_scale=True)[1][0]
+                if len(log_scale_factor) and np.nanmax(log_scale_factor) > LOG_RADIUS_THRESHOLD:
+                    return "log"
+        return "linear"
+
+    def calculate_surface(self, window=None):
+        """
+        回転面を求めるメソッド
+        既定の回転変換では，時間座標X，スケール因子Y，回転角phiの１次元配列だけを保持する
+        RevolutionSurfaceを返し，x,y,z座標の配列は作らない
+        Args:
+            window: 時間座標Xの範囲 (X_min, X_max)．指定した場合はこの範囲の回転面だけを求める
+
+        Returns:
+            RevolutionSurface or MeshSurface: 回転面
+        """
+        time_array, coordinate = self.concatenate_sol_array(window)
+        self._report_progress("rotate", 0.0)
+        phi = self.phi[0]
+        with timing.span("rotate") as record:
+            if self.coordinate_function is rotate_coordinates:
+                # 回転前のy座標はすべて0なので，回転面はスケール因子とcos/sin(phi)の外積で表せる
+                surface = RevolutionSurface(time_array, coordinate[0], phi,
+                                            radial_scale=self.resolved_radial_scale)
+            else:
+                new_coordinate = self._apply_coordinate_function(phi, coordinate)
+                surface = MeshSurface(new_coordinate[:, 0, :].T,
+                                      new_coordinate[:, 1, :].T,
+                                      new_coordinate[:, 2, :].T,
+                                      radial_scale=self.resolved_radial_scale)
+            if record is not None:
+                record.update(shape=list(surface.shape), nbytes=surface.nbytes)
+        self._report_progress("rotate", 1.0)
+        return surface
+
+    def _apply_coordinate_function(self, phi, coordinate):
+        """
+        任意の座標変換関数をすべての回転角に適用する
+        まずすべての角度について一度にまとめて呼び出し，配列の角度に対応していない関数
+        （例外を送出するか，形状 (M, 3, N) 以外を返すもの）は角度ごとに呼び出す
+        Args:
+            phi: 回転角の配列（形状 (M,)）
+            coordinate: 回転前の座標行列（3xN）
+
+        Returns:
+            np.ndarray: 形状 (M, 3, N) の変換後の座標
+        """
+        expected_shape = (len(phi),) + coordinate.shape
+        try:
+            new_coordinate = np.asarray(self.coordinate_function(phi, coordinate), dtype=float)
+        except (TypeError, ValueError):
+            new_coordinate = None
+        if new_coordinate is None or new_coordinate.shape != expected_shape:
+            new_coordinate = np.array([self.coordinate_function(theta, coordinate)
+                                       for theta in phi], dtype=float).reshape(expected_shape)
+        return new_coordinate
+
     def calculate_rotated_coordinates(self):
         """
         回転行列によって変換したx,y,z座標を求めるメソッド
@@ -117,17 +799,12 @@ class FriedmannEquationIntegrator:
             y_new: 回転変換後のy座標の配列
             z_new: 回転変換後のz座標の配列
         """
-        time_array, coordinate = self.concatenate_sol_array()
-        new_coordinate = np.array(
-            [
-                np.array([
-                    self.coordinate_function(self.phi[0, i], coordinate[:, j])
-                    for i in range(self.phi.shape[1])
-                ]).T
-                for j in range(len(time_array))
-            ]
-        )
-        x_new = new_coordinate[:, 0, :]
-        y_new = new_coordinate[:, 1, :]
-        z_new = new_coordinate[:, 2, :]
+        surface = self.calculate_surface()
+        with timing.span("rotated_coordinates") as record:
+            x_new, y_new, z_new = surface
+            # zは読み取り専用のビューなので，従来どおり書き込める配列にして返す
+            z_new = np.array(z_new)
+            if record is not None:
+                record.update(shape=list(z_new.shape),
+                              nbytes=x_new.nbytes + y_new.nbytes + z_new.nbytes)
         return x_new, y_new, z_new
@@ -0,0 +1,171 @@
+"""複数のパラメーターに対するフリードマン方程式の一括数値計算用モジュール．"""
+import numpy as np
+from calculate import friedmann_equation
+
+# Dormand-Prince 5(4) 法（scipyのRK45と同じ係数）のブッチャー表
+# フリードマン方程式は時間Xを陽に含まないため，節点の係数Cは不要
+DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+DP_B = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84, 0.0])
+DP_E = np.array([-71/57600, 0.0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+
+
+class BatchFriedmannEquationIntegrator:
+    """
+    多数の(sigma_0, q_0)の組について，フリードマン方程式を同時に数値積分するクラス
+    右辺はfriedmann_equationを列（メンバー）の方向にブロードキャストして評価する
+
+    各メンバーは独立した刻み幅制御を持つDormand-Prince 5(4)法で積分され，
+    積分を終えたメンバーはマスクによって以降の計算から除外される．
+    """
+
+    def __init__(self,
+                 sigma_0,
+                 q_0,
+                 time_grid=None,
+                 rtol=1e-8,
+                 atol=1e-10,
+                 scale_factor_floor=1e-3,
+                 min_step=1e-12,
+                 max_iterations=100000):
+        """
+        コンストラクタ
+        Args:
+            sigma_0: 密度パラメーターの配列
+            q_0: 減速パラメーターの配列（sigma_0とブロードキャスト可能な形状）
+            time_grid: 結果を出力する共通の時間座標Xの配列．Noneの場合は[-1, 6]を等分割する
+            rtol: 相対許容誤差
+            atol: 絶対許容誤差
+            scale_factor_floor: Yがこの値を下回ったメンバーは特異点に達したとして積分を打ち切る
+            min_step: 刻み幅がこの値を下回ったメンバーは積分を打ち切る
+            max_iterations: 一方向あたりの最大反復回数
+        """
+        sigma_0, q_0 = np.broadcast_arrays(np.asarray(sigma_0, dtype=float),
+                                           np.asarray(q_0, dtype=float))
+        self.parameter_shape = sigma_0.shape
+        self.sigma_0 = sigma_0.ravel()
+        self.q_0 = q_0.ravel()
+        if time_grid is None:
+            time_grid = np.linspace(-1.0, 6.0, 141)
+        self.time_grid = np.asarray(time_grid, dtype=float)
+        self.rtol = rtol
+        self.atol = atol
+        self.scale_factor_floor = scale_factor_floor
+        self.min_step = min_step
+        self.max_iterations = max_iterations
+        self.initial_variables = np.array([1.0, 1.0])
+        self.nfev = 0
+        self.n_iterations = 0
+
+    def integrate(self):
+        """
+        全メンバーを共通の時間座標Xの格子上で積分するメソッド
+
+        Returns:
+            scale_array: 各メンバーの規格化されたスケール因子Y(X)の配列
+                         （形状 parameter_shape + (len(time_grid),)）．
+                         特異点などで積分を打ち切った点はNaN
+        """
+        n_members = self.sigma_0.size
+        scale_array = np.full((n_members, self.time_grid.size), np.nan)
+        scale_array[:, self.time_grid == 0.0] = self.initial_variables[0]
+        self.nfev = 0
+        self.n_iterations = 0
+        for direction in (1.0, -1.0):
+            mask = direction * self.time_grid > 0.0
+            if not np.any(mask):
+                continue
+            column_index = np.flatnonzero(mask)
+            order = np.argsort(direction * self.time_grid[column_index])
+            column_index = column_index[order]
+            scale_array[:, column_index] = self._integrate_direction(
+                self.time_grid[column_index], direction)
+        return scale_array.reshape(self.parameter_shape + (self.time_grid.size,))
+
+    def _integrate_direction(self, output_times, direction):
+        """
+        X=0から一方向に積分し，output_timesの各点でのYを返すメソッド
+        Args:
+            output_times: 出力する時間座標の配列（積分方向に単調に並んだもの）
+            direction: 積分方向（1.0または-1.0）
+
+        Returns:
+            np.array: 各メンバーの出力点におけるYの配列（形状 (B, len(output_times))）
+        """
+        n_members = self.sigma_0.size
+        n_output = output_times.size
+        output = np.full((n_members, n_output), np.nan)
+
+        time = np.zeros(n_members)
+        variables = np.repeat(self.initial_variables.reshape(2, 1), n_members, axis=1)
+        derivative = friedmann_equation(time, variables, self.sigma_0, self.q_0)
+        self.nfev += 1
+        step = np.full(n_members, 1e-2 * min(abs(output_times[0]), 1.0) + 1e-6)
+        next_output = np.zeros(n_members, dtype=int)
+        alive = np.ones(n_members, dtype=bool)
+
+        for _ in range(self.max_iterations):
+            active = np.flatnonzero(alive & (next_output < n_output))
+            if active.size == 0:
+                break
+            self.n_iterations += 1
+            sigma_0 = self.sigma_0[active]
+            q_0 = self.q_0[active]
+            t = time[active]
+            y = variables[:, active]
+            target = output_times[next_output[active]]
+            remaining = np.abs(target - t)
+            h = np.minimum(step[active], remaining)
+
+            # Dormand-Prince法の各段を計算する（最初の段はFSALにより前回の値を再利用）
+            stages = [derivative[:, active]]
+            for c_index in range(1, 7):
+                increment = sum(a * k for a, k in zip(DP_A[c_index], stages))
+                stages.append(friedmann_equation(
+                    t, y + direction * h * increment, sigma_0, q_0))
+            self.nfev += 6
+            y_new = y + direction * h * sum(b * k for b, k in zip(DP_B, stages) if b != 0.0)
+            error = direction * h * sum(e * k for e, k in zip(DP_E, stages) if e != 0.0)
+
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+            with np.errstate(invalid='ignore', over='ignore'):
+                error_norm = np.sqrt(np.mean((error / scale)**2, axis=0))
+            finite = np.all(np.isfinite(y_new), axis=0) & np.isfinite(error_norm)
+            accepted = finite & (error_norm <= 1.0)
+
+            # 刻み幅の更新（受理されなかったメンバーは刻み幅を縮めてやり直す）
+            with np.errstate(divide='ignore'):
+                factor = np.where(error_norm > 0.0,
+                                  0.9 * error_norm**(-0.2), 10.0)
+            factor = np.clip(np.where(finite, factor, 0.2), 0.2, 10.0)
+            factor = np.where(accepted, factor, np.minimum(factor, 1.0))
+            # 出力点に合わせて刻み幅を切り詰めた場合は，元の刻み幅を下回らないようにする
+            reached = accepted & (h >= remaining)
+            step[active] = np.where(reached,
+                                    np.maximum(step[active], h * factor),
+                                    h * factor)
+
+            accepted_index = active[accepted]
+            time[accepted_index] = t[accepted] + direction * h[accepted]
+            variables[:, accepted_index] = y_new[:, accepted]
+            derivative[:, accepted_index] = stages[6][:, accepted]
+
+            # 出力点に到達したメンバーの結果を記録する
+            reached_index = active[reached]
+            time[reached_index] = target[reached]
+            output[reached_index, next_output[reached_index]] = variables[0, reached_index]
+            next_output[reached_index] += 1
+
+            # 特異点に近づいたメンバーや刻み幅が小さくなりすぎたメンバーをマスクする
+            alive[active] = (
+                (variables[0, active] > self.scale_factor_floor)
+                & (step[active] > self.min_step)
+            )
+        return output
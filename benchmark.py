@@ -0,0 +1,638 @@
+"""数値計算の性能を計測するベンチマーク用モジュール．
+
+使い方:
+    python benchmark.py                              # 計算と描画の各段階を計測して表示する
+    python benchmark.py -o result.json               # 結果をJSONで保存する
+    python benchmark.py --baseline baseline.json     # 保存済みの基準と比較する
+    python benchmark.py --suite all                  # その他のベンチマークもすべて実行する
+"""
+import argparse
+import configparser
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from analytic import solve_analytic
+from calculate import (
+    FriedmannEquationIntegrator,
+    friedmann_equation,
+    rotate_coordinates,
+)
+
+# 既定で読み込む設定ファイル
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.ini")
+# 計測する回転角phiの分割数（メッシュの大きさ）
+DEFAULT_MESH_SIZES = (50, 100, 200)
+# 基準と比較して性能の低下とみなす増加率
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+# 経過時間の比較で無視する差（秒）．短すぎる計測の揺らぎで誤検出しないため
+MIN_TIME_DIFFERENCE = 5e-3
+# 解析解の登録表の各項目を数値積分と比べるパラメーター (名前, sigma_0, q_0)
+ANALYTIC_CHECK_CASES = (
+    ("Milne", 0.0, 0.0),
+    ("deSitter", 0.0, -1.0),
+    ("vacuum", 0.0, -0.25),
+    ("vacuum", 0.0, 0.5),
+    ("Einstein-deSitter", 0.5, 0.5),
+    ("dust", 1.0, 1.0),
+    ("dust", 0.2, 0.2),
+)
+
+
+def load_models(config_path=DEFAULT_CONFIG, sections=None):
+    """
+    設定ファイルから宇宙モデルのパラメーターを読み込む関数
+    Args:
+        config_path: 設定ファイルのパス
+        sections: 読み込むモデル名のリスト．Noneの場合はすべて
+
+    Returns:
+        list: (モデル名, sigma_0, q_0) のリスト
+    """
+    config_ini = configparser.ConfigParser()
+    config_ini.read(config_path, encoding='utf-8')
+    names = config_ini.sections() if sections is None else sections
+    return [(name,
+             float(config_ini.get(name, "sigma_0")),
+             float(config_ini.get(name, "q_0")))
+            for name in names]
+
+
+def benchmark_regularization(config_path=DEFAULT_CONFIG,
+                             sections=("Einstein-deSitter", "Lemaitre")):
+    """
+    時間座標Xでの積分と共形時間での積分の右辺評価回数と計算時間を比較する関数
+    解析解による近道は使わず，どちらも数値積分で比較する
+    Args:
+        config_path: 設定ファイルのパス
+        sections: 比較するモデル名のリスト
+
+    Returns:
+        list: モデルごとの計測結果の辞書のリスト
+    """
+    results = []
+    for name, sigma_0, q_0 in load_models(config_path, list(sections)):
+        for regularization in (None, "conformal"):
+            instance = FriedmannEquationIntegrator(
+                friedmann_equation, rotate_coordinates, sigma_0, q_0,
+                K=None, Lambda=None, use_analytic=False,
+                regularization=regularization)
+            start = time.perf_counter()
+            sol_plus = instance.integrate(instance.time_plus)
+            sol_minus = instance.integrate(instance.time_minus)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "model": name,
+                "regularization": regularization or "none",
+                "nfev_plus": int(sol_plus.nfev),
+                "nfev_minus": int(sol_minus.nfev),
+                "nfev_total": int(sol_plus.nfev + sol_minus.nfev),
+                "wall_time": elapsed,
+            })
+    return results
+
+
+def benchmark_accuracy(config_path=DEFAULT_CONFIG,
+                       sections=("Einstein-deSitter", "Lemaitre"), target_drift=1e-8):
+    """
+    精度の段階と自動選択について，右辺の評価回数・計算時間と第一積分のずれを比較する関数
+    解析解による近道は使わず，すべて数値積分で比較する
+    Args:
+        config_path: 設定ファイルのパス
+        sections: 比較するモデル名のリスト
+        target_drift: 自動選択で許容する第一積分の相対的なずれ
+
+    Returns:
+        list: モデルと精度の段階ごとの計測結果の辞書のリスト
+    """
+    from calculate import ACCURACY_PRESETS
+
+    results = []
+    for name, sigma_0, q_0 in load_models(config_path, list(sections)):
+        for accuracy in tuple(ACCURACY_PRESETS) + ("auto",):
+            instance = FriedmannEquationIntegrator(
+                friedmann_equation, rotate_coordinates, sigma_0, q_0,
+                K=None, Lambda=None, use_analytic=False,
+                accuracy=accuracy, target_drift=target_drift)
+            start = time.perf_counter()
+            instance.integrate(instance.time_plus)
+            instance.integrate(instance.time_minus)
+            elapsed = time.perf_counter() - start
+            reports = list(instance.accuracy_report.values())
+            results.append({
+                "model": name,
+                "accuracy": accuracy,
+                "settings": ", ".join(sorted({"{} {:.0e}".format(report["method"], report["rtol"])
+                                              for report in reports})),
+                "nfev_total": sum(report.get("total_nfev", report["nfev"])
+                                  for report in reports),
+                "drift": max(report["drift"] for report in reports),
+                "wall_time": elapsed,
+            })
+    return results
+
+
+def benchmark_analytic(tolerance=1e-6, singularity_margin=0.05):
+    """
+    解析解の登録表の各項目を，solve_ivpによる数値積分と比べる関数
+    数値積分の刻み点で解析解のYとの相対誤差を求め，特異点の近く（Yがsingularity_margin以下）は除く．
+    ビッグバン・ビッグクランチの有無も両方の方法で一致することを確かめる
+    Args:
+        tolerance: Yの相対誤差の許容値
+        singularity_margin: 比較から除く特異点の近くのYの上限
+
+    Returns:
+        list: 比較したパラメーターごとの結果の辞書のリスト
+
+    Raises:
+        AssertionError: 誤差が許容値を超えた場合，特異点の有無が一致しない場合，
+                        または比較していない登録表の項目がある場合
+    """
+    from scipy.integrate import solve_ivp
+    from analytic import ANALYTIC_SOLUTIONS, solve_analytic
+    from calculate import make_singularity_event
+
+    missing = {entry[0] for entry in ANALYTIC_SOLUTIONS} - {case[0] for case in ANALYTIC_CHECK_CASES}
+    assert not missing, "解析解の比較がありません: {}".format(sorted(missing))
+    results = []
+    for name, sigma_0, q_0 in ANALYTIC_CHECK_CASES:
+        instance = FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K=None, Lambda=None)
+        error = 0.0
+        for time_direction in (instance.time_minus, instance.time_plus):
+            analytic = solve_analytic(sigma_0, q_0, time_direction)
+            assert analytic is not None and analytic.name == name, \
+                "{}: 解析解が選ばれませんでした".format(name)
+            singularity_event = make_singularity_event(instance.singularity_threshold)
+            numerical = solve_ivp(friedmann_equation, time_direction, [1.0, 1.0],
+                                  args=(sigma_0, q_0), events=singularity_event,
+                                  rtol=1e-11, atol=1e-13)
+            scale_factor = numerical.y[0]
+            compared = scale_factor > singularity_margin
+            relative = np.abs(analytic.sol(numerical.t[compared])[0] - scale_factor[compared]) \
+                / scale_factor[compared]
+            error = max(error, float(relative.max()))
+            assert (analytic.status == 1) == (len(numerical.t_events[0]) > 0), \
+                "{}: 特異点の有無が数値積分と一致しません".format(name)
+        assert error <= tolerance, "{} (sigma_0={}, q_0={}): 相対誤差 {:.2e} > {:.0e}".format(
+            name, sigma_0, q_0, error, tolerance)
+        results.append({"model": name, "sigma_0": sigma_0, "q_0": q_0, "max_error": error})
+    return results
+
+
+def benchmark_observables(config_path=DEFAULT_CONFIG, num_redshifts=100000, max_redshift=10.0):
+    """
+    観測量の表の作成と，多数の赤方偏移に対する観測量・距離の一括計算の時間を計測する関数
+    Args:
+        config_path: 設定ファイルのパス
+        num_redshifts: 一度に問い合わせる赤方偏移の数
+        max_redshift: 問い合わせる赤方偏移の上限
+
+    Returns:
+        list: モデルごとの計測結果の辞書のリスト
+    """
+    from observables import Observables
+
+    redshift = np.linspace(0.0, max_redshift, num_redshifts)
+    results = []
+    for name, sigma_0, q_0 in load_models(config_path):
+        instance = FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K=None, Lambda=None)
+        start = time.perf_counter()
+        observables = Observables(instance)
+        table_time = time.perf_counter() - start
+        start = time.perf_counter()
+        values = observables.at_redshift(redshift)
+        query_time = time.perf_counter() - start
+        results.append({
+            "model": name,
+            "age": observables.age,
+            "defined": int(np.isfinite(values["luminosity_distance"]).sum()),
+            "table_time": table_time,
+            "query_time": query_time,
+        })
+    return results
+
+
+def _resident_set_size():
+    """現在の常駐メモリサイズ（バイト）を返す．取得できない環境ではNone"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def benchmark_redraw(redraws=100, config_path=DEFAULT_CONFIG, section="Lemaitre"):
+    """
+    PlotControllerで回転面を繰り返し再描画したときの常駐メモリの推移を計測する関数
+    画面には表示せずに描画する
+    Args:
+        redraws: 再描画の回数
+        config_path: 設定ファイルのパス
+        section: 描画するモデル名
+
+    Returns:
+        dict: 再描画ごとの常駐メモリ（バイト）と，後半の増加量，1回あたりの描画時間
+    """
+    from output import PlotController
+
+    (_, sigma_0, q_0), = load_models(config_path, [section])
+    instance = FriedmannEquationIntegrator(
+        friedmann_equation, rotate_coordinates, sigma_0, q_0, K=None, Lambda=None)
+    surface = instance.calculate_surface()
+    controller = PlotController()
+    rss = []
+    start = time.perf_counter()
+    for _ in range(redraws):
+        controller.show_surface(surface)
+        rss.append(_resident_set_size())
+    elapsed = time.perf_counter() - start
+    controller.close()
+    # 初回のキャッシュなどの確保が落ち着いた後半で増加量を見る
+    settled = [value for value in rss[len(rss) // 2:] if value is not None]
+    growth = settled[-1] - settled[0] if settled else None
+    return {"rss": rss, "rss_growth": growth, "time_per_redraw": elapsed / redraws}
+
+
+def benchmark_rendering(config_path=DEFAULT_CONFIG, frames=5):
+    """
+    設定ファイルの各モデルについて，詳細度の段階ごとに回転面の描画時間を計測する関数
+    視点を変えながら画面に表示せずに描画し，1フレームあたりの時間の中央値を求める
+    Args:
+        config_path: 設定ファイルのパス
+        frames: 計測するフレーム数
+
+    Returns:
+        list: モデルと詳細度の段階ごとの計測結果の辞書のリスト
+    """
+    from output import PlotController
+    from render import LOD_LEVELS, decimate_mesh
+
+    # 間引かない元のメッシュも比較のために計測する
+    levels = dict(LOD_LEVELS, full=None)
+    results = []
+    for name, sigma_0, q_0 in load_models(config_path):
+        instance = FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K=None, Lambda=None)
+        surface = instance.calculate_surface()
+        for level, budget in levels.items():
+            budget = surface.shape[0] * surface.shape[1] if budget is None else budget
+            controller = PlotController(polygon_budget=budget, interaction_budget=budget)
+            controller.show_surface(surface)
+            frame_times = []
+            for frame in range(frames):
+                controller.surface_ax.view_init(elev=30, azim=-60 + 15 * frame)
+                start = time.perf_counter()
+                controller.figure_canvas.draw()
+                frame_times.append(time.perf_counter() - start)
+            controller.close()
+            rows, columns = decimate_mesh(surface.finite_rows(), budget).shape
+            frame_times.sort()
+            results.append({
+                "model": name,
+                "level": level,
+                "polygons": (rows - 1) * (columns - 1),
+                "frame_time": frame_times[len(frame_times) // 2],
+            })
+    return results
+
+
+# 起動時に読み込むモジュールを別プロセスで読み込み，経過時間と重いモジュールの有無を出力する
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import PySimpleGUI, guidesign, eventhandlers, worker
+from startup import DEFERRED_MODULES
+print(json.dumps({"elapsed": time.perf_counter() - start,
+                  "deferred_loaded": [name for name in DEFERRED_MODULES if name in sys.modules]}))
+"""
+
+
+def benchmark_startup(repeats=3):
+    """
+    最初のウィンドウを表示するまでに必要なモジュールの読み込み時間を計測する関数
+    ウィンドウの作成は表示環境に依存するため含めず，新しいプロセスで読み込み時間だけを計測する
+    Args:
+        repeats: 計測の回数（最短の時間を用いる）
+
+    Returns:
+        dict: 読み込み時間，起動時に読み込まれた重いモジュール，目安の時間以内かどうか
+    """
+    from startup import STARTUP_BUDGET_SECONDS
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    measurements = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=directory,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1]}
+        measurements.append(json.loads(completed.stdout))
+    best = min(measurements, key=lambda measurement: measurement["elapsed"])
+    return {"elapsed": best["elapsed"],
+            "deferred_loaded": best["deferred_loaded"],
+            "budget": STARTUP_BUDGET_SECONDS,
+            "within_budget": (best["elapsed"] <= STARTUP_BUDGET_SECONDS
+                              and not best["deferred_loaded"])}
+
+
+def _measure(function, repeats):
+    """
+    関数を繰り返し実行し，最短の経過時間と，別に1回実行したときの最大メモリ使用量を求める
+    （tracemallocは実行を遅くするため，時間の計測とは分けて実行する）
+
+    Returns:
+        tuple: (最後の戻り値, 最短の経過時間（秒）, 最大メモリ使用量（バイト）)
+    """
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        value = function()
+        wall_times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, min(wall_times), peak_memory
+
+
+def _record(model, mesh_size, stage, wall_time, peak_memory, nfev=None):
+    """計測結果の1行を作る"""
+    return {"model": model, "mesh_size": mesh_size, "stage": stage,
+            "wall_time": wall_time, "peak_memory": peak_memory, "nfev": nfev}
+
+
+def benchmark_pipeline(config_path=DEFAULT_CONFIG, mesh_sizes=DEFAULT_MESH_SIZES,
+                       repeats=3, rhs_calls=10000, render=True):
+    """
+    設定ファイルの各モデルとメッシュの大きさごとに，計算と描画の各段階を個別に計測する関数
+    段階は，右辺 friedmann_equation の1回の評価，integrate（未来・過去の数値積分），
+    analytic（解析解を持つモデルでintegrateが返す解析解），concatenate_sol_array，calculate_rotated_coordinates と calculate_surface（回転変換のみ），
+    draw_plot（Aggバックエンドでの作成と描画）である
+    Args:
+        config_path: 設定ファイルのパス
+        mesh_sizes: 回転角phiの分割数のリスト
+        repeats: 経過時間を計測する回数（最短の時間を用いる）
+        rhs_calls: 右辺の評価時間を求めるための呼び出し回数
+        render: Falseの場合はdraw_plotを計測しない
+
+    Returns:
+        list: 段階ごとの計測結果の辞書のリスト
+    """
+    if render:
+        # 画面に表示しないAggバックエンドで描画する（pyplotを読み込む前に切り替える）
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from output import draw_plot
+
+    records = []
+    for name, sigma_0, q_0 in load_models(config_path):
+        variables = np.array([1.0, 1.0])
+
+        def evaluate_rhs():
+            for _ in range(rhs_calls):
+                friedmann_equation(0.0, variables, sigma_0, q_0)
+
+        _, wall_time, peak_memory = _measure(evaluate_rhs, repeats)
+        records.append(_record(name, None, "friedmann_equation",
+                               wall_time / rhs_calls, peak_memory))
+
+        for mesh_size in mesh_sizes:
+            instance = FriedmannEquationIntegrator(
+                friedmann_equation, rotate_coordinates, sigma_0, q_0,
+                K=None, Lambda=None, num_points=mesh_size)
+            # 積分はメッシュの大きさによらないので，最初の大きさでだけ計測する
+            if mesh_size == mesh_sizes[0]:
+                # 解析解を持つモデルでも数値積分の時間と右辺の評価回数を計測するため，
+                # integrateは解析解を用いないインスタンスで計測し，解析解は別の段階とする
+                numerical = FriedmannEquationIntegrator(
+                    friedmann_equation, rotate_coordinates, sigma_0, q_0,
+                    K=None, Lambda=None, num_points=mesh_size, use_analytic=False)
+                for direction, time_direction in (("plus", instance.time_plus),
+                                                  ("minus", instance.time_minus)):
+                    sol, wall_time, peak_memory = _measure(
+                        lambda: numerical.integrate(time_direction), repeats)
+                    records.append(_record(name, None, "integrate_" + direction, wall_time,
+                                           peak_memory, int(sol.nfev)))
+                    if solve_analytic(sigma_0, q_0, time_direction,
+                                      instance.analytic_tolerance) is not None:
+                        _, wall_time, peak_memory = _measure(
+                            lambda: instance.integrate(time_direction), repeats)
+                        records.append(_record(name, None, "analytic_" + direction,
+                                               wall_time, peak_memory))
+                concatenated, wall_time, peak_memory = _measure(
+                    instance.concatenate_sol_array, repeats)
+                records.append(_record(name, None, "concatenate_sol_array",
+                                       wall_time, peak_memory))
+            # 回転変換だけを計測するため，積分結果の結合は計算済みのものを返す
+            instance.concatenate_sol_array = lambda window=None: concatenated
+            _, wall_time, peak_memory = _measure(
+                instance.calculate_rotated_coordinates, repeats)
+            records.append(_record(name, mesh_size, "calculate_rotated_coordinates",
+                                   wall_time, peak_memory))
+            surface, wall_time, peak_memory = _measure(instance.calculate_surface, repeats)
+            records.append(_record(name, mesh_size, "calculate_surface",
+                                   wall_time, peak_memory))
+            if render:
+                def draw():
+                    fig = draw_plot(surface)
+                    fig.canvas.draw()
+                    plt.close(fig)
+
+                _, wall_time, peak_memory = _measure(draw, repeats)
+                records.append(_record(name, mesh_size, "draw_plot", wall_time, peak_memory))
+    return records
+
+
+def environment_info():
+    """
+    計測環境の情報を返す関数
+    """
+    import scipy
+
+    return {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor()}
+
+
+def save_results(records, path):
+    """
+    計測結果を環境の情報とともにJSONファイルに保存する関数
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"environment": environment_info(), "results": records}, file, indent=2)
+
+
+def load_results(path):
+    """
+    JSONファイルに保存した計測結果を読み込む関数
+    """
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["results"]
+
+
+def compare_to_baseline(records, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    計測結果を基準と比較し，性能が低下した項目を求める関数
+    経過時間，最大メモリ使用量，右辺の評価回数のいずれかが基準の (1 + threshold) 倍を超えたものを
+    性能の低下とみなす
+    Args:
+        records: 今回の計測結果
+        baseline: 基準の計測結果
+        threshold: 許容する増加率
+
+    Returns:
+        list: 性能が低下した項目の辞書のリスト
+    """
+    reference = {(record["model"], record["mesh_size"], record["stage"]): record
+                 for record in baseline}
+    regressions = []
+    for record in records:
+        base = reference.get((record["model"], record["mesh_size"], record["stage"]))
+        if base is None:
+            continue
+        for metric in ("wall_time", "peak_memory", "nfev"):
+            current, previous = record.get(metric), base.get(metric)
+            if current is None or previous is None:
+                continue
+            if metric == "wall_time" and current - previous < MIN_TIME_DIFFERENCE:
+                continue
+            if current > previous * (1 + threshold):
+                regressions.append({"model": record["model"],
+                                    "mesh_size": record["mesh_size"],
+                                    "stage": record["stage"],
+                                    "metric": metric,
+                                    "baseline": previous,
+                                    "current": current,
+                                    "ratio": current / previous if previous else float("inf")})
+    return regressions
+
+
+def print_pipeline(records):
+    """
+    benchmark_pipelineの結果を表形式で表示する関数
+    """
+    print("{:<20} {:>5} {:<30} {:>12} {:>10} {:>12}".format(
+        "model", "mesh", "stage", "time[ms]", "nfev", "peak[KiB]"))
+    for record in records:
+        print("{:<20} {:>5} {:<30} {:>12.4f} {:>10} {:>12.1f}".format(
+            record["model"],
+            "-" if record["mesh_size"] is None else record["mesh_size"],
+            record["stage"],
+            record["wall_time"] * 1e3,
+            "-" if record["nfev"] is None else record["nfev"],
+            record["peak_memory"] / 1024))
+
+
+def print_others():
+    """
+    その他のベンチマークを実行して結果を表示する関数
+    """
+    print("{:<20} {:<12} {:>10} {:>10} {:>10} {:>12}".format(
+        "model", "variable", "nfev(+)", "nfev(-)", "nfev", "time[ms]"))
+    for result in benchmark_regularization():
+        print("{model:<20} {regularization:<12} {nfev_plus:>10} {nfev_minus:>10} "
+              "{nfev_total:>10} {time_ms:>12.2f}".format(
+                  time_ms=result["wall_time"] * 1e3, **result))
+
+    print()
+    print("{:<20} {:<12} {:<24} {:>10} {:>10} {:>12}".format(
+        "model", "accuracy", "settings", "nfev", "drift", "time[ms]"))
+    for result in benchmark_accuracy():
+        print("{model:<20} {accuracy:<12} {settings:<24} {nfev_total:>10} {drift:>10.1e} "
+              "{time_ms:>12.2f}".format(time_ms=result["wall_time"] * 1e3, **result))
+
+    print()
+    print("{:<20} {:>8} {:>8} {:>12}".format("analytic", "sigma_0", "q_0", "max_error"))
+    for result in benchmark_analytic():
+        print("{model:<20} {sigma_0:>8.2f} {q_0:>8.2f} {max_error:>12.1e}".format(**result))
+
+    print()
+    print("{:<20} {:>8} {:>10} {:>10} {:>10}".format(
+        "model", "age", "defined", "table[ms]", "query[ms]"))
+    for result in benchmark_observables():
+        print("{model:<20} {age:>8} {defined:>10} {table_ms:>10.1f} {query_ms:>10.1f}".format(
+            age="-" if result["age"] is None else "{:.4f}".format(result["age"]),
+            model=result["model"], defined=result["defined"],
+            table_ms=result["table_time"] * 1e3, query_ms=result["query_time"] * 1e3))
+
+    print()
+    print("{:<20} {:<8} {:>10} {:>12}".format("model", "level", "polygons", "frame[ms]"))
+    for result in benchmark_rendering():
+        print("{model:<20} {level:<8} {polygons:>10} {frame_ms:>12.1f}".format(
+            frame_ms=result["frame_time"] * 1e3, **result))
+
+    startup = benchmark_startup()
+    if "error" in startup:
+        print("startup: could not be measured ({})".format(startup["error"]))
+    else:
+        print("startup: {:.3f} s (budget {:.1f} s), deferred modules loaded: {} -> {}".format(
+            startup["elapsed"], startup["budget"], startup["deferred_loaded"] or "none",
+            "OK" if startup["within_budget"] else "OVER BUDGET"))
+
+    redraw = benchmark_redraw()
+    rss = [value for value in redraw["rss"] if value is not None]
+    if rss:
+        print("redraw: {:.2f} ms/redraw, RSS {:.1f} MiB -> {:.1f} MiB "
+              "(second half growth {:.2f} MiB)".format(
+                  redraw["time_per_redraw"] * 1e3, rss[0] / 1024**2, rss[-1] / 1024**2,
+                  redraw["rss_growth"] / 1024**2))
+
+
+def main(argv=None):
+    """
+    ベンチマークを実行して結果を表示する関数
+
+    Returns:
+        int: 終了コード．基準と比較して性能が低下した項目があれば1
+    """
+    parser = argparse.ArgumentParser(description="計算と描画の性能を計測する")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="設定ファイルのパス")
+    parser.add_argument("--mesh-sizes", type=int, nargs="+", default=list(DEFAULT_MESH_SIZES),
+                        help="回転角phiの分割数")
+    parser.add_argument("--repeats", type=int, default=3, help="計測の回数")
+    parser.add_argument("--no-render", action="store_true", help="draw_plotを計測しない")
+    parser.add_argument("-o", "--output", help="計測結果を保存するJSONファイル")
+    parser.add_argument("--baseline", help="比較する基準のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="性能の低下とみなす増加率（既定: 0.2）")
+    parser.add_argument("--suite", choices=("pipeline", "all"), default="pipeline",
+                        help="allの場合はその他のベンチマークも実行する")
+    args = parser.parse_args(argv)
+
+    records = benchmark_pipeline(args.config, tuple(args.mesh_sizes), args.repeats,
+                                 render=not args.no_render)
+    print_pipeline(records)
+    if args.output:
+        save_results(records, args.output)
+    if args.suite == "all":
+        print()
+        print_others()
+    if args.baseline:
+        regressions = compare_to_baseline(records, load_results(args.baseline), args.threshold)
+        print()
+        if not regressions:
+            print("no regressions against {} (threshold {:.0%})".format(
+                args.baseline, args.threshold))
+            return 0
+        for regression in regressions:
+            print("REGRESSION {model} mesh={mesh_size} {stage} {metric}: "
+                  "{baseline:.6g} -> {current:.6g} (x{ratio:.2f})".format(**regression))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
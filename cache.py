@@ -0,0 +1,231 @@
+"""計算結果のキャッシュ用モジュール．
+
+メモリ上のLRUキャッシュと，内容に基づくキーで保存するディスク上のnpzキャッシュの
+２段構成で，同じパラメーターでの再計算を避ける．
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+import numpy as np
+from surface import surface_from_arrays
+import timing
+
+# 既定のディスクキャッシュの保存先
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cosmological_simulation", "cache")
+# ディスクキャッシュの結果に必ず含まれる配列（回転面の復元には加えてphiかx_new等が必要）
+REQUIRED_ARRAYS = ("time_array", "scale_array", "event_times")
+
+
+def make_cache_key(parameters):
+    """
+    計算条件の辞書からキャッシュのキーを作る関数
+    Args:
+        parameters: 計算結果を一意に決めるパラメーターの辞書（JSONに変換できる値）
+
+    Returns:
+        str: パラメーターのSHA-256ハッシュ値
+    """
+    text = json.dumps(parameters, sort_keys=True, default=float)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def calculate_with_cache(instance, cache):
+    """
+    キャッシュを用いてFriedmannEquationIntegratorの計算結果を求める関数
+    回転面（既定の回転変換では時間座標，スケール因子，回転角の１次元配列のみ）と
+    イベントの時刻をまとめて保持する
+    Args:
+        instance: FriedmannEquationIntegratorのインスタンス
+        cache: ResultCacheのインスタンス．Noneの場合はキャッシュを使わない
+
+    Returns:
+        dict: "time_array", "scale_array", "surface", "event_times", "accuracy"
+              （時間方向ごとの積分法・許容誤差と第一積分のずれ）をキーとする辞書
+    """
+    key = make_cache_key(instance.cache_parameters())
+    with timing.span("cache") as record:
+        arrays = cache.get(key) if cache is not None else None
+        if record is not None:
+            record["hit"] = arrays is not None
+    if arrays is None:
+        arrays = dict(instance.calculate_surface().to_arrays())
+        arrays["event_times"] = np.array(json.dumps(instance.event_times))
+        arrays["accuracy"] = np.array(json.dumps(instance.accuracy_report))
+        if cache is not None:
+            cache.put(key, arrays)
+    return {
+        "time_array": arrays["time_array"],
+        "scale_array": arrays["scale_array"],
+        "surface": surface_from_arrays(arrays),
+        "event_times": json.loads(str(arrays["event_times"])),
+        "accuracy": json.loads(str(arrays["accuracy"])) if "accuracy" in arrays else {},
+    }
+
+
+class ResultCache:
+    """
+    計算結果（配列の辞書）を保持する２段構成のキャッシュクラス
+    """
+
+    def __init__(self, max_entries=16, cache_dir=DEFAULT_CACHE_DIR,
+                 max_disk_bytes=512 * 1024**2):
+        """
+        コンストラクタ
+        Args:
+            max_entries: メモリ上に保持する結果の最大数
+            cache_dir: ディスクキャッシュの保存先．Noneの場合はディスクに保存しない
+            max_disk_bytes: ディスクキャッシュの合計サイズの上限（バイト）
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.last_lookup = None
+        # バックグラウンドの計算スレッドからも使われるため，操作を排他制御する
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        """
+        キャッシュから結果を取り出すメソッド
+        Args:
+            key: キャッシュのキー
+
+        Returns:
+            dict or None: 配列の辞書．見つからない場合はNone
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                self.last_lookup = "memory"
+                return self.memory[key]
+            arrays = self._load_from_disk(key)
+            if arrays is not None:
+                self.disk_hits += 1
+                self.last_lookup = "disk"
+                self._put_memory(key, arrays)
+                return arrays
+            self.misses += 1
+            self.last_lookup = "miss"
+            return None
+
+    def contains(self, key):
+        """
+        結果がキャッシュにあるかどうかを，読み込まずに調べるメソッド（利用状況の集計には含めない）
+        """
+        with self.lock:
+            return key in self.memory or (self.cache_dir is not None and
+                                          os.path.exists(self._path(key)))
+
+    def put(self, key, arrays, memory=True):
+        """
+        結果をキャッシュに格納するメソッド
+        Args:
+            key: キャッシュのキー
+            arrays: 格納する配列の辞書
+            memory: Falseの場合はディスクにだけ格納する
+                    （多数のモデルの事前計算で，最近使った結果をメモリから追い出さないため）
+        """
+        with self.lock:
+            if memory:
+                self._put_memory(key, arrays)
+            self._save_to_disk(key, arrays)
+
+    def clear(self):
+        """
+        メモリ上のキャッシュを空にするメソッド
+        """
+        with self.lock:
+            self.memory.clear()
+
+    def status_text(self):
+        """
+        GUIの状態表示に用いるキャッシュの利用状況の文字列を返すメソッド
+        """
+        labels = {"memory": "キャッシュ（メモリ）から読み込み",
+                  "disk": "キャッシュ（ディスク）から読み込み",
+                  "miss": "新規に計算"}
+        return "{}　[ヒット: メモリ {} / ディスク {}，ミス: {}]".format(
+            labels.get(self.last_lookup, ""), self.memory_hits, self.disk_hits, self.misses)
+
+    def _put_memory(self, key, arrays):
+        """メモリ上のLRUキャッシュに格納し，上限を超えた古いものを捨てる"""
+        self.memory[key] = arrays
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def _load_from_disk(self, key):
+        """ディスクキャッシュからnpzファイルを読み込む（壊れたファイルは削除する）"""
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            # 書き込みが途中で止まったファイルなど，必要な配列が欠けたものも壊れたファイルとみなす
+            missing = [name for name in REQUIRED_ARRAYS if name not in arrays]
+            if "phi" not in arrays and "x_new" not in arrays:
+                missing.append("phi")
+            if missing:
+                raise KeyError(", ".join(missing))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # 最終利用時刻を更新し，容量超過時に古いものから捨てられるようにする
+        os.utime(path)
+        return arrays
+
+    def _save_to_disk(self, key, arrays):
+        """npzファイルとして書き出し，ディスクキャッシュの合計サイズを上限以下に保つ"""
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 書き込み途中のファイルを読まないよう，一時ファイルに書いてから置き換える
+        handle, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                np.savez(file, **arrays)
+            os.replace(temporary_path, self._path(key))
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """ディスクキャッシュの合計サイズが上限を超えていれば，最終利用時刻の古い順に削除する"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,154 @@
+"""モデルの一覧（設定ファイル）を読み込むためのモジュール．
+
+設定ファイルは読み込むたびに新しいConfigParserで１度だけ解析し，モデル名，sigma_0，q_0と，
+そこから決まる空間曲率K・宇宙項Lambdaを列ごとのnumpy配列に格納する．
+数値でない値や欠けた値を持つモデルは除外し，その理由をerrorsに記録する．
+ファイルの更新時刻と大きさが変わったときだけ読み込み直すため，何千ものモデルを含む
+設定ファイルでも，モデルの選択や絞り込みのたびに解析し直すことはない．
+"""
+import configparser
+import os
+import numpy as np
+from phase import curvature_and_lambda
+
+# モデルの選択欄に一度に表示するモデルの数の上限
+MAX_LISTED_MODELS = 500
+
+
+class ModelCatalog:
+    """
+    設定ファイルのモデルの一覧を配列として保持するクラス
+    """
+
+    def __init__(self, path=None):
+        """
+        コンストラクタ
+        Args:
+            path: 設定ファイルのパス．指定した場合はすぐに読み込む
+        """
+        self.path = None
+        self.signature = None
+        self.errors = []
+        self._set_rows([], [], [])
+        if path is not None:
+            self.load(path)
+
+    def _set_rows(self, names, sigma_0, q_0):
+        """モデルの配列と，名前から行の番号を引く辞書を作り直す"""
+        self.names = np.array(names, dtype=object)
+        self.sigma_0 = np.array(sigma_0, dtype=float)
+        self.q_0 = np.array(q_0, dtype=float)
+        self.K, self.Lambda = curvature_and_lambda(self.sigma_0, self.q_0)
+        # 大文字と小文字を区別せずに絞り込むための名前
+        self._folded_names = np.array([name.casefold() for name in names], dtype=str)
+        self._rows = {name: row for row, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    @staticmethod
+    def _file_signature(path):
+        """ファイルの更新時刻と大きさ（変更の検出に用いる）"""
+        status = os.stat(path)
+        return status.st_mtime_ns, status.st_size
+
+    def load(self, path):
+        """
+        設定ファイルを読み込むメソッド．以前に読み込んだモデルはすべて置き換える
+        Args:
+            path: 設定ファイルのパス
+
+        Raises:
+            OSError: ファイルを読めない場合
+            configparser.Error: 設定ファイルの書式に誤りがある場合
+        """
+        signature = self._file_signature(path)
+        # 前のファイルのモデルが混ざらないよう，毎回新しいConfigParserで解析する
+        config_ini = configparser.ConfigParser()
+        with open(path, encoding='utf-8') as file:
+            config_ini.read_file(file, source=path)
+        names, sigma_0, q_0, errors = [], [], [], []
+        for section in config_ini.sections():
+            try:
+                values = (config_ini.getfloat(section, "sigma_0"),
+                          config_ini.getfloat(section, "q_0"))
+            except (configparser.Error, ValueError) as error:
+                errors.append((section, str(error)))
+                continue
+            if not np.all(np.isfinite(values)):
+                errors.append((section, "sigma_0とq_0には有限の値を指定してください"))
+                continue
+            names.append(section)
+            sigma_0.append(values[0])
+            q_0.append(values[1])
+        self._set_rows(names, sigma_0, q_0)
+        self.errors = errors
+        self.path = path
+        self.signature = signature
+
+    def refresh(self):
+        """
+        読み込んだ設定ファイルが更新されていれば読み込み直すメソッド
+
+        Returns:
+            bool: 読み込み直した場合はTrue
+        """
+        if self.path is None:
+            return False
+        try:
+            if self._file_signature(self.path) == self.signature:
+                return False
+        except OSError:
+            # ファイルが削除された場合などは，読み込み済みのモデルをそのまま使う
+            return False
+        self.load(self.path)
+        return True
+
+    def parameters(self, name):
+        """
+        モデルのパラメーターを返すメソッド
+        Args:
+            name: モデル名
+
+        Returns:
+            (sigma_0, q_0, K, Lambda): 各値のfloatのタプル
+
+        Raises:
+            KeyError: モデルがない場合
+        """
+        row = self._rows[name]
+        return (float(self.sigma_0[row]), float(self.q_0[row]),
+                float(self.K[row]), float(self.Lambda[row]))
+
+    def filter(self, text="", limit=None):
+        """
+        モデル名で絞り込むメソッド．空白で区切った語をすべて含むモデルを選ぶ（大文字と小文字は区別しない）
+        Args:
+            text: 絞り込む文字列．空の場合はすべてのモデル
+            limit: 返すモデル名の数の上限．Noneの場合は制限しない
+
+        Returns:
+            list: 設定ファイルでの順に並んだモデル名のリスト
+        """
+        matched = np.ones(len(self.names), dtype=bool)
+        for term in str(text).casefold().split():
+            matched &= np.char.find(self._folded_names, term) >= 0
+        rows = np.flatnonzero(matched)
+        if limit is not None:
+            rows = rows[:limit]
+        return self.names[rows].tolist()
+
+    def members(self, names=None):
+        """
+        比較や事前計算に用いるComparisonMemberのリストを返すメソッド
+        Args:
+            names: モデル名のリスト．Noneの場合はすべてのモデル
+        """
+        from comparison import ComparisonMember
+
+        rows = range(len(self.names)) if names is None else [self._rows[name] for name in names]
+        return [ComparisonMember(self.names[row], self.sigma_0[row], self.q_0[row])
+                for row in rows]
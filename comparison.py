@@ -0,0 +1,196 @@
+"""複数のモデルを重ねて比較するためのモジュール．
+
+比較するモデルはそれぞれ計算条件のキャッシュのキーで識別し，キャッシュにない
+モデルだけをプロセスプールで並列に計算する．そのため，比較にモデルを１つ追加しても
+新たに計算するのはそのモデルだけとなる．結果は共通の時間座標Xの格子に再標本化する．
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cache import make_cache_key
+from surface import surface_from_arrays
+
+# 共通の時間座標Xの格子の点の数
+DEFAULT_GRID_SIZE = 600
+
+
+class ComparisonMember:
+    """
+    比較する１つのモデル（名前とパラメーター）を表すクラス
+    """
+
+    def __init__(self, label, sigma_0, q_0):
+        """
+        コンストラクタ
+        Args:
+            label: 凡例に表示する名前
+            sigma_0: 密度パラメーター
+            q_0: 減速パラメーター
+        """
+        self.label = label
+        self.sigma_0 = float(sigma_0)
+        self.q_0 = float(q_0)
+
+    @classmethod
+    def from_parameters(cls, sigma_0, q_0):
+        """
+        ユーザーが指定したパラメーターから作成するメソッド（名前はパラメーターの値とする）
+        """
+        return cls("sigma_0={:.2f}, q_0={:.2f}".format(float(sigma_0), float(q_0)),
+                   sigma_0, q_0)
+
+    def make_integrator(self):
+        """
+        このモデルを計算するFriedmannEquationIntegratorのインスタンスを作成するメソッド
+        GUIと同じく，時間方向の標本の数を固定した標本化を用いる
+        """
+        from calculate import (
+            FriedmannEquationIntegrator,
+            friedmann_equation,
+            rotate_coordinates,
+        )
+        from phase import curvature_and_lambda
+
+        K, Lambda = curvature_and_lambda(self.sigma_0, self.q_0)
+        return FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, self.sigma_0, self.q_0, K, Lambda,
+            sampling="adaptive")
+
+
+def _compute_member(member):
+    """
+    プロセスプールの各プロセスで１つのモデルを計算し，キャッシュに格納する形式で返す
+    （イベント関数を持つインスタンスはプロセス間で受け渡せないため，各プロセスで作成する）
+    """
+    instance = member.make_integrator()
+    arrays = dict(instance.calculate_surface().to_arrays())
+    arrays["event_times"] = np.array(json.dumps(instance.event_times))
+    arrays["accuracy"] = np.array(json.dumps(instance.accuracy_report))
+    return arrays
+
+
+def compute_members(members, cache=None, workers=None, progress_callback=None,
+                    stage="compare", keep_results=True):
+    """
+    複数のモデルの結果を求める関数
+    キャッシュにあるモデルはそのまま使い，ないモデルだけをプロセスプールで計算して
+    キャッシュに格納する．同じ条件のモデルが複数あっても１回だけ計算する
+    Args:
+        members: ComparisonMemberのリスト
+        cache: ResultCacheのインスタンス．Noneの場合はキャッシュを使わない
+        workers: プロセス数．Noneの場合はCPUの数，1の場合はプロセスプールを使わない
+        progress_callback: 進捗を (stage, 進捗の割合) で受け取る関数．
+                           この関数が例外を送出すると残りの計算を中止する
+        stage: 進捗の通知に用いる段階名
+        keep_results: Falseの場合は結果を読み込まず，キャッシュのディスクに格納するだけとする
+                      （多数のモデルを事前計算する場合にメモリを節約するため）
+
+    Returns:
+        arrays: 各モデルの計算結果（キャッシュに格納する配列の辞書）のリスト．
+                keep_resultsがFalseの場合，キャッシュになかったモデルはNone
+        computed: キャッシュになく新たに計算したモデルの数
+    """
+    keys = [make_cache_key(member.make_integrator().cache_parameters()) for member in members]
+    if keep_results:
+        arrays = [cache.get(key) if cache is not None else None for key in keys]
+        missing = [member_arrays is None for member_arrays in arrays]
+    else:
+        arrays = [None] * len(members)
+        missing = [cache is None or not cache.contains(key) for key in keys]
+    pending = {}
+    for index, key in enumerate(keys):
+        if missing[index]:
+            pending.setdefault(key, []).append(index)
+    done = [len(members) - sum(len(indices) for indices in pending.values())]
+
+    def store(key, member_arrays):
+        if cache is not None:
+            cache.put(key, member_arrays, memory=keep_results)
+        if keep_results:
+            for index in pending[key]:
+                arrays[index] = member_arrays
+        done[0] += len(pending[key])
+        if progress_callback is not None:
+            progress_callback(stage, done[0] / max(len(members), 1))
+
+    if progress_callback is not None:
+        progress_callback(stage, done[0] / max(len(members), 1))
+    if len(pending) <= 1 or workers == 1:
+        for key, indices in pending.items():
+            store(key, _compute_member(members[indices[0]]))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {key: executor.submit(_compute_member, members[indices[0]])
+                       for key, indices in pending.items()}
+            for key, future in futures.items():
+                store(key, future.result())
+        finally:
+            # 中止された場合は，まだ始まっていない計算を取り消す
+            executor.shutdown(wait=False, cancel_futures=True)
+    return arrays, len(pending)
+
+
+class ComparisonResult:
+    """
+    共通の時間座標Xの格子に再標本化した比較結果を表すクラス
+    """
+
+    def __init__(self, members, arrays, grid_size=DEFAULT_GRID_SIZE, computed=0):
+        """
+        コンストラクタ
+        Args:
+            members: ComparisonMemberのリスト
+            arrays: 各モデルの計算結果（キャッシュに格納する配列の辞書）のリスト
+            grid_size: 共通の時間座標Xの格子の点の数
+            computed: キャッシュになく新たに計算したモデルの数
+        """
+        self.members = members
+        self.computed = computed
+        self.labels = [member.label for member in members]
+        self.surfaces = [surface_from_arrays(member_arrays) for member_arrays in arrays]
+        self.event_times = [json.loads(str(member_arrays["event_times"]))
+                            for member_arrays in arrays]
+        profiles = [surface.profile() for surface in self.surfaces]
+        start = min(np.nanmin(time_array) for time_array, _ in profiles)
+        end = max(np.nanmax(time_array) for time_array, _ in profiles)
+        self.time_grid = np.linspace(start, end, grid_size)
+        # 各モデルの計算範囲の外側はNaNとする
+        self.scale_matrix = np.array([
+            np.interp(self.time_grid, time_array, scale_array, left=np.nan, right=np.nan)
+            for time_array, scale_array in profiles])
+
+
+class ModelComparison:
+    """
+    比較するモデルの組を保持し，キャッシュにないモデルだけを並列に計算するクラス
+    """
+
+    def __init__(self, members, workers=None, grid_size=DEFAULT_GRID_SIZE):
+        """
+        コンストラクタ
+        Args:
+            members: ComparisonMemberのリスト
+            workers: プロセス数．Noneの場合はCPUの数
+            grid_size: 共通の時間座標Xの格子の点の数
+        """
+        self.members = list(members)
+        self.workers = workers
+        self.grid_size = grid_size
+        self.computed = 0
+
+    def compute(self, cache=None, progress_callback=None):
+        """
+        すべてのモデルの結果を求めるメソッド
+        キャッシュにあるモデルはそのまま使い，ないモデルだけを計算してキャッシュに格納する
+        Args:
+            cache: ResultCacheのインスタンス．Noneの場合はキャッシュを使わない
+            progress_callback: 進捗を ("compare", 進捗の割合) で受け取る関数．
+                               この関数が例外を送出すると残りの計算を中止する
+
+        Returns:
+            ComparisonResult: 比較結果
+        """
+        arrays, self.computed = compute_members(self.members, cache, self.workers,
+                                                progress_callback)
+        return ComparisonResult(self.members, arrays, self.grid_size, self.computed)
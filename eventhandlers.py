@@ -1,97 +1,454 @@
-"""イベント処理用モジュール"""
-import numpy as np
+"""イベント処理用モジュール
+
+起動を速くするため，scipyを用いる計算用モジュールは初めて計算するときに，
+matplotlibを用いるグラフ出力用モジュールは初めてグラフを描画するときに読み込む．
+"""
+import configparser
+import os
 import PySimpleGUI as sg
-from calculate import (
-    FriedmannEquationIntegrator,
-    friedmann_equation,
-    rotate_coordinates,
+from cache import ResultCache
+from catalog import MAX_LISTED_MODELS, ModelCatalog
+from preview import PreviewDebouncer
+import timing
+from worker import (
+    COMPARE_DONE_EVENT,
+    COMPUTE_CANCELLED_EVENT,
+    COMPUTE_DONE_EVENT,
+    COMPUTE_ERROR_EVENT,
+    COMPUTE_PROGRESS_EVENT,
+    PRECOMPUTE_DONE_EVENT,
+    ComputationWorker,
 )
-from output import draw_figure_w_toolbar, draw_plot
 
 
 class EventHandlers:
     """
     イベントハンドラーをまとめたクラス
     """
-    def __init__(self, window, config_ini):
+    def __init__(self, window, catalog=None, cache=None, trace_path=None):
         self.window = window
-        self.config_ini = config_ini
-        self.x_new = None
-        self.y_new = None
-        self.z_new = None
+        self.catalog = catalog if catalog is not None else ModelCatalog()
+        self.cache = cache if cache is not None else ResultCache()
+        self.worker = ComputationWorker(window, self.cache)
+        # 設定ファイルの全モデルの事前計算は，通常の計算を中止しないよう別のワーカーで行う
+        self.precompute_worker = ComputationWorker(window, self.cache)
+        self.preview = PreviewDebouncer()
+        self._plot = None
+        self.refine_job = None
+        self.surface = None
+        # 比較に追加したユーザー指定のパラメーターの組（ComparisonMemberのリスト）
+        self.user_members = []
+        # 所要時間の計測結果をJSON Linesで追記するファイル（Noneの場合は書き出さない）
+        self.trace_path = trace_path
+
+    @property
+    def plot(self):
+        """
+        グラフを管理するPlotController．初めて参照されたときに作成する
+        """
+        if self._plot is None:
+            from output import PlotController
+
+            self._plot = PlotController(self.window['-CANVAS-'].TKCanvas,
+                                        self.window['-CONTROLS-'].TKCanvas)
+        return self._plot
 
     def handle_file_event(self, values):
         """
         設定ファイル読み込みイベント発生時の処理
         """
         file_path = values["-FILE-"]
-        self.config_ini.read(file_path, encoding='utf-8')
-        model_name = self.config_ini.sections()
-        self.window["-MODEL-"].Update(values=model_name)
+        # パスの入力途中など，ファイルが存在しない場合は何もしない
+        if not os.path.isfile(file_path):
+            return
+        try:
+            if file_path == self.catalog.path:
+                # 同じファイルは更新されている場合だけ読み込み直す
+                self.catalog.refresh()
+            else:
+                self.catalog.load(file_path)
+        except (OSError, configparser.Error) as error:
+            sg.popup_error('設定ファイルを読み込めませんでした。', str(error))
+            return
+        self._update_model_lists(values)
+        message = '{}個のモデルを読み込みました。'.format(len(self.catalog))
+        if self.catalog.errors:
+            message += '（値に誤りのある{}個のモデルを除外: {}）'.format(
+                len(self.catalog.errors), ", ".join(name for name, _ in self.catalog.errors[:3]))
+        self.window["-STATUS-"].Update(message)
+        if values.get("-PRECOMPUTE-"):
+            self.precompute_worker.submit_precompute(self.catalog)
+
+    def _update_model_lists(self, values):
+        """モデルの選択欄と比較するモデルの一覧を，絞り込みの文字列に一致するモデルで更新する"""
+        names = self.catalog.filter(values.get("-MODEL-FILTER-", ""), MAX_LISTED_MODELS)
+        self.window["-MODEL-"].Update(values=names)
+        self._update_comparison_list(values.get("-COMPARE-MODELS-", []), names)
+
+    def handle_model_filter_event(self, values):
+        """
+        モデルの絞り込みの文字列が変更されたときの処理
+        """
+        self._update_model_lists(values)
+
+    def handle_precompute_done_event(self, values):
+        """
+        設定ファイルの全モデルの事前計算が完了したときの処理
+        """
+        job_id, (count, computed) = values[PRECOMPUTE_DONE_EVENT]
+        if not self.precompute_worker.accept(job_id):
+            return
+        self.window["-STATUS-"].Update('{}個のモデルを事前計算しました（新規に計算: {}個）。'.format(
+            count, computed))
 
     def handle_model_event(self, values):
         """
         モデル選択イベント発生時の処理
         """
         model = str(values["-MODEL-"])
-        default_sigma = float(self.config_ini.get(model, "sigma_0"))
-        default_q = float(self.config_ini.get(model, "q_0"))
+        if self.catalog.refresh():
+            self._update_model_lists(values)
+        if model not in self.catalog:
+            return
+        default_sigma, default_q, _, _ = self.catalog.parameters(model)
         self.window["-SIGMA-"].Update(default_sigma)
         self.window["-Q-"].Update(default_q)
         self.window["-SIGMA-TEXT-"].Update(default_sigma)
         self.window["-Q-TEXT-"].Update(default_q)
+        self.cancel_computation()
+        self.request_preview(default_sigma, default_q, values)
 
     def handle_sigma_event(self, values):
         """
         sigma_0のテキストボックスにスライダーの値を反映する処理
         """
-        self.window["-SIGMA-TEXT-"].Update(values["-SIGMA-"])
+        self._sync_text("-SIGMA-TEXT-", values["-SIGMA-"], values["-SIGMA-TEXT-"])
+        self.cancel_computation()
+        self.request_preview(values["-SIGMA-"], values["-Q-"], values)
 
     def handle_q_event(self, values):
         """
         q_0のテキストボックスにスライダーの値を反映する処理
         """
-        self.window["-Q-TEXT-"].Update(values["-Q-"])
+        self._sync_text("-Q-TEXT-", values["-Q-"], values["-Q-TEXT-"])
+        self.cancel_computation()
+        self.request_preview(values["-SIGMA-"], values["-Q-"], values)
 
     def handle_sigma_text_event(self, values):
         """
         sigma_0のスライダーにテキストボックスの値を反映する処理
         """
-        self.window["-SIGMA-"].Update(values["-SIGMA-TEXT-"])
+        self._sync_slider("-SIGMA-", values["-SIGMA-TEXT-"], values["-SIGMA-"])
+        self.cancel_computation()
+        self.request_preview(values["-SIGMA-TEXT-"], values["-Q-TEXT-"], values)
 
     def handle_q_text_event(self, values):
         """
         q_0のスライダーにテキストボックスの値を反映する処理
         """
-        self.window["-Q-"].Update(values["-Q-TEXT-"])
+        self._sync_slider("-Q-", values["-Q-TEXT-"], values["-Q-"])
+        self.cancel_computation()
+        self.request_preview(values["-SIGMA-TEXT-"], values["-Q-TEXT-"], values)
+
+    def _sync_text(self, key, slider_value, text_value):
+        """スライダーの値が表示中の値と異なるときだけテキストボックスを更新する"""
+        try:
+            if float(text_value) == float(slider_value):
+                return
+        except ValueError:
+            pass
+        self.window[key].Update(slider_value)
+
+    def _sync_slider(self, key, text_value, slider_value):
+        """テキストボックスの値が数値で，スライダーの値と異なるときだけスライダーを更新する"""
+        try:
+            if float(text_value) == float(slider_value):
+                return
+        except ValueError:
+            # 入力途中の文字列はスライダーに反映しない
+            return
+        self.window[key].Update(text_value)
+
+    def request_preview(self, sigma_0, q_0, values):
+        """
+        ライブプレビューが有効なとき，パラメーターの変更をプレビューの予約に登録する処理
+        """
+        if not values.get("-LIVE-PREVIEW-"):
+            return
+        try:
+            self.preview.request(float(sigma_0), float(q_0))
+        except ValueError:
+            return
+
+    def handle_live_preview_event(self, values):
+        """
+        ライブプレビューの切り替え時の処理
+        """
+        if values["-LIVE-PREVIEW-"]:
+            self.request_preview(values["-SIGMA-TEXT-"], values["-Q-TEXT-"], values)
+        else:
+            self.preview.cancel()
+
+    def handle_timeout_event(self, values):
+        """
+        デバウンスの待ち時間が過ぎたときの処理
+        プレビュー曲線を描画し，操作が落ち着いたら通常の精度で回転面を計算する
+        """
+        action = self.preview.due()
+        if action is None:
+            return
+        sigma_0, q_0 = self.preview.parameters
+        if action == "preview":
+            from preview import compute_preview_curve
+
+            time_array, scale_array = compute_preview_curve(sigma_0, q_0)
+            self.draw_preview(time_array, scale_array)
+        elif action == "refine":
+            self.refine_job = self.submit_computation(sigma_0, q_0,
+                                                      values.get("-ACCURACY-", "standard"))
+
+    def draw_preview(self, time_array, scale_array):
+        """
+        プレビュー曲線を描画する処理
+        """
+        self.plot.show_preview(time_array, scale_array)
 
     def handle_execute_event(self, values):
         """
         実行ボタンがクリックされた後の計算処理
         """
-        sigma_0 = float(values["-SIGMA-TEXT-"])
-        q_0 = float(values["-Q-TEXT-"])
-        K = np.sign(3 * sigma_0 - q_0 - 1.0)
-        Lambda = 3 * (sigma_0 - q_0)
+        self.preview.cancel()
+        self.refine_job = None
+        self.submit_computation(float(values["-SIGMA-TEXT-"]), float(values["-Q-TEXT-"]),
+                                values["-ACCURACY-"])
+
+    def submit_computation(self, sigma_0, q_0, accuracy="standard"):
+        """
+        計算をバックグラウンドで開始する処理
+        Args:
+            sigma_0: 密度パラメーター
+            q_0: 減速パラメーター
+            accuracy: 精度の段階（ACCURACY_PRESETSの名前または"auto"）
 
+        Returns:
+            int: 投入した計算の番号
+        """
+        from calculate import (
+            FriedmannEquationIntegrator,
+            friedmann_equation,
+            rotate_coordinates,
+        )
+        from phase import curvature_and_lambda
+
+        K, Lambda = curvature_and_lambda(sigma_0, q_0)
+
+        # 時間方向の標本の数を固定し，描画の負荷がパラメーターによらないようにする
         instance = FriedmannEquationIntegrator(
-            friedmann_equation, rotate_coordinates, sigma_0, q_0, K, Lambda)
-        (self.x_new,
-         self.y_new,
-         self.z_new) = instance.calculate_rotated_coordinates()
-        sg.popup_ok('計算が実行されました。')
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K, Lambda,
+            sampling="adaptive", accuracy=accuracy)
+        timing.start_run("sigma_0={:.2f}, q_0={:.2f}".format(sigma_0, q_0),
+                         sigma_0=sigma_0, q_0=q_0)
+        # 計算は別スレッドで行い，完了するとCOMPUTE_DONE_EVENTが届く
+        job_id = self.worker.submit(instance)
+        self.window["-PROGRESS-"].UpdateBar(0)
+        self.window["-STATUS-"].Update('計算中...')
+        return job_id
+
+    def cancel_computation(self):
+        """
+        実行中の計算を中止する処理
+
+        Returns:
+            bool: 中止した計算があった場合はTrue
+        """
+        if not self.worker.cancel():
+            return False
+        self.window["-PROGRESS-"].UpdateBar(0)
+        self.window["-STATUS-"].Update('計算を中止しました。')
+        return True
+
+    def handle_compute_progress_event(self, values):
+        """
+        計算の進捗をプログレスバーに反映する処理
+        """
+        job_id, percent = values[COMPUTE_PROGRESS_EVENT]
+        if job_id == self.worker.current_job:
+            self.window["-PROGRESS-"].UpdateBar(percent)
+
+    def handle_compute_done_event(self, values):
+        """
+        バックグラウンドの計算が完了したときの処理．古い計算の結果は破棄する
+        """
+        job_id, result = values[COMPUTE_DONE_EVENT]
+        if not self.worker.accept(job_id):
+            return
+        self.surface = result["surface"]
+        self.window["-PROGRESS-"].UpdateBar(100)
+        self.window["-STATUS-"].Update(self.cache.status_text())
+        self.show_timing(timing.current_run())
+        if job_id == self.refine_job:
+            # ライブプレビュー後の自動計算ではポップアップを出さずに回転面を描画する
+            self.refine_job = None
+            self.handle_plot_event(None)
+            return
+        sg.popup_ok('計算が実行されました。',
+                    *self.format_event_times(result["event_times"]),
+                    *self.format_accuracy(result["accuracy"]))
+
+    def _update_comparison_list(self, selected, names=None):
+        """
+        比較するモデルの一覧を，設定ファイルのモデルとユーザー指定の組で更新する
+        選択中のモデルは絞り込みに一致しなくても一覧に残す
+        """
+        if names is None:
+            names = self.catalog.filter("", MAX_LISTED_MODELS)
+        labels = names + [label for label in selected
+                          if label not in names and label in self.catalog]
+        labels += [member.label for member in self.user_members]
+        self.window["-COMPARE-MODELS-"].Update(
+            values=labels, set_to_index=[labels.index(label) for label in selected
+                                         if label in labels])
+
+    def handle_compare_add_event(self, values):
+        """
+        現在のパラメーターを比較するモデルの一覧に追加する処理
+        """
+        from comparison import ComparisonMember
+
+        # テキストボックスは入力途中の場合があるため，スライダーの値を用いる
+        member = ComparisonMember.from_parameters(values["-SIGMA-"], values["-Q-"])
+        if all(member.label != other.label for other in self.user_members):
+            self.user_members.append(member)
+        self._update_comparison_list(list(values["-COMPARE-MODELS-"]) + [member.label])
+
+    def handle_compare_event(self, values):
+        """
+        比較ボタンがクリックされたときの処理．選択したモデルをまとめて計算する
+        キャッシュにあるモデルは再計算しない
+        """
+        from comparison import ModelComparison
+
+        # 比較は所要時間の計測の対象としないため，計測中の実行はここで区切る
+        self.show_timing(timing.finish_run())
+        selected = values["-COMPARE-MODELS-"]
+        if not selected:
+            sg.popup_error('比較するモデルを選択してください。')
+            return
+        user_members = {member.label: member for member in self.user_members}
+        # 設定ファイルが読み込み直されて消えたモデルは除く
+        members = [user_members[label] if label in user_members
+                   else self.catalog.members([label])[0]
+                   for label in selected if label in user_members or label in self.catalog]
+        self.preview.cancel()
+        self.refine_job = None
+        self.worker.submit_comparison(ModelComparison(members))
+        self.window["-PROGRESS-"].UpdateBar(0)
+        self.window["-STATUS-"].Update('比較する{}個のモデルを計算中...'.format(len(members)))
+
+    def handle_compare_done_event(self, values):
+        """
+        比較の計算が完了したときの処理．結果を１つのfigureに重ねて描画する
+        """
+        job_id, result = values[COMPARE_DONE_EVENT]
+        if not self.worker.accept(job_id):
+            return
+        self.window["-PROGRESS-"].UpdateBar(100)
+        self.window["-STATUS-"].Update('{}個のモデルを比較（新規に計算: {}個）'.format(
+            len(result.members), result.computed))
+        self.plot.show_comparison(result, surfaces=values["-COMPARE-SURFACES-"])
+
+    def handle_compute_cancelled_event(self, values):
+        """
+        バックグラウンドの計算が中止されたときの処理
+        """
+        job_id = values[COMPUTE_CANCELLED_EVENT]
+        if not self.worker.accept(job_id):
+            self.precompute_worker.accept(job_id)
+
+    def handle_compute_error_event(self, values):
+        """
+        バックグラウンドの計算でエラーが発生したときの処理
+        """
+        job_id, error = values[COMPUTE_ERROR_EVENT]
+        if not self.worker.accept(job_id):
+            if self.precompute_worker.accept(job_id):
+                self.window["-STATUS-"].Update('事前計算に失敗しました: {}'.format(error))
+            return
+        self.window["-PROGRESS-"].UpdateBar(0)
+        self.window["-STATUS-"].Update('計算に失敗しました。')
+        sg.popup_error('計算に失敗しました。', str(error))
+
+    @staticmethod
+    def format_event_times(event_times):
+        """
+        積分中に検出した宇宙の特徴的な時刻をポップアップ表示用の文字列にする処理
+        """
+        if not event_times:
+            return []
+        lines = []
+        if event_times["age"] is not None:
+            lines.append('宇宙年齢 H0 t: {:.4f}'.format(event_times["age"]))
+        for time in event_times["bounce"]:
+            lines.append('バウンス X: {:.4f}'.format(time))
+        for time in event_times["turnaround"]:
+            lines.append('膨張から収縮への転回 X: {:.4f}'.format(time))
+        if event_times["big_crunch"] is not None:
+            lines.append('ビッグクランチ X: {:.4f}'.format(event_times["big_crunch"]))
+        if event_times["runaway"] is not None:
+            lines.append('スケール因子の発散 X: {:.4f}'.format(event_times["runaway"]))
+        return lines
+
+    def close(self):
+        """
+        アプリの終了時の処理．バックグラウンドの計算を中止する
+        """
+        self.worker.cancel()
+        self.precompute_worker.cancel()
+
+    def handle_timing_event(self, values):
+        """
+        所要時間の計測の切り替え時の処理
+        """
+        if values["-TIMING-"]:
+            timing.enable(self.trace_path)
+        else:
+            timing.disable()
+        self.window["-TIMING-STATUS-"].Update("")
+
+    def show_timing(self, run):
+        """
+        実行の段階ごとの所要時間を状態表示に反映する処理
+        """
+        if run is not None:
+            self.window["-TIMING-STATUS-"].Update(run.status_text())
+
+    @staticmethod
+    def format_accuracy(accuracy):
+        """
+        時間方向ごとの積分法・許容誤差と第一積分のずれをポップアップ表示用の文字列にする処理
+        """
+        labels = {"future": "未来", "past": "過去"}
+        lines = []
+        for stage in ("future", "past"):
+            report = accuracy.get(stage)
+            if report is None or report["drift"] is None:
+                continue
+            setting = report["method"]
+            if report["rtol"] is not None:
+                setting += ", rtol={:.0e}".format(report["rtol"])
+            lines.append('第一積分のずれ（{}）: {:.1e}（{}）'.format(
+                labels[stage], report["drift"], setting))
+        return lines
 
     def handle_plot_event(self, values):
         """
         グラフ表示ボタンがクリックされたときの処理
         """
-        if (self.x_new is not None and
-                self.y_new is not None and
-                self.z_new is not None):
-            fig_3d = draw_plot(self.x_new, self.y_new, self.z_new)
-            draw_figure_w_toolbar(
-                self.window['-CANVAS-'].TKCanvas,
-                fig_3d,
-                self.window['-CONTROLS-'].TKCanvas)
+        if self.surface is not None:
+            if timing.is_enabled() and timing.current_run() is None:
+                # 計算済みの回転面を再び描画する場合は描画だけを１回の実行とする
+                timing.start_run("redraw")
+            self.plot.show_surface(self.surface)
+            self.show_timing(timing.finish_run())
         else:
             sg.popup_error('実行ボタンを先にクリックしてください。')
@@ -12,19 +12,28 @@ class Widget:
     @staticmethod
     def make_dpi_aware():
         """
-        DPIに関連する問題を修正するための関数
+        DPIに関連する問題を修正するための関数（Windows 8以降のみ．その他の環境では何もしない）
         """
-        if int(platform.release()) >= 8:
+        if platform.system() != "Windows":
+            return
+        try:
+            release = int(platform.release())
+        except ValueError:
+            return
+        if release >= 8:
             ctypes.windll.shcore.SetProcessDpiAwareness(True)
 
     @staticmethod
-    def create_main_window():
+    def create_main_window(tracing=False):
         """
         メインウィンドウのレイアウトを定義する関数
+        Args:
+            tracing: 所要時間の計測のチェックボックスの初期値
         """
         file_selection_layout = [
             [sg.Text("設定ファイルを選択: ")],
-            [sg.Text("モデルを選択: ")]
+            [sg.Text("モデルを選択: ")],
+            [sg.Text("モデル名で絞り込み: ")]
         ]
 
         model_selection_layout = [
@@ -35,7 +44,9 @@ class Widget:
                               file_types=(("設定ファイル", "*.ini"), ))
             ],
             [sg.Combo(values=[""], size=(30, 1), key="-MODEL-",
-                      readonly=True, enable_events=True)]
+                      readonly=True, enable_events=True)],
+            [sg.InputText("", size=(15, 1), key="-MODEL-FILTER-", enable_events=True),
+             sg.Checkbox('全モデルを事前計算', default=False, key="-PRECOMPUTE-")]
         ]
 
         parameter_text_layout = [
@@ -56,11 +67,29 @@ class Widget:
             [sg.InputText(default_text="0.00", size=(7, 1), key="-Q-TEXT-", enable_events=True)]
         ]
 
+        comparison_layout = [
+            [sg.Listbox(values=[], size=(30, 4), key="-COMPARE-MODELS-",
+                        select_mode=sg.LISTBOX_SELECT_MODE_MULTIPLE)],
+            [sg.Button('現在の値を追加', key="-COMPARE-ADD-"),
+             sg.Button('比較', key="-COMPARE-"),
+             sg.Checkbox('回転面で比較', default=False, key="-COMPARE-SURFACES-")]
+        ]
+
         figure_canvas_control = [sg.Canvas(key='-CONTROLS-')]
         figure_canvas = [sg.Canvas(key='-CANVAS-', size=(1500, 700))]
 
         run_buttons_layout = [
-            [sg.Submit('実行'), sg.Cancel('中止'), sg.Button('グラフ表示')]
+            [sg.Submit('実行'), sg.Cancel('中止'), sg.Button('グラフ表示'),
+             sg.Text('精度:'),
+             sg.Combo(values=["standard", "preview", "publication", "auto"],
+                      default_value="standard", size=(11, 1), key="-ACCURACY-", readonly=True),
+             sg.Checkbox('ライブプレビュー', default=False, key="-LIVE-PREVIEW-",
+                         enable_events=True),
+             sg.Checkbox('所要時間を計測', default=tracing, key="-TIMING-",
+                         enable_events=True)],
+            [sg.ProgressBar(100, orientation='h', size=(40, 10), key="-PROGRESS-")],
+            [sg.Text("", size=(80, 1), key="-STATUS-", justification='c')],
+            [sg.Text("", size=(160, 1), key="-TIMING-STATUS-", justification='c')]
         ]
 
         frame_read_file = sg.Frame('データの読み込み',
@@ -83,8 +112,10 @@ class Widget:
                                    ]
                                    )
 
+        frame_comparison = sg.Frame('モデルの比較', comparison_layout)
+
         layout = [
-            [frame_read_file, frame_parameter],
+            [frame_read_file, frame_parameter, frame_comparison],
             [sg.Column(run_buttons_layout, justification='c')],
             [figure_canvas_control],
             [figure_canvas]
@@ -0,0 +1,229 @@
+"""GUIを用いずに設定ファイルのすべてのモデルを計算するコマンドラインツール．
+
+PySimpleGUIやTk，対話的なmatplotlibのバックエンドを読み込まないため，
+ディスプレイのない計算機でも実行できる．
+
+使い方:
+    python headless.py config.ini -o results --png
+    python headless.py "configs/*.ini" -o results --workers 4
+
+終了コード:
+    0: すべてのモデルの計算に成功した
+    1: 計算に失敗したモデルがあった
+    2: 引数や設定ファイルに誤りがあった
+"""
+import argparse
+import configparser
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from calculate import (
+    ACCURACY_PRESETS,
+    INTEGRATION_METHODS,
+    SAMPLING_POLICIES,
+    FriedmannEquationIntegrator,
+    friedmann_equation,
+    rotate_coordinates,
+)
+from phase import curvature_and_lambda
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+
+def expand_config_paths(patterns):
+    """
+    設定ファイルのパスまたはglobパターンを展開する関数
+    Args:
+        patterns: パスまたはglobパターンのリスト
+
+    Returns:
+        list: 重複を除いた設定ファイルのパスのリスト
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def load_jobs(config_paths, sections=None):
+    """
+    設定ファイルから計算するモデルの一覧を作る関数
+    Args:
+        config_paths: 設定ファイルのパスのリスト
+        sections: 計算するモデル名のリスト．Noneの場合はすべて
+
+    Returns:
+        list: (設定ファイルのパス, モデル名, sigma_0, q_0) のリスト
+    """
+    jobs = []
+    for config_path in config_paths:
+        if not os.path.isfile(config_path):
+            raise FileNotFoundError(config_path)
+        config_ini = configparser.ConfigParser()
+        config_ini.read(config_path, encoding='utf-8')
+        for section in config_ini.sections():
+            if sections is not None and section not in sections:
+                continue
+            jobs.append((config_path, section,
+                         float(config_ini.get(section, "sigma_0")),
+                         float(config_ini.get(section, "q_0"))))
+    return jobs
+
+
+def _output_stem(config_path, section):
+    """出力ファイル名の共通部分（設定ファイル名とモデル名）を作る"""
+    name = "{}_{}".format(os.path.splitext(os.path.basename(config_path))[0], section)
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def run_model(config_path, section, sigma_0, q_0, output_dir, render=False,
+              sampling="adaptive", method="RK45", accuracy=None, target_drift=1e-8):
+    """
+    １つのモデルを計算し，結果をファイルに書き出す関数（プロセスプールの各プロセスで実行する）
+    Args:
+        config_path: 設定ファイルのパス
+        section: モデル名
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        output_dir: 出力先のディレクトリ
+        render: Trueの場合は回転面のPNG画像も書き出す
+        sampling: 時間座標Xの標本化の方法
+        method: solve_ivpの積分法
+        accuracy: 精度の段階（ACCURACY_PRESETSの名前または"auto"）．Noneの場合はmethodの既定の許容誤差
+        target_drift: accuracyが"auto"の場合に許容する第一積分の相対的なずれ
+
+    Returns:
+        dict: 計算結果の概要
+    """
+    stem = _output_stem(config_path, section)
+    summary = {"config": config_path, "model": section, "sigma_0": sigma_0, "q_0": q_0}
+    start = time.perf_counter()
+    try:
+        # GUIと同じく，パラメーターから空間曲率と宇宙項を決める
+        K, Lambda = curvature_and_lambda(sigma_0, q_0)
+        instance = FriedmannEquationIntegrator(
+            friedmann_equation, rotate_coordinates, sigma_0, q_0, K, Lambda,
+            sampling=sampling, method=method, accuracy=accuracy, target_drift=target_drift)
+        surface = instance.calculate_surface()
+        files = {"trajectory": os.path.join(output_dir, stem + ".npz"),
+                 "events": os.path.join(output_dir, stem + ".json")}
+        np.savez(files["trajectory"], **surface.to_arrays())
+        with open(files["events"], "w", encoding="utf-8") as file:
+            json.dump({"model": section, "sigma_0": sigma_0, "q_0": q_0,
+                       "K": float(K), "Lambda": float(Lambda),
+                       "event_times": instance.event_times,
+                       "accuracy": instance.accuracy_report}, file, indent=2)
+        if render:
+            from render import render_surface
+
+            files["png"] = os.path.join(output_dir, stem + ".png")
+            render_surface(surface, files["png"])
+    except Exception as error:  # 1つのモデルの失敗で全体を止めない
+        summary.update(status="error", error="{}: {}".format(type(error).__name__, error))
+    else:
+        summary.update(status="ok", files=files, event_times=instance.event_times,
+                       accuracy=instance.accuracy_report)
+    summary["wall_time"] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(jobs, output_dir, render=False, workers=None, sampling="adaptive",
+              method="RK45", accuracy=None, target_drift=1e-8):
+    """
+    モデルの一覧をプロセスプールで計算する関数
+    Args:
+        jobs: load_jobsの戻り値
+        output_dir: 出力先のディレクトリ
+        render: Trueの場合は回転面のPNG画像も書き出す
+        workers: プロセス数．1の場合はプロセスプールを使わずに順に計算する
+        sampling: 時間座標Xの標本化の方法
+        method, accuracy, target_drift: 積分法と精度（run_modelを参照）
+
+    Returns:
+        list: モデルごとの計算結果の概要のリスト（jobsと同じ順）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    arguments = [job + (output_dir, render, sampling, method, accuracy, target_drift)
+                 for job in jobs]
+    if workers == 1 or len(jobs) <= 1:
+        return [run_model(*argument) for argument in arguments]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_model, *argument) for argument in arguments]
+        return [future.result() for future in futures]
+
+
+def parse_arguments(argv=None):
+    """
+    コマンドライン引数を解析する関数
+    """
+    parser = argparse.ArgumentParser(
+        description="設定ファイルのすべてのモデルについてフリードマン方程式をGUIなしで計算する")
+    parser.add_argument("configs", nargs="+",
+                        help="設定ファイルのパスまたはglobパターン")
+    parser.add_argument("-o", "--output-dir", default="results",
+                        help="結果の出力先のディレクトリ（既定: results）")
+    parser.add_argument("-s", "--section", action="append", dest="sections",
+                        help="計算するモデル名（複数指定可．既定: すべて）")
+    parser.add_argument("--png", action="store_true",
+                        help="回転面のPNG画像も書き出す")
+    parser.add_argument("--sampling", choices=SAMPLING_POLICIES,
+                        default="adaptive",
+                        help="時間座標Xの標本化の方法（既定: adaptive）")
+    parser.add_argument("--method", choices=INTEGRATION_METHODS, default="RK45",
+                        help="積分法（既定: RK45）")
+    parser.add_argument("--accuracy", choices=tuple(ACCURACY_PRESETS) + ("auto",),
+                        default=None,
+                        help="精度の段階．指定すると--methodより優先する．"
+                             "autoは第一積分のずれが--target-drift以下となる最も安い設定を選ぶ")
+    parser.add_argument("--target-drift", type=float, default=1e-8,
+                        help="--accuracy autoで許容する第一積分の相対的なずれ（既定: 1e-8）")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="プロセス数（既定: CPUの数）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    メイン関数．概要をJSONで標準出力と出力先のsummary.jsonに書き出し，終了コードを返す
+    """
+    args = parse_arguments(argv)
+    config_paths = expand_config_paths(args.configs)
+    try:
+        jobs = load_jobs(config_paths, args.sections)
+    except (FileNotFoundError, configparser.Error, ValueError) as error:
+        print(json.dumps({"status": "error", "error": str(error)}, ensure_ascii=False),
+              file=sys.stderr)
+        return EXIT_USAGE
+    if not jobs:
+        print(json.dumps({"status": "error", "error": "計算するモデルがありません"},
+                         ensure_ascii=False), file=sys.stderr)
+        return EXIT_USAGE
+
+    results = run_batch(jobs, args.output_dir, args.png, args.workers, args.sampling,
+                        args.method, args.accuracy, args.target_drift)
+    failed = sum(result["status"] != "ok" for result in results)
+    summary = {"status": "ok" if failed == 0 else "failed",
+               "models": len(results),
+               "failed": failed,
+               "output_dir": args.output_dir,
+               "results": results}
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as file:
+        file.write(text)
+    print(text)
+    return EXIT_SUCCESS if failed == 0 else EXIT_FAILURE
+
+
+"""プログラムの実行"""
+if __name__ == "__main__":
+    sys.exit(main())
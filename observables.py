@@ -0,0 +1,296 @@
+"""積分結果の密な出力から観測量をまとめて求めるためのモジュール．
+
+時間座標はハッブル時間 1/H_0，距離はハッブル距離 c/H_0 を単位とする．
+フリードマン方程式 Y'' = -sigma_0/Y^2 + (sigma_0 - q_0)Y から，
+    ハッブルパラメーター  h = H/H_0 = Y'/Y
+    減速パラメーター      q = -Y Y''/Y'^2
+    物質の密度パラメーター Omega_m = 2 sigma_0 / (Y^3 h^2)
+    宇宙項の密度パラメーター Omega_Lambda = (sigma_0 - q_0) / h^2
+    曲率の密度パラメーター Omega_k = (1 - 3 sigma_0 + q_0) / Y'^2
+    赤方偏移 z = 1/Y - 1
+となる．距離は共形時間 eta = ∫dX/Y の累積積分から求める．
+赤方偏移を指定した問い合わせでは，Y = 1/(1 + z) と第一積分
+    Y'^2 = 2 sigma_0 / Y + (sigma_0 - q_0) Y^2 + (1 - 3 sigma_0 + q_0)
+からY'が決まるため，積分結果を再び評価するのは時刻と距離の表の補間だけとなる．
+"""
+import numpy as np
+
+# 観測量の表を作る時間座標Xの点の数
+DEFAULT_TABLE_SIZE = 4096
+# 赤方偏移から時刻を求めるニュートン法の反復回数
+NEWTON_ITERATIONS = 3
+
+
+def cumulative_hermite_trapezoid(values, derivatives, time_array):
+    """
+    端点補正付き台形則による累積積分を求める関数
+    区間ごとに h/2 (f0 + f1) + h^2/12 (f0' - f1') を加えるため，
+    不等間隔の点でもシンプソン則と同じ４次の精度となる
+    Args:
+        values: 被積分関数の値 f
+        derivatives: 被積分関数の微分 f'
+        time_array: 昇順の積分変数の配列
+
+    Returns:
+        np.ndarray: time_array[0] からの累積積分（先頭は0）
+    """
+    h = np.diff(time_array)
+    pieces = (h / 2 * (values[:-1] + values[1:]) +
+              h**2 / 12 * (derivatives[:-1] - derivatives[1:]))
+    return np.concatenate([[0.0], np.cumsum(pieces)])
+
+
+def _hermite(nodes, values, slopes, x, index):
+    """
+    節点での値と微分による３次エルミート補間の値と微分を求める
+    Args:
+        nodes: 昇順の節点
+        values: 節点での値
+        slopes: 節点での微分
+        x: 評価する点の配列
+        index: 各点が属する区間の番号（nodes[index] <= x <= nodes[index + 1]）
+
+    Returns:
+        value: 補間した値
+        derivative: 補間した値の微分
+    """
+    h = nodes[index + 1] - nodes[index]
+    s = (x - nodes[index]) / h
+    value = ((2*s**3 - 3*s**2 + 1) * values[index] + (s**3 - 2*s**2 + s) * h * slopes[index]
+             + (-2*s**3 + 3*s**2) * values[index + 1] + (s**3 - s**2) * h * slopes[index + 1])
+    derivative = ((6*s**2 - 6*s) / h * values[index] + (3*s**2 - 4*s + 1) * slopes[index]
+                  + (-6*s**2 + 6*s) / h * values[index + 1] + (3*s**2 - 2*s) * slopes[index + 1])
+    return value, derivative
+
+
+def _transverse(comoving_distance, omega_curvature):
+    """空間曲率を考慮した横方向の共動距離 D_M を求める"""
+    if omega_curvature > 0:
+        root = np.sqrt(omega_curvature)
+        return np.sinh(root * comoving_distance) / root
+    if omega_curvature < 0:
+        root = np.sqrt(-omega_curvature)
+        return np.sin(root * comoving_distance) / root
+    return comoving_distance
+
+
+class Observables:
+    """
+    １回の積分結果から，ハッブルパラメーター，減速パラメーター，密度パラメーター，
+    赤方偏移，宇宙年齢，ルックバックタイム，距離をまとめて求めるクラス
+
+    赤方偏移に関する量は，現在（X = 0）を含む膨張している区間で定義する
+    （その外側の赤方偏移に対してはNaNを返す）
+    """
+
+    def __init__(self, integrator, table_size=DEFAULT_TABLE_SIZE):
+        """
+        コンストラクタ．未来方向・過去方向に１回ずつ積分し，観測量の表を作る
+        Args:
+            integrator: FriedmannEquationIntegratorのインスタンス
+            table_size: 観測量の表を作る時間座標Xの点の数
+        """
+        self.integrator = integrator
+        self.sigma_0 = float(integrator.sigma_0)
+        self.q_0 = float(integrator.q_0)
+        self.omega_curvature_0 = 1.0 - 3.0 * self.sigma_0 + self.q_0
+        self.sol_plus = integrator.integrate(integrator.time_plus)
+        self.sol_minus = integrator.integrate(integrator.time_minus)
+        self.event_times = integrator.detect_events(self.sol_plus, self.sol_minus)
+        integrator.event_times = self.event_times
+        self.age = self.event_times["age"]
+
+        lower, upper = self._expanding_interval()
+        self.time_array = self._table_times(lower, upper, int(table_size))
+        self.scale_array, self.derivative_array = self.evaluate(self.time_array)
+        # 共形時間 eta(X) - eta(0)．被積分関数 1/Y の微分は -Y'/Y^2
+        conformal_time = cumulative_hermite_trapezoid(
+            1.0 / self.scale_array, -self.derivative_array / self.scale_array**2,
+            self.time_array)
+        self.conformal_time = conformal_time - np.interp(0.0, self.time_array, conformal_time)
+
+    def _expanding_interval(self):
+        """現在を含み，Y' > 0 である時間座標Xの区間を求める"""
+        lower = float(np.min(self.sol_minus.t))
+        upper = float(np.max(self.sol_plus.t))
+        for time in self.event_times["turnaround"] + self.event_times["bounce"]:
+            if time < 0.0:
+                lower = max(lower, time)
+            elif time > 0.0:
+                upper = min(upper, time)
+        return lower, upper
+
+    def _table_times(self, lower, upper, table_size):
+        """
+        等間隔の点と，log Yが等間隔になる点を合わせた表の時間座標Xを求める
+        （ビッグバン近傍のYの急な変化を細かく分解するため）
+        解析解はビッグバンでY = 0となるため，Yが特異点の閾値以上の範囲に限る
+        """
+        uniform = np.linspace(lower, upper, table_size)
+        scale_factor = self.evaluate(uniform)[0]
+        floor = max(scale_factor[0], self.integrator.singularity_threshold)
+        targets = np.exp(np.linspace(np.log(floor), np.log(scale_factor[-1]), table_size))
+        log_uniform = np.interp(targets, scale_factor, uniform)
+        uniform = uniform[scale_factor >= floor]
+        return np.unique(np.concatenate([uniform, log_uniform, [0.0]]))
+
+    def evaluate(self, time_array):
+        """
+        時間座標Xにおけるスケール因子YとdY/dXを密な出力から求めるメソッド
+        過去と未来の積分結果をそれぞれ１回の呼び出しでまとめて評価する
+        Args:
+            time_array: 時間座標Xの配列
+
+        Returns:
+            scale_array: スケール因子Y
+            derivative_array: dY/dX
+        """
+        time_array = np.asarray(time_array, dtype=float)
+        variables = np.empty((2,) + time_array.shape)
+        past = time_array < 0.0
+        for mask, sol in ((past, self.sol_minus), (~past, self.sol_plus)):
+            if mask.any():
+                variables[:, mask] = np.reshape(sol.sol(time_array[mask]), (2, -1))
+        return variables[0], variables[1]
+
+    def at_times(self, time_array):
+        """
+        時間座標Xにおける観測量をまとめて求めるメソッド
+        Args:
+            time_array: 時間座標Xの配列
+
+        Returns:
+            dict: 次のキーを持つ辞書
+                time: 時間座標X
+                scale_factor: スケール因子Y
+                hubble: ハッブルパラメーター H/H_0
+                deceleration: 減速パラメーター q
+                omega_matter: 物質の密度パラメーター
+                omega_lambda: 宇宙項の密度パラメーター
+                omega_curvature: 曲率の密度パラメーター
+                redshift: 赤方偏移 z
+        """
+        time_array = np.asarray(time_array, dtype=float)
+        scale_factor, derivative = self.evaluate(time_array)
+        return self._derived(time_array, scale_factor, derivative)
+
+    def _derived(self, time_array, scale_factor, derivative):
+        """時間座標X，スケール因子Y，dY/dXから観測量を求める"""
+        acceleration = self.integrator.ode_function(
+            time_array, [scale_factor, derivative], self.sigma_0, self.q_0)[1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hubble = derivative / scale_factor
+            return {
+                "time": time_array,
+                "scale_factor": scale_factor,
+                "hubble": hubble,
+                "deceleration": -scale_factor * acceleration / derivative**2,
+                "omega_matter": 2.0 * self.sigma_0 / (scale_factor**3 * hubble**2),
+                "omega_lambda": (self.sigma_0 - self.q_0) / hubble**2,
+                "omega_curvature": self.omega_curvature_0 / derivative**2,
+                "redshift": 1.0 / scale_factor - 1.0,
+            }
+
+    def history(self):
+        """
+        表の時間座標Xにおける観測量をまとめて求めるメソッド（at_timesを参照）
+        """
+        return self.at_times(self.time_array)
+
+    def time_at_redshift(self, redshift):
+        """
+        赤方偏移zの光が放たれた時間座標Xを求めるメソッド
+        Y(X) = 1/(1 + z) の根を，表の３次エルミート補間に対するニュートン法で
+        すべてのzについてまとめて求める（積分結果の密な出力は評価しない）
+        Args:
+            redshift: 赤方偏移の配列
+
+        Returns:
+            np.ndarray: 時間座標X（膨張している区間の外側のzではNaN）
+        """
+        target = 1.0 / (1.0 + np.asarray(redshift, dtype=float))
+        nodes, scale_array = self.time_array, self.scale_array
+        inside = (target >= scale_array[0]) & (target <= scale_array[-1])
+        target = np.where(inside, target, scale_array[0])
+        # Yは単調増加なので，根を含む区間は表から決まる
+        index = np.clip(np.searchsorted(scale_array, target) - 1, 0, len(nodes) - 2)
+        time = np.interp(target, scale_array, nodes)
+        for _ in range(NEWTON_ITERATIONS):
+            value, slope = _hermite(nodes, scale_array, self.derivative_array, time, index)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                step = (value - target) / slope
+            time = np.clip(time - np.where(np.isfinite(step), step, 0.0),
+                           nodes[index], nodes[index + 1])
+        return np.where(inside, time, np.nan)
+
+    def lookback_time(self, redshift):
+        """
+        赤方偏移zまでのルックバックタイム（単位 1/H_0）を求めるメソッド
+        """
+        return -self.time_at_redshift(redshift)
+
+    def _conformal_time_at(self, time):
+        """共形時間の表を，節点での微分 1/Y を用いた３次エルミート補間で評価する"""
+        nodes = self.time_array
+        finite = np.isfinite(time)
+        flat = np.where(finite, time, 0.0)
+        index = np.clip(np.searchsorted(nodes, flat) - 1, 0, len(nodes) - 2)
+        result = _hermite(nodes, self.conformal_time, 1.0 / self.scale_array, flat, index)[0]
+        return np.where(finite, result, np.nan)
+
+    def comoving_distance(self, redshift):
+        """
+        赤方偏移zまでの視線方向の共動距離 D_C（単位 c/H_0）を求めるメソッド
+        """
+        return -self._conformal_time_at(self.time_at_redshift(redshift))
+
+    def transverse_comoving_distance(self, redshift):
+        """
+        赤方偏移zまでの横方向の共動距離 D_M（単位 c/H_0）を求めるメソッド
+        """
+        return _transverse(self.comoving_distance(redshift), self.omega_curvature_0)
+
+    def luminosity_distance(self, redshift):
+        """
+        赤方偏移zまでの光度距離 D_L = (1 + z) D_M（単位 c/H_0）を求めるメソッド
+        """
+        return (1.0 + np.asarray(redshift, dtype=float)) * \
+            self.transverse_comoving_distance(redshift)
+
+    def angular_diameter_distance(self, redshift):
+        """
+        赤方偏移zまでの角径距離 D_A = D_M / (1 + z)（単位 c/H_0）を求めるメソッド
+        """
+        return self.transverse_comoving_distance(redshift) / \
+            (1.0 + np.asarray(redshift, dtype=float))
+
+    def at_redshift(self, redshift):
+        """
+        赤方偏移zにおける観測量と距離をまとめて求めるメソッド
+        時刻の根の探索は１回だけ行い，すべての量で共有する．YとY'は赤方偏移と第一積分から求める
+        Args:
+            redshift: 赤方偏移の配列
+
+        Returns:
+            dict: at_timesのキーに加え，lookback_time，comoving_distance，
+                  transverse_comoving_distance，luminosity_distance，
+                  angular_diameter_distance を持つ辞書
+        """
+        redshift = np.asarray(redshift, dtype=float)
+        time = self.time_at_redshift(redshift)
+        defined = np.isfinite(time)
+        scale_factor = np.where(defined, 1.0 / (1.0 + redshift), np.nan)
+        # 膨張している区間ではY' > 0
+        derivative = np.sqrt(np.maximum(
+            2.0 * self.sigma_0 / scale_factor + (self.sigma_0 - self.q_0) * scale_factor**2
+            + self.omega_curvature_0, 0.0))
+        result = self._derived(time, scale_factor, derivative)
+        comoving = -self._conformal_time_at(time)
+        transverse = _transverse(comoving, self.omega_curvature_0)
+        result.update(redshift=redshift,
+                      lookback_time=-time,
+                      comoving_distance=comoving,
+                      transverse_comoving_distance=transverse,
+                      luminosity_distance=(1.0 + redshift) * transverse,
+                      angular_diameter_distance=transverse / (1.0 + redshift))
+        return result
@@ -1,12 +1,24 @@
 """グラフ出力用のモジュール."""
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_tkagg import (
     FigureCanvasTkAgg,
     NavigationToolbar2Tk,
 )
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
 import matplotlib.pyplot as plt
-import matplotlib.ticker as ptick
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
+from render import (
+    DEFAULT_POLYGON_BUDGET,
+    INTERACTION_POLYGON_BUDGET,
+    plot_surface,
+    set_radial_axes,
+    set_tick_format,
+    setup_surface_axes,
+)
+from surface import as_surface
+import timing
 
 
 class Toolbar(NavigationToolbar2Tk):
@@ -17,64 +29,237 @@ class Toolbar(NavigationToolbar2Tk):
         super().__init__(*args, **kwargs)
 
 
-def draw_figure_w_toolbar(canvas, fig, canvas_toolbar):
-    """
-    グラフとツールバーを更新しGUI上に描画する関数
-    """
-    # グラフとツールバーを更新するために一旦クリアする
-    if canvas.children:
-        for child in canvas.winfo_children():
-            child.destroy()
-    # 一旦ツールバーを消去する
-    if canvas_toolbar.children:
-        for child in canvas_toolbar.winfo_children():
-            child.destroy()
-    # グラフとツールバーをGUIウィンドウ上のキャンバスに描画する
-    figure_canvas_agg = FigureCanvasTkAgg(fig, master=canvas)
-    figure_canvas_agg.draw()
-    toolbar = Toolbar(figure_canvas_agg, canvas_toolbar)
-    toolbar.update()
-    figure_canvas_agg.get_tk_widget().pack(side='left', fill='both', expand=2)
-
-
-def draw_plot(x, y, z):
+def draw_plot(x, y=None, z=None, polygon_budget=DEFAULT_POLYGON_BUDGET):
     """
     figureを作成する関数
+    GUIではPlotControllerを用いる．この関数は単独のfigureが必要な場合に用いる
+    Args:
+        x: 回転面（RevolutionSurfaceまたはMeshSurface），またはx座標の配列
+        y, z: xが配列の場合のy,z座標の配列
+        polygon_budget: 多角形の数の上限
     """
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection=Axes3D.name)
-
-    # 背景色の変更
-    ax.w_xaxis.set_pane_color((0., 0., 0., 0.))
-    ax.w_yaxis.set_pane_color((0., 0., 0., 0.))
-    ax.w_zaxis.set_pane_color((0., 0., 0., 0.))
-    ax.set_box_aspect((1, 1, 1))
-
-    # 軸ラベルの設定
-    ax.set_xlabel(r'$a_x$')
-    ax.set_ylabel(r'$a_y$')
-    ax.set_zlabel(r'$cosmic \ time$')
-    
-    # 目盛りの値の表示を指数表記に変更
-    max_number_of_digits = len(str(int(np.max(x))))
-    ax.xaxis.set_major_formatter(ptick.ScalarFormatter(useMathText=True))
-    ax.yaxis.set_major_formatter(ptick.ScalarFormatter(useMathText=True))
-    ax.ticklabel_format(style="sci", axis="x", scilimits=(max_number_of_digits, 
-                                                          max_number_of_digits))
-    ax.ticklabel_format(style="sci", axis="y", scilimits=(max_number_of_digits,
-                                                          max_number_of_digits))
-
-    # グラフをプロット
-    surf = ax.plot_surface(x,
-                           y,
-                           z,
-                           cmap='Blues',
-                           alpha=0.4,
-                           rcount=101,
-                           ccount=101,
-                           antialiased=False,
-                           shade=True)
-
-    # カラーバーを表示
-    fig.colorbar(surf, shrink=0.75)
+    surface = as_surface(x, y, z).finite_rows()
+
+    with timing.span("figure", shape=list(surface.shape), polygon_budget=polygon_budget):
+        fig = plt.figure()
+        ax = fig.add_subplot(111, projection=Axes3D.name)
+        setup_surface_axes(ax)
+        set_radial_axes(ax, surface)
+
+        # グラフをプロット
+        surf = plot_surface(ax, surface, polygon_budget)
+
+        # カラーバーを表示（描画できる行がない場合は表示しない）
+        if surf is not None:
+            fig.colorbar(surf, shrink=0.75)
     return fig
+
+
+class PlotController:
+    """
+    GUI上のグラフを管理するクラス
+
+    figure，3次元の座標軸，プレビュー用の2次元の座標軸，キャンバスとツールバーを
+    １組だけ保持し，更新時には回転面やカラーバー，曲線のデータだけを差し替える．
+    視点をドラッグしている間は粗い回転面に切り替え，離すと詳細な回転面に戻す．
+    """
+
+    def __init__(self, canvas=None, canvas_toolbar=None,
+                 polygon_budget=DEFAULT_POLYGON_BUDGET,
+                 interaction_budget=INTERACTION_POLYGON_BUDGET):
+        """
+        コンストラクタ
+        Args:
+            canvas: グラフを描画するTkのキャンバス．Noneの場合は画面に表示せずに描画する
+            canvas_toolbar: ツールバーを配置するTkのキャンバス
+            polygon_budget: 詳細な回転面の多角形の数の上限
+            interaction_budget: ドラッグ中に用いる粗い回転面の多角形の数の上限
+        """
+        self.canvas = canvas
+        self.canvas_toolbar = canvas_toolbar
+        self.polygon_budget = polygon_budget
+        self.interaction_budget = interaction_budget
+        # pyplotの管理下に置かないため，閉じ忘れによるfigureの蓄積が起こらない
+        self.figure = Figure()
+        self.surface_ax = self.figure.add_subplot(111, projection=Axes3D.name)
+        setup_surface_axes(self.surface_ax)
+        self.preview_ax = self.figure.add_subplot(111)
+        self.preview_ax.set_xlabel(r'$cosmic \ time$')
+        self.preview_ax.set_ylabel(r'$a$')
+        self.preview_ax.axhline(0.0, color='gray', linewidth=0.5)
+        self.preview_line, = self.preview_ax.plot([], [], color='tab:blue')
+        self.preview_ax.set_visible(False)
+        self.surface = None
+        self.coarse_surface = None
+        self.colorbar = None
+        self.comparison_artists = []
+        self.figure_canvas = None
+        self.toolbar = None
+
+    def _ensure_canvas(self):
+        """初回の描画時にだけキャンバスとツールバーを作成する"""
+        if self.figure_canvas is not None:
+            return
+        if self.canvas is None:
+            self.figure_canvas = FigureCanvasAgg(self.figure)
+            return
+        with timing.span("canvas"):
+            self.figure_canvas = FigureCanvasTkAgg(self.figure, master=self.canvas)
+            self.figure_canvas.mpl_connect('button_press_event', self._on_press)
+            self.figure_canvas.mpl_connect('button_release_event', self._on_release)
+            if self.canvas_toolbar is not None:
+                self.toolbar = Toolbar(self.figure_canvas, self.canvas_toolbar)
+                self.toolbar.update()
+            self.figure_canvas.get_tk_widget().pack(side='left', fill='both', expand=2)
+
+    def _draw(self):
+        """キャンバスを再描画する"""
+        # 計測中は描画の時間を測るため，アイドル時まで遅らせずにその場で描画する
+        if self.canvas is None or timing.is_enabled():
+            with timing.span("render"):
+                self.figure_canvas.draw()
+        else:
+            self.figure_canvas.draw_idle()
+
+    def _set_interacting(self, interacting):
+        """詳細な回転面と粗い回転面の表示を切り替える"""
+        if self.surface is None or self.coarse_surface is None or self.comparison_artists:
+            return
+        self.surface.set_visible(not interacting)
+        self.coarse_surface.set_visible(interacting)
+        self._draw()
+
+    def _on_press(self, event):
+        """3次元の座標軸上でマウスのボタンが押されたら粗い回転面に切り替える"""
+        if event.inaxes is self.surface_ax and self.surface_ax.get_visible():
+            self._set_interacting(True)
+
+    def _on_release(self, event):
+        """マウスのボタンが離されたら詳細な回転面に戻す"""
+        if self.coarse_surface is not None and self.coarse_surface.get_visible():
+            self._set_interacting(False)
+
+    def show_surface(self, x, y=None, z=None):
+        """
+        回転面を描画するメソッド．前回の回転面は取り除き，カラーバーは使い回す
+        ドラッグ中に用いる粗い回転面も作成し，非表示にしておく
+        Args:
+            x: 回転面（RevolutionSurfaceまたはMeshSurface），またはx座標の配列
+            y, z: xが配列の場合のy,z座標の配列
+        """
+        self._ensure_canvas()
+        surface = as_surface(x, y, z).finite_rows()
+        self._clear_comparison()
+        for artist in (self.surface, self.coarse_surface):
+            if artist is not None:
+                artist.remove()
+        self.preview_ax.set_visible(False)
+        self.surface_ax.set_visible(True)
+        with timing.span("figure", shape=list(surface.shape),
+                         polygon_budget=self.polygon_budget):
+            set_radial_axes(self.surface_ax, surface)
+            self.coarse_surface = plot_surface(self.surface_ax, surface,
+                                               self.interaction_budget)
+            self.surface = plot_surface(self.surface_ax, surface, self.polygon_budget)
+            if self.coarse_surface is not None:
+                self.coarse_surface.set_visible(False)
+            if self.surface is None:
+                # 描画できる行がない場合は空の座標軸だけを表示する
+                if self.colorbar is not None:
+                    self.colorbar.ax.set_visible(False)
+            else:
+                if self.colorbar is None:
+                    self.colorbar = self.figure.colorbar(self.surface, ax=self.surface_ax,
+                                                         shrink=0.75)
+                else:
+                    self.colorbar.update_normal(self.surface)
+                self.colorbar.ax.set_visible(True)
+        self._draw()
+
+    def show_preview(self, time_array, scale_array):
+        """
+        プレビュー用のスケール因子Y(X)の曲線を描画するメソッド．曲線のデータだけを差し替える
+        """
+        self._ensure_canvas()
+        self._clear_comparison()
+        finite = np.isfinite(time_array) & np.isfinite(scale_array)
+        self.preview_line.set_data(time_array[finite], scale_array[finite])
+        self.preview_line.set_visible(True)
+        self.surface_ax.set_visible(False)
+        if self.colorbar is not None:
+            self.colorbar.ax.set_visible(False)
+        self.preview_ax.set_visible(True)
+        self.preview_ax.relim()
+        self.preview_ax.autoscale_view()
+        self._draw()
+
+    def _clear_comparison(self):
+        """前回の比較の曲線・回転面と凡例を取り除く"""
+        for artist in self.comparison_artists:
+            artist.remove()
+        self.comparison_artists = []
+        for ax in (self.surface_ax, self.preview_ax):
+            if ax.get_legend() is not None:
+                ax.get_legend().remove()
+
+    def show_comparison(self, result, surfaces=False):
+        """
+        複数モデルの比較結果を１つのfigureに重ねて描画するメソッド
+        Args:
+            result: ComparisonResult
+            surfaces: Trueの場合は半透明の回転面を重ね，Falseの場合は共通の時間座標Xの
+                      格子上のスケール因子Y(X)の曲線を重ねる
+        """
+        self._ensure_canvas()
+        self._clear_comparison()
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        if self.colorbar is not None:
+            self.colorbar.ax.set_visible(False)
+        if surfaces:
+            for artist in (self.surface, self.coarse_surface):
+                if artist is not None:
+                    artist.set_visible(False)
+            self.preview_ax.set_visible(False)
+            self.surface_ax.set_visible(True)
+            # モデル数が増えても描画の負荷が変わらないよう，多角形の数の上限を等分する
+            budget = max(self.polygon_budget // len(result.surfaces), 1)
+            radial = np.concatenate([surface.profile()[1] for surface in result.surfaces])
+            set_tick_format(self.surface_ax, radial)
+            handles = []
+            for index, surface in enumerate(result.surfaces):
+                color = colors[index % len(colors)]
+                artist = plot_surface(self.surface_ax, surface.finite_rows(), budget,
+                                      cmap=None, color=color, alpha=0.25)
+                if artist is not None:
+                    self.comparison_artists.append(artist)
+                handles.append(Patch(color=color, alpha=0.5, label=result.labels[index]))
+            self.surface_ax.legend(handles=handles, loc='upper left', fontsize='small')
+        else:
+            self.surface_ax.set_visible(False)
+            self.preview_ax.set_visible(True)
+            self.preview_line.set_visible(False)
+            for index, scale_array in enumerate(result.scale_matrix):
+                line, = self.preview_ax.plot(result.time_grid, scale_array,
+                                             color=colors[index % len(colors)],
+                                             label=result.labels[index])
+                self.comparison_artists.append(line)
+            self.preview_ax.relim()
+            self.preview_ax.autoscale_view()
+            self.preview_ax.legend(loc='upper left', fontsize='small')
+        self._draw()
+
+    def close(self):
+        """
+        保持しているfigureとキャンバスを解放するメソッド
+        """
+        if self.figure_canvas is not None and self.canvas is not None:
+            self.figure_canvas.get_tk_widget().destroy()
+        if self.toolbar is not None:
+            self.toolbar.destroy()
+        self.figure.clear()
+        self.surface = None
+        self.coarse_surface = None
+        self.colorbar = None
+        self.comparison_artists = []
+        self.figure_canvas = None
+        self.toolbar = None
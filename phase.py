@@ -0,0 +1,361 @@
+"""(sigma_0, q_0) 平面の相図を作成するモジュール．
+
+フリードマン方程式の第一積分
+    Y'^2 = F(Y) = 2 sigma_0 / Y + (Lambda/3) Y^2 + Omega_k,
+    Lambda = 3(sigma_0 - q_0),  Omega_k = 1 - 3 sigma_0 + q_0 = -K |Omega_k|
+から，F(Y) = 0 となる転回点の有無と位置によって宇宙の振る舞いを分類する．
+    bounce:            Y < 1 に転回点があり，過去に収縮から膨張に転じた（ビッグバンがない）
+    recollapse:        Y > 1 に転回点があり，将来収縮に転じてビッグクランチに至る
+    static:            F(Y)の極小値がほぼ0で，アインシュタインの静的宇宙に漸近する
+    loitering:         F(Y)の極小値が小さな正の値で，膨張がしばらく停滞する
+    eternal_expansion: 上のいずれでもなく，ビッグバンから永遠に膨張する
+宇宙年齢とビッグクランチの時刻は X = ∫ dY / sqrt(F(Y)) をガウス・ルジャンドル求積で求める．
+格子はタイルに分けてプロセスプールで並列に計算する．
+
+使い方:
+    python phase.py -o phase.png --resolution 1000
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# GUIのスライダーと同じパラメーターの範囲
+SIGMA_RANGE = (0.0, 1.5)
+Q_RANGE = (-2.0, 2.0)
+# 分類の名前（配列には番号で格納する）
+CLASSES = ("eternal_expansion", "recollapse", "bounce", "loitering", "static")
+CLASS_COLORS = ("#4c72b0", "#c44e52", "#55a868", "#dd8452", "#222222")
+# F(Y)の極小値がこの値以下なら静的宇宙とみなす
+STATIC_TOLERANCE = 2e-3
+# F(Y)の極小値がこの値以下なら停滞（loitering）とみなす（現在の値 F(1) = 1 に対する割合）
+LOITERING_THRESHOLD = 0.05
+# 時刻の求積に用いるガウス・ルジャンドル求積の次数
+QUADRATURE_ORDER = 64
+# 転回点を求める二分法の反復回数
+BISECTION_ITERATIONS = 60
+# タイルあたりのq_0方向の行数
+DEFAULT_TILE_ROWS = 50
+
+
+def curvature_and_lambda(sigma_0, q_0):
+    """
+    パラメーターから空間曲率Kと宇宙項Lambdaを求める関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+
+    Returns:
+        K: 空間曲率の符号 sign(3 sigma_0 - q_0 - 1)
+        Lambda: 宇宙項 3(sigma_0 - q_0)
+    """
+    return np.sign(3 * sigma_0 - q_0 - 1.0), 3 * (sigma_0 - q_0)
+
+
+def _sinh_quadrature(center, width, lower, upper, nodes, weights):
+    """
+    x = center + width sinh(t) と置いたガウス・ルジャンドル求積の節点と重みを求める
+    被積分関数が 1/sqrt(eps + (x - center)^2) のように幅 width の山を持つ場合に，
+    山の部分を滑らかにして少ない節点で精度よく求積するためのもの
+    Args:
+        center, width, lower, upper: 各メンバーの山の中心・幅と積分区間（形状 (B,)）
+        nodes, weights: 区間[0, 1]上のガウス・ルジャンドル求積の節点と重み
+
+    Returns:
+        points: 節点（形状 (B, 次数)）
+        scaled_weights: ヤコビアンを掛けた重み（形状 (B, 次数)）
+    """
+    center, width = center[:, None], width[:, None]
+    t_lower = np.arcsinh((lower[:, None] - center) / width)
+    t_upper = np.arcsinh((upper[:, None] - center) / width)
+    t = t_lower + (t_upper - t_lower) * nodes
+    return (center + width * np.sinh(t),
+            (t_upper - t_lower) * weights * width * np.cosh(t))
+
+
+def _turning_point_above_one(sigma_0, lam, curvature, upper):
+    """
+    Y F(Y) = lam Y^3 + curvature Y + 2 sigma_0 の，区間 (1, upper) にある根を
+    二分法とニュートン法で全メンバーについてまとめて求める
+    （F(1) = 1 > 0 であり，upper では負となるメンバーだけを渡す）
+    """
+    lower = np.ones_like(sigma_0)
+    for _ in range(BISECTION_ITERATIONS):
+        middle = 0.5 * (lower + upper)
+        negative = lam * middle**3 + curvature * middle + 2.0 * sigma_0 < 0.0
+        upper = np.where(negative, middle, upper)
+        lower = np.where(negative, lower, middle)
+    root = 0.5 * (lower + upper)
+    for _ in range(2):
+        slope = 3.0 * lam * root**2 + curvature
+        value = lam * root**3 + curvature * root + 2.0 * sigma_0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(slope != 0.0, value / slope, 0.0)
+        root = np.clip(root - step, lower, upper)
+    return root
+
+
+def classify_models(sigma_0, q_0, static_tolerance=STATIC_TOLERANCE,
+                    loitering_threshold=LOITERING_THRESHOLD,
+                    quadrature_order=QUADRATURE_ORDER):
+    """
+    多数の(sigma_0, q_0)の組をまとめて分類し，宇宙年齢とビッグクランチの時刻を求める関数
+    Args:
+        sigma_0: 密度パラメーターの配列（sigma_0 >= 0）
+        q_0: 減速パラメーターの配列（sigma_0とブロードキャスト可能な形状）
+        static_tolerance: F(Y)の極小値がこの値以下なら静的宇宙とみなす
+        loitering_threshold: F(Y)の極小値がこの値以下なら停滞とみなす
+        quadrature_order: 時刻の求積に用いるガウス・ルジャンドル求積の次数
+
+    Returns:
+        dict: 次のキーを持つ辞書（形状はパラメーターをブロードキャストしたもの）
+            class: CLASSESの番号（np.int8）
+            age: 宇宙年齢．ビッグバンがない場合はNaN
+            crunch: ビッグクランチの時刻X．収縮しない場合はNaN
+            turnaround_scale: 膨張から収縮に転じるときのY．収縮しない場合はNaN
+    """
+    sigma_0, q_0 = np.broadcast_arrays(np.asarray(sigma_0, dtype=float),
+                                       np.asarray(q_0, dtype=float))
+    shape = sigma_0.shape
+    sigma_0, q_0 = sigma_0.ravel(), q_0.ravel()
+    K, Lambda = curvature_and_lambda(sigma_0, q_0)
+    lam = Lambda / 3.0
+    curvature = 1.0 - 3.0 * sigma_0 + q_0
+
+    # F(Y)の極小値（Lambda > 0 のとき Y_E = (sigma_0/lam)^(1/3) で極小）
+    with np.errstate(divide="ignore", invalid="ignore"):
+        minimum_scale = np.where(lam > 0.0, np.cbrt(sigma_0 / lam), np.inf)
+    minimum_value = np.where(lam > 0.0,
+                             3.0 * np.cbrt(sigma_0**2 * np.maximum(lam, 0.0)) + curvature,
+                             np.inf)
+    has_minimum = (lam > 0.0) & (sigma_0 > 0.0)
+    static = has_minimum & (np.abs(minimum_value) <= static_tolerance)
+    # 極小値が負なら転回点の組がY_Eの両側にあり，Y = 1 と同じ側のものに到達する
+    crossing = (lam > 0.0) & (minimum_value < 0.0) & ~static
+    bounce = crossing & (minimum_scale < 1.0)
+    recollapse = ((crossing & (minimum_scale > 1.0)) |
+                  (lam < 0.0) | ((lam == 0.0) & (curvature < 0.0)))
+    loitering = (has_minimum & ~static & ~crossing &
+                 (minimum_value <= loitering_threshold))
+    # sigma_0 = 0, K = +1 (Omega_k < 0) でLambda > 0 の場合もY < 1 で転回する（de Sitterの閉じた宇宙）
+    bounce |= (sigma_0 == 0.0) & (lam > 0.0) & (curvature < 0.0)
+
+    classes = np.zeros(sigma_0.shape, dtype=np.int8)
+    for name, mask in (("recollapse", recollapse), ("bounce", bounce),
+                       ("loitering", loitering), ("static", static)):
+        classes[mask] = CLASSES.index(name)
+
+    nodes, weights = np.polynomial.legendre.leggauss(quadrature_order)
+    nodes, weights = 0.5 * (nodes + 1.0), 0.5 * weights
+
+    # 宇宙年齢：Y = u^2 と置くと dY/sqrt(F) = 2u du / sqrt(F(u^2)) は u = 0 で正則
+    # sigma_0 = 0 かつ Omega_k <= 0 では Y -> 0 に有限時間で到達しない
+    has_big_bang = ~bounce & ~((sigma_0 == 0.0) & (curvature <= 0.0))
+    age = np.full(sigma_0.shape, np.nan)
+    rows = np.flatnonzero(has_big_bang)
+    if rows.size:
+        # 停滞するモデルでは F は u_E = sqrt(Y_E) の近くで F_min + 12 lam Y_E (u - u_E)^2 となるため，
+        # その幅でsinhの置換を行う
+        minimum = has_minimum[rows]
+        center = np.where(minimum, np.sqrt(np.where(minimum, minimum_scale[rows], 0.0)), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            width = np.sqrt(np.maximum(minimum_value[rows], 0.0) /
+                            (12.0 * lam[rows] * minimum_scale[rows]))
+        width = np.clip(np.where(minimum, width, 1.0), 1e-12, 1e3)
+        u, u_weights = _sinh_quadrature(center, width, np.zeros(rows.size),
+                                        np.ones(rows.size), nodes, weights)
+        scale = u**2
+        velocity_squared = (2.0 * sigma_0[rows, None] / scale + lam[rows, None] * scale**2
+                            + curvature[rows, None])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            age[rows] = (2.0 * u / np.sqrt(velocity_squared) * u_weights).sum(axis=1)
+
+    # ビッグクランチ：Y = r + (1 - r)(1 - v)^2 と置き，
+    # Y F(Y) = (Y - r)Q(Y)，Q(Y) = lam (Y^2 + rY + r^2) + Omega_k の因数分解で転回点の特異性を除く
+    crunch = np.full(sigma_0.shape, np.nan)
+    turnaround_scale = np.full(sigma_0.shape, np.nan)
+    rows = np.flatnonzero(recollapse & has_big_bang)
+    if rows.size:
+        s, a, c = sigma_0[rows], lam[rows], curvature[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cauchy = 2.0 + np.maximum(np.abs(c), 2.0 * s) / np.abs(a)
+        upper = np.where(a > 0.0, minimum_scale[rows], np.where(a < 0.0, cauchy, np.inf))
+        root = np.where(a == 0.0, -2.0 * s / np.where(c < 0.0, c, -1.0), 1.0)
+        cubic = a != 0.0
+        if cubic.any():
+            root[cubic] = _turning_point_above_one(s[cubic], a[cubic], c[cubic], upper[cubic])
+        # t = 1 - v とすると，転回点が重根に近い場合の被積分関数は 1/sqrt(|Q(r)|/(Q'(r)(r - 1)) + t^2)
+        # に比例するため，その幅でsinhの置換を行う（Q(r) = 3 lam r^2 + Omega_k，Q'(r) = 3 lam r）
+        with np.errstate(divide="ignore", invalid="ignore"):
+            width = np.sqrt(np.abs(3.0 * a * root**2 + c) /
+                            (np.abs(3.0 * a * root) * (root - 1.0)))
+        width = np.clip(np.nan_to_num(width, nan=1e3, posinf=1e3), 1e-12, 1e3)
+        t, t_weights = _sinh_quadrature(np.zeros(rows.size), width, np.zeros(rows.size),
+                                        np.ones(rows.size), nodes, weights)
+        r = root[:, None]
+        scale = r + (1.0 - r) * t**2
+        quotient = a[:, None] * (scale**2 + r * scale + r**2) + c[:, None]
+        with np.errstate(invalid="ignore"):
+            expansion = (2.0 * np.sqrt((r - 1.0) * scale / np.abs(quotient)) * t_weights).sum(axis=1)
+        # 方程式は時間反転に対して対称なので，転回点からY = 0 までの時間は (年齢 + 膨張の時間)
+        crunch[rows] = age[rows] + 2.0 * expansion
+        turnaround_scale[rows] = root
+
+    return {"class": classes.reshape(shape),
+            "age": age.reshape(shape),
+            "crunch": crunch.reshape(shape),
+            "turnaround_scale": turnaround_scale.reshape(shape)}
+
+
+def _classify_tile(arguments):
+    """プロセスプールの各プロセスで１つのタイルを分類する"""
+    sigma_0, q_0, options = arguments
+    sigma_grid, q_grid = np.meshgrid(sigma_0, q_0)
+    return classify_models(sigma_grid, q_grid, **options)
+
+
+class PhaseDiagram:
+    """
+    相図の計算結果を表すクラス．配列は行がq_0，列がsigma_0の方向
+    """
+
+    def __init__(self, sigma_0, q_0, classes, age, crunch, wall_time=None):
+        """
+        コンストラクタ
+        Args:
+            sigma_0: 列方向のsigma_0の配列
+            q_0: 行方向のq_0の配列
+            classes: CLASSESの番号の配列
+            age: 宇宙年齢の配列
+            crunch: ビッグクランチの時刻Xの配列
+            wall_time: 計算にかかった時間（秒）
+        """
+        self.sigma_0 = sigma_0
+        self.q_0 = q_0
+        self.classes = classes
+        self.age = age
+        self.crunch = crunch
+        self.wall_time = wall_time
+
+    def counts(self):
+        """
+        分類ごとのモデルの数を返すメソッド
+        """
+        return {name: int(np.count_nonzero(self.classes == index))
+                for index, name in enumerate(CLASSES)}
+
+    def to_arrays(self):
+        """
+        保存用の配列の辞書を返すメソッド（np.savezに渡す）
+        """
+        return {"sigma_0": self.sigma_0, "q_0": self.q_0, "classes": self.classes,
+                "age": self.age, "crunch": self.crunch, "class_names": np.array(CLASSES)}
+
+
+def compute_phase_diagram(resolution=(1000, 1000), sigma_range=SIGMA_RANGE, q_range=Q_RANGE,
+                          tile_rows=DEFAULT_TILE_ROWS, workers=None, **options):
+    """
+    (sigma_0, q_0) の格子の相図をタイルに分けて並列に計算する関数
+    Args:
+        resolution: 格子の点の数 (sigma_0方向, q_0方向)
+        sigma_range: sigma_0の範囲
+        q_range: q_0の範囲
+        tile_rows: １つのタイルに含めるq_0方向の行数
+        workers: プロセス数．1の場合はプロセスプールを使わずに順に計算する
+        **options: classify_modelsに渡す引数
+
+    Returns:
+        PhaseDiagram: 計算結果
+    """
+    start = time.perf_counter()
+    sigma_0 = np.linspace(sigma_range[0], sigma_range[1], int(resolution[0]))
+    q_0 = np.linspace(q_range[0], q_range[1], int(resolution[1]))
+    tiles = [(sigma_0, q_0[row:row + tile_rows], options)
+             for row in range(0, len(q_0), tile_rows)]
+    if workers == 1 or len(tiles) <= 1:
+        results = [_classify_tile(tile) for tile in tiles]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_classify_tile, tiles))
+    merged = {key: np.concatenate([result[key] for result in results])
+              for key in ("class", "age", "crunch")}
+    return PhaseDiagram(sigma_0, q_0, merged["class"], merged["age"], merged["crunch"],
+                        time.perf_counter() - start)
+
+
+def render_phase_diagram(diagram, path, dpi=100, marker=None):
+    """
+    相図を画像ファイルに書き出す関数（画面を持たないAggで描画する）
+    左に分類，右に宇宙年齢を表示する
+    Args:
+        diagram: PhaseDiagram
+        path: 出力先のパス
+        dpi: 解像度
+        marker: 印を付けるモデルの (sigma_0, q_0)．Noneの場合は付けない
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.colors import ListedColormap, LogNorm
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Patch
+
+    extent = (diagram.sigma_0[0], diagram.sigma_0[-1], diagram.q_0[0], diagram.q_0[-1])
+    figure = Figure(figsize=(11, 5))
+    FigureCanvasAgg(figure)
+    class_ax, age_ax = figure.subplots(1, 2)
+    class_ax.imshow(diagram.classes, origin="lower", extent=extent, aspect="auto",
+                    cmap=ListedColormap(CLASS_COLORS), vmin=-0.5, vmax=len(CLASSES) - 0.5,
+                    interpolation="nearest")
+    class_ax.legend(handles=[Patch(color=color, label=name.replace("_", " "))
+                             for name, color in zip(CLASSES, CLASS_COLORS)],
+                    loc="upper left", fontsize="small")
+    image = age_ax.imshow(diagram.age, origin="lower", extent=extent, aspect="auto",
+                          cmap="viridis", norm=LogNorm(), interpolation="nearest")
+    figure.colorbar(image, ax=age_ax, label=r"$age \ [1/H_0]$")
+    for ax, title in ((class_ax, "class"), (age_ax, "age")):
+        ax.set_xlabel(r"$\sigma_0$")
+        ax.set_ylabel(r"$q_0$")
+        ax.set_title(title)
+        if marker is not None:
+            ax.plot(*marker, marker="x", color="white", markersize=10, markeredgewidth=2)
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+
+
+def parse_arguments(argv=None):
+    """
+    コマンドライン引数を解析する関数
+    """
+    parser = argparse.ArgumentParser(description="(sigma_0, q_0) 平面の相図を作成する")
+    parser.add_argument("-o", "--output", default="phase.png",
+                        help="相図の画像の出力先（既定: phase.png）")
+    parser.add_argument("--npz", default=None,
+                        help="分類・宇宙年齢・ビッグクランチの時刻の配列の出力先")
+    parser.add_argument("-r", "--resolution", type=int, default=1000,
+                        help="各方向の格子の点の数（既定: 1000）")
+    parser.add_argument("--tile-rows", type=int, default=DEFAULT_TILE_ROWS,
+                        help="１つのタイルに含める行数（既定: {}）".format(DEFAULT_TILE_ROWS))
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="プロセス数（既定: CPUの数）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    メイン関数
+    """
+    args = parse_arguments(argv)
+    diagram = compute_phase_diagram((args.resolution, args.resolution),
+                                    tile_rows=args.tile_rows, workers=args.workers)
+    print("{0}x{0} models in {1:.2f} s".format(args.resolution, diagram.wall_time))
+    for name, count in diagram.counts().items():
+        print("{:<20} {:>10}".format(name, count))
+    if args.npz is not None:
+        np.savez(args.npz, **diagram.to_arrays())
+    render_phase_diagram(diagram, args.output)
+    return 0
+
+
+"""プログラムの実行"""
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""スライダー操作中のライブプレビュー用モジュール．
+
+スライダーやテキストボックスのイベントを短い待ち時間でまとめ（デバウンス），
+粗い許容誤差で求めたスケール因子Y(X)の曲線だけを素早く描画する．
+操作が落ち着いたら，通常の精度で回転面を計算し直す．
+"""
+import time
+
+# プレビューの曲線の点の数
+PREVIEW_SAMPLES = 200
+
+
+def compute_preview_curve(sigma_0, q_0, K=None, Lambda=None):
+    """
+    プレビュー用に粗い精度でスケール因子Y(X)を求める関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        K: 空間曲率
+        Lambda: 宇宙項
+
+    Returns:
+        time_array: 時間座標Xの配列
+        scale_array: 規格化したスケール因子Yの配列
+    """
+    # scipyを用いる計算用モジュールは，起動を速くするため初めて使うときに読み込む
+    from calculate import (
+        FriedmannEquationIntegrator,
+        friedmann_equation,
+        rotate_coordinates,
+    )
+
+    instance = FriedmannEquationIntegrator(
+        friedmann_equation, rotate_coordinates, sigma_0, q_0, K, Lambda,
+        accuracy="preview", sampling="adaptive", num_samples=PREVIEW_SAMPLES)
+    time_array, coordinate = instance.concatenate_sol_array()
+    return time_array, coordinate[0]
+
+
+class PreviewDebouncer:
+    """
+    パラメーターの変更をまとめ，プレビューと本計算を行う時刻を管理するクラス
+    """
+
+    def __init__(self, preview_delay=0.05, refine_delay=0.5, clock=time.monotonic):
+        """
+        コンストラクタ
+        Args:
+            preview_delay: 最後の変更からプレビューを描画するまでの待ち時間（秒）
+            refine_delay: 最後の変更から本計算を始めるまでの待ち時間（秒）
+            clock: 現在時刻（秒）を返す関数
+        """
+        self.preview_delay = preview_delay
+        self.refine_delay = refine_delay
+        self.clock = clock
+        self.parameters = None
+        self.changed_at = None
+        self.preview_pending = False
+        self.refine_pending = False
+        self.last_previewed = None
+
+    def request(self, sigma_0, q_0):
+        """
+        パラメーターの変更を登録するメソッド．同じ値の再登録は無視する
+        Args:
+            sigma_0: 密度パラメーター
+            q_0: 減速パラメーター
+        """
+        parameters = (float(sigma_0), float(q_0))
+        if parameters == self.parameters:
+            return
+        self.parameters = parameters
+        self.changed_at = self.clock()
+        self.preview_pending = parameters != self.last_previewed
+        self.refine_pending = True
+
+    def cancel(self):
+        """
+        保留中のプレビューと本計算を取り消すメソッド
+        """
+        self.parameters = None
+        self.preview_pending = False
+        self.refine_pending = False
+
+    def timeout(self):
+        """
+        次に処理が必要になるまでの時間を返すメソッド（window.readのtimeoutに渡す）
+
+        Returns:
+            int or None: ミリ秒．保留中の処理がなければNone
+        """
+        if self.preview_pending:
+            delay = self.preview_delay
+        elif self.refine_pending:
+            delay = self.refine_delay
+        else:
+            return None
+        remaining = self.changed_at + delay - self.clock()
+        return max(int(remaining * 1e3), 0)
+
+    def due(self):
+        """
+        現在時刻で実行すべき処理を返すメソッド
+
+        Returns:
+            str or None: "preview"，"refine"，または実行すべき処理がなければNone
+        """
+        elapsed = None if self.changed_at is None else self.clock() - self.changed_at
+        if self.preview_pending and elapsed >= self.preview_delay:
+            self.preview_pending = False
+            self.last_previewed = self.parameters
+            return "preview"
+        if (not self.preview_pending and self.refine_pending
+                and elapsed >= self.refine_delay):
+            self.refine_pending = False
+            return "refine"
+        return None
@@ -0,0 +1,393 @@
+"""第一積分（エネルギー積分）の数値求積によるフリードマン方程式の解法モジュール．
+
+フリードマン方程式 Y'' = -sigma_0/Y^2 + (sigma_0 - q_0)Y は
+Y'^2/2 - sigma_0/Y - (sigma_0 - q_0)Y^2/2 = const という第一積分を持つため，
+Y'^2 = F(Y) = 2E + 2sigma_0/Y + (sigma_0 - q_0)Y^2 として
+X(Y) = ∫ dY / sqrt(F(Y)) を求積し，単調補間で逆関数Y(X)を求める．
+"""
+import numpy as np
+from analytic import AnalyticResult
+
+# 各区間で用いる3点ガウス・ルジャンドル求積の節点と重み（区間[0, 1]上）
+GAUSS_NODES = 0.5 + 0.5 * np.array([-np.sqrt(3 / 5), 0.0, np.sqrt(3 / 5)])
+GAUSS_WEIGHTS = 0.5 * np.array([5 / 9, 8 / 9, 5 / 9])
+
+# 無限遠まで膨張する枝で，log Yの積分範囲を広げる最大の回数
+MAX_EXTENSIONS = 30
+
+
+def first_integral(variables, sigma_0, q_0):
+    """
+    フリードマン方程式の第一積分（エネルギー）を計算する関数
+    Args:
+        variables: 変数を格納した配列 [Y, dY_dX]
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+
+    Returns:
+        np.array: Y'^2/2 - sigma_0/Y - (sigma_0 - q_0)Y^2/2 の値
+    """
+    normalized_scale_factor_a = variables[0]
+    dY_dX = variables[1]
+    return (dY_dX**2 / 2 - sigma_0 / normalized_scale_factor_a
+            - (sigma_0 - q_0) * normalized_scale_factor_a**2 / 2)
+
+
+def _turning_points(sigma_0, q_0, energy):
+    """
+    Y'^2 = F(Y) = 0 となる転回点を求める関数
+    Y F(Y) = (sigma_0 - q_0)Y^3 + 2E Y + 2sigma_0 の正の実根のうち，
+    Y = 1 を挟む最も近いものを返す．
+
+    Returns:
+        tuple: (lower, upper) 下側の転回点（なければ0），上側の転回点（なければinf）
+    """
+    cubic = sigma_0 - q_0
+    linear = 2.0 * energy
+    constant = 2.0 * sigma_0
+    n_members = sigma_0.size
+    roots = np.full((n_members, 3), np.nan)
+
+    # 3次の場合はコンパニオン行列の固有値として全メンバーの根をまとめて求める
+    is_cubic = np.abs(cubic) > 1e-14
+    if np.any(is_cubic):
+        companion = np.zeros((np.count_nonzero(is_cubic), 3, 3))
+        companion[:, 1, 0] = 1.0
+        companion[:, 2, 1] = 1.0
+        companion[:, 0, 2] = -constant[is_cubic] / cubic[is_cubic]
+        companion[:, 1, 2] = -linear[is_cubic] / cubic[is_cubic]
+        eigenvalues = np.linalg.eigvals(companion)
+        real = np.abs(eigenvalues.imag) <= 1e-9 * (1.0 + np.abs(eigenvalues.real))
+        roots[is_cubic] = np.where(real, eigenvalues.real, np.nan)
+    is_linear = ~is_cubic & (linear < 0.0)
+    roots[is_linear, 0] = -constant[is_linear] / linear[is_linear]
+
+    # ニュートン法で根を高精度化する
+    for _ in range(3):
+        value = cubic[:, None] * roots**3 + linear[:, None] * roots + constant[:, None]
+        slope = 3.0 * cubic[:, None] * roots**2 + linear[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roots = np.where(slope != 0.0, roots - value / slope, roots)
+
+    with np.errstate(invalid='ignore'):
+        lower = np.nanmax(np.where((roots > 0.0) & (roots < 1.0), roots, 0.0), axis=1)
+        upper = np.nanmin(np.where(roots > 1.0, roots, np.inf), axis=1)
+    return lower, upper
+
+
+class _Leg:
+    """
+    Y = 1 から転回点・特異点・無限遠のいずれかへ単調に進む枝の求積結果
+    """
+
+    def __init__(self, scale_factor, elapsed, end_is_turning_point, end_is_singular):
+        self.scale_factor = scale_factor
+        self.elapsed = elapsed
+        self.duration = elapsed[:, -1]
+        self.end_is_turning_point = end_is_turning_point
+        self.end_is_singular = end_is_singular
+
+
+def _integrate_leg(sigma_0, q_0, energy, end, num_intervals, required_span):
+    """
+    Y = 1 から end（転回点，0またはinf）までの経過時間 X(Y) を求積する関数
+    Args:
+        sigma_0, q_0, energy: 各メンバーのパラメーターとエネルギー（形状 (B,)）
+        end: 各メンバーの枝の終点（形状 (B,)）
+        num_intervals: 求積に用いる区間の数
+        required_span: 無限遠へ向かう枝で少なくとも求める経過時間
+
+    Returns:
+        _Leg: 枝上の節点におけるYと経過時間
+    """
+    cubic = (sigma_0 - q_0)[:, None]
+    linear = (2.0 * energy)[:, None]
+    constant = (2.0 * sigma_0)[:, None]
+    root = end[:, None]
+    is_root = np.isfinite(end) & (end > 0.0)
+    is_infinite = np.isinf(end)
+    is_zero = ~is_root & ~is_infinite
+
+    def rate_to_root(v, rows):
+        """転回点 r へ向かう枝：Y = r + (1 - r)(1 - v)^2 と置き，F(Y) = (Y - r)Q(Y)/Y の因数分解で0/0を避ける"""
+        r, a, c = root[rows], cubic[rows], linear[rows]
+        scale_factor = r + (1.0 - r) * (1.0 - v)**2
+        quotient = a * scale_factor**2 + a * r * scale_factor + a * r**2 + c
+        return scale_factor, 2.0 * np.sqrt(np.abs(r - 1.0) * scale_factor / np.abs(quotient))
+
+    def rate_to_infinity(v, rows, log_extent):
+        """無限遠へ向かう枝：Y = exp(W v)"""
+        scale_factor = np.exp(log_extent * v)
+        velocity_squared = (cubic[rows] * scale_factor**2 + linear[rows]
+                            + constant[rows] / scale_factor)
+        return scale_factor, log_extent * scale_factor / np.sqrt(velocity_squared)
+
+    def rate_to_zero(v, rows):
+        """特異点 Y = 0 へ向かう枝：Y = (1 - v)^2"""
+        scale_factor = (1.0 - v)**2
+        velocity_squared = (cubic[rows] * scale_factor**3 + linear[rows] * scale_factor
+                            + constant[rows])
+        return scale_factor, 2.0 * (1.0 - v) * np.sqrt(scale_factor / velocity_squared)
+
+    edges = np.linspace(0.0, 1.0, num_intervals + 1)[None, :]
+    nodes = (edges[:, :-1, None] + GAUSS_NODES / num_intervals).reshape(1, -1)
+    weights = GAUSS_WEIGHTS / num_intervals
+
+    def cumulative(rate):
+        increments = (rate.reshape(rate.shape[0], num_intervals, GAUSS_NODES.size)
+                      * weights).sum(axis=2)
+        return np.concatenate([np.zeros((rate.shape[0], 1)), np.cumsum(increments, axis=1)],
+                              axis=1)
+
+    n_members = end.size
+    scale_factor = np.empty((n_members, num_intervals + 1))
+    elapsed = np.empty((n_members, num_intervals + 1))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for rows, rate_function in ((is_root, rate_to_root), (is_zero, rate_to_zero)):
+            if np.any(rows):
+                elapsed[rows] = cumulative(rate_function(nodes, rows)[1])
+                scale_factor[rows] = rate_function(edges, rows)[0]
+        # 無限遠へ向かう枝は，必要な時間に達するまで log Y の範囲を倍々に広げる
+        pending = np.flatnonzero(is_infinite)
+        log_extent = np.ones((n_members, 1))
+        for _ in range(MAX_EXTENSIONS):
+            if pending.size == 0:
+                break
+            elapsed[pending] = cumulative(
+                rate_to_infinity(nodes, pending, log_extent[pending])[1])
+            scale_factor[pending] = rate_to_infinity(edges, pending, log_extent[pending])[0]
+            pending = pending[~(elapsed[pending, -1] >= required_span)]
+            log_extent[pending] *= 2.0
+    return _Leg(scale_factor, elapsed, is_root, end == 0.0)
+
+
+def _monotone_cubic(x_nodes, y_nodes, slopes_at, x):
+    """
+    行ごとに異なる節点を持つ単調3次エルミート補間（Fritsch-Carlsonの制限付き）
+    Args:
+        x_nodes: 各行で単調増加する節点（形状 (B, N)）
+        y_nodes: 節点での値（形状 (B, N)）
+        slopes_at: (rows, index) から節点での微分係数を返す関数．有限でない値は割線の傾きで置き換える
+        x: 評価点（形状 (B, M)）
+
+    Returns:
+        np.array: 補間値（形状 (B, M)）
+    """
+    n_members, n_nodes = x_nodes.shape
+    # 全メンバーの節点を行ごとにずらして1本の配列に並べ，searchsortedを一度だけ呼ぶ
+    # （評価点より先の節点は区間の選択に影響しないため，評価点の最大値で切り詰める）
+    cap = np.max(x, initial=0.0) + 1.0
+    row_offset = 2.0 * cap * np.arange(n_members)[:, None]
+    index = np.searchsorted((np.minimum(x_nodes, cap) + row_offset).ravel(),
+                            (x + row_offset).ravel(), side='right') - 1
+    index = index.reshape(x.shape) - n_nodes * np.arange(n_members)[:, None]
+    index = np.clip(index, 0, n_nodes - 2)
+
+    # 傾きの計算と制限は，評価点を含む区間についてだけ行う
+    rows = np.arange(n_members)[:, None]
+    x0, x1 = x_nodes[rows, index], x_nodes[rows, index + 1]
+    y0, y1 = y_nodes[rows, index], y_nodes[rows, index + 1]
+    width = x1 - x0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        secant = (y1 - y0) / width
+        secant = np.where(np.isfinite(secant), secant, 0.0)
+        left = slopes_at(rows, index)
+        right = slopes_at(rows, index + 1)
+        left = np.where(np.isfinite(left), left, secant)
+        right = np.where(np.isfinite(right), right, secant)
+        # 単調性を保つよう，割線と符号の異なる傾きを0にし，大きすぎる傾きを縮める
+        left = np.where(left * secant > 0.0, left, 0.0)
+        right = np.where(right * secant > 0.0, right, 0.0)
+        norm = np.hypot(left, right) / np.abs(secant)
+        shrink = np.where(norm > 3.0, 3.0 / norm, 1.0)
+        s = np.where(width > 0.0, (x - x0) / width, 0.0)
+    h00 = (1 + 2 * s) * (1 - s)**2
+    h10 = s * (1 - s)**2
+    h01 = s**2 * (3 - 2 * s)
+    h11 = s**2 * (s - 1)
+    return (h00 * y0 + h10 * width * shrink * left
+            + h01 * y1 + h11 * width * shrink * right)
+
+
+class QuadratureSolver:
+    """
+    第一積分の求積によって，多数のパラメーターのY(X)を一度に求めるクラス
+    """
+
+    def __init__(self, sigma_0, q_0, initial_variables=(1.0, 1.0),
+                 num_intervals=512, required_span=7.0):
+        """
+        コンストラクタ
+        Args:
+            sigma_0: 密度パラメーター（スカラーまたは配列）
+            q_0: 減速パラメーター（sigma_0とブロードキャスト可能な形状）
+            initial_variables: X = 0での初期条件 [Y_0, dY_dX_0]．Y_0 = 1, dY_dX_0 > 0 を仮定する
+            num_intervals: 各枝の求積に用いる区間の数
+            required_span: 無限遠へ膨張する枝で少なくとも求める時間の長さ
+        """
+        sigma_0, q_0 = np.broadcast_arrays(np.asarray(sigma_0, dtype=float),
+                                           np.asarray(q_0, dtype=float))
+        self.parameter_shape = sigma_0.shape
+        self.sigma_0 = sigma_0.ravel()
+        self.q_0 = q_0.ravel()
+        initial_variables = np.asarray(initial_variables, dtype=float)
+        self.energy = first_integral(initial_variables, self.sigma_0, self.q_0)
+        lower, upper = _turning_points(self.sigma_0, self.q_0, self.energy)
+        self.lower = lower
+        self.upper = upper
+        # 未来方向はまず膨張し（上向きの枝），過去方向はまず収縮する（下向きの枝）
+        self.expanding_leg = _integrate_leg(self.sigma_0, self.q_0, self.energy,
+                                            upper, num_intervals, required_span)
+        self.contracting_leg = _integrate_leg(self.sigma_0, self.q_0, self.energy,
+                                              lower, num_intervals, required_span)
+        self._trajectories = {}
+
+    def _speed(self, scale_factor, rows=slice(None)):
+        """
+        第一積分から |dY/dX| = sqrt(F(Y)) を求めるメソッド
+        """
+        sigma_0 = self.sigma_0[rows].reshape(-1, 1)
+        q_0 = self.q_0[rows].reshape(-1, 1)
+        energy = self.energy[rows].reshape(-1, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(np.maximum(
+                2.0 * energy + 2.0 * sigma_0 / scale_factor
+                + (sigma_0 - q_0) * scale_factor**2, 0.0))
+
+    def _trajectory(self, direction):
+        """
+        X = 0から一方向に進む軌道の節点 (|X|, Y) と，最初の枝の節点数，転回点と特異点に達する|X|を返すメソッド
+        最初の枝が転回点（再収縮・バウンス）で終わる場合は，その枝を折り返してもう一方の枝につなぐ
+        """
+        if direction in self._trajectories:
+            return self._trajectories[direction]
+        if direction > 0:
+            first, second = self.expanding_leg, self.contracting_leg
+        else:
+            first, second = self.contracting_leg, self.expanding_leg
+        turning = first.end_is_turning_point[:, None]
+        duration = first.duration[:, None]
+
+        # 折り返さないメンバーの後半は最後の節点の値で埋め，節点の単調性を保つ
+        elapsed = np.concatenate([
+            first.elapsed,
+            np.where(turning, 2.0 * duration - first.elapsed[:, -2::-1], duration),
+            np.where(turning, 2.0 * duration + second.elapsed[:, 1:], duration),
+        ], axis=1)
+        last_scale_factor = first.scale_factor[:, -1:]
+        scale_factor = np.concatenate([
+            first.scale_factor,
+            np.where(turning, first.scale_factor[:, -2::-1], last_scale_factor),
+            np.where(turning, second.scale_factor[:, 1:], last_scale_factor),
+        ], axis=1)
+
+        # 終点が特異点 (Y = 0) の場合はそこで軌道が終わる
+        turn_time = np.where(turning[:, 0], first.duration, np.inf)
+        end_time = np.where(turning[:, 0],
+                            np.where(second.end_is_singular,
+                                     2.0 * first.duration + second.duration, np.inf),
+                            np.where(first.end_is_singular, first.duration, np.inf))
+        self._trajectories[direction] = (elapsed, scale_factor, first.elapsed.shape[1],
+                                         turn_time, end_time)
+        return self._trajectories[direction]
+
+    def evaluate(self, time):
+        """
+        全メンバーについて，時間座標Xの配列における [Y, dY_dX] を求めるメソッド
+        Args:
+            time: 時間座標Xの配列（形状 (M,) または (B, M)）
+
+        Returns:
+            np.array: [Y, dY_dX]（形状 (2,) + parameter_shape + (M,)）．特異点より先はNaN
+        """
+        time = np.asarray(time, dtype=float)
+        n_members = self.sigma_0.size
+        time = np.broadcast_to(time.reshape((-1,) + time.shape[-1:]),
+                               (n_members, time.shape[-1]))
+        result = np.full((2,) + time.shape, np.nan)
+        for direction in (1.0, -1.0):
+            elapsed, scale_factor, n_first, turn_time, end_time = self._trajectory(direction)
+            distance = np.where(direction * time >= 0.0, np.abs(time), np.nan)
+            inside = np.isfinite(distance) & (distance <= end_time[:, None])
+            distance = np.where(inside, distance, 0.0)
+
+            def slopes_at(rows, index):
+                # |X|に対する傾き：最初の枝では増加方向，折り返した後は逆向き
+                # （過去方向ではYが減少する向きが最初の枝となる）
+                speed = self._speed(scale_factor[rows, index], rows[:, 0])
+                return np.where(index < n_first, direction, -direction) * speed
+
+            interpolated = _monotone_cubic(elapsed, scale_factor, slopes_at, distance)
+            # 微分係数は補間したYから第一積分で求め，転回点の前後で符号を付ける
+            speed = self._speed(interpolated)
+            slope = np.where(distance <= turn_time[:, None], speed, -speed)
+            result[0] = np.where(inside, interpolated, result[0])
+            result[1] = np.where(inside, slope, result[1])
+        return result.reshape((2,) + self.parameter_shape + (time.shape[-1],))
+
+    def domain(self):
+        """
+        各メンバーの解が定義される時間座標の範囲（端は特異点）を返すメソッド
+
+        Returns:
+            tuple: (X_min, X_max) の配列
+        """
+        return -self._trajectory(-1.0)[4], self._trajectory(1.0)[4]
+
+
+def solve_quadrature(sigma_0, q_0, time_direction, initial_variables=(1.0, 1.0),
+                     num_intervals=512, num_samples=201):
+    """
+    第一積分の求積によりsolve_ivpと同じ形の結果を返す関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        time_direction: 時間方向を表すタプル (0, t1)
+        initial_variables: X = 0での初期条件 [Y_0, dY_dX_0]
+        num_intervals: 各枝の求積に用いる区間の数
+        num_samples: 時間座標Xを標本化する点の数
+
+    Returns:
+        AnalyticResult: 求積による解の結果
+    """
+    solver = QuadratureSolver(sigma_0, q_0, initial_variables, num_intervals,
+                              required_span=abs(float(time_direction[1])) + 1.0)
+    x_min, x_max = solver.domain()
+
+    def solution(time):
+        flat = np.atleast_1d(time).ravel()
+        scale_factor, derivative = solver.evaluate(flat)
+        return (scale_factor.reshape(np.shape(time)),
+                derivative.reshape(np.shape(time)))
+    return AnalyticResult('quadrature', solution, time_direction,
+                          (float(x_min[0]), float(x_max[0])), num_samples)
+
+
+def solve_quadrature_batch(sigma_0, q_0, time_grid, initial_variables=(1.0, 1.0),
+                           num_intervals=512, chunk_size=1024):
+    """
+    多数のパラメーターについて，共通の時間座標Xの格子上のY(X)を求積により求める関数
+    Args:
+        sigma_0: 密度パラメーターの配列
+        q_0: 減速パラメーターの配列（sigma_0とブロードキャスト可能な形状）
+        time_grid: 共通の時間座標Xの配列
+        initial_variables: X = 0での初期条件 [Y_0, dY_dX_0]
+        num_intervals: 各枝の求積に用いる区間の数
+        chunk_size: 一度に処理するメンバーの数（作業用配列のメモリ量を抑える）
+
+    Returns:
+        np.array: 規格化されたスケール因子Y(X)の配列（形状 parameter_shape + (len(time_grid),)）．
+                  特異点より先はNaN
+    """
+    sigma_0, q_0 = np.broadcast_arrays(np.asarray(sigma_0, dtype=float),
+                                       np.asarray(q_0, dtype=float))
+    time_grid = np.asarray(time_grid, dtype=float)
+    required_span = np.max(np.abs(time_grid), initial=0.0) + 1.0
+    flat_sigma, flat_q = sigma_0.ravel(), q_0.ravel()
+    scale_array = np.empty((flat_sigma.size, time_grid.size))
+    for start in range(0, flat_sigma.size, chunk_size):
+        stop = start + chunk_size
+        solver = QuadratureSolver(flat_sigma[start:stop], flat_q[start:stop],
+                                  initial_variables, num_intervals, required_span)
+        scale_array[start:stop] = solver.evaluate(time_grid)[0]
+    return scale_array.reshape(sigma_0.shape + (time_grid.size,))
@@ -0,0 +1,136 @@
+"""共形時間を用いて正則化したフリードマン方程式の数値計算用モジュール．
+
+時間座標Xの代わりに dη = dX/Y で定義される共形時間ηを独立変数とし，
+Z = Y dY/dX を変数に用いると，フリードマン方程式は
+    dY/dη = Z,  dZ/dη = Z^2/Y - sigma_0 + (sigma_0 - q_0)Y^3,  dX/dη = Y
+となる．第一積分より Z^2/Y = 2EY + 2sigma_0 + (sigma_0 - q_0)Y^3 は Y→0 でも有限であり，
+物質優勢の特異点近傍でも右辺が発散しないため，大きな刻み幅で積分できる．
+"""
+import numpy as np
+from scipy.integrate import solve_ivp
+
+# 共形時間の積分区間の上限（Xの終端に達するイベントで打ち切るため十分大きく取る）
+CONFORMAL_TIME_LIMIT = 1e6
+
+
+def regularized_friedmann_equation(eta, variables, sigma_0, q_0):
+    """
+    共形時間ηを独立変数とするフリードマン方程式の定義
+    Args:
+        eta: 共形時間η
+        variables: 変数を格納した配列 [Y, Z = Y dY_dX, X]
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+
+    Returns:
+        np.array: [dY_deta, dZ_deta, dX_deta]
+    """
+    normalized_scale_factor_a = variables[0]
+    Z = variables[1]
+    dZ_deta = (Z**2/normalized_scale_factor_a - sigma_0
+               + (sigma_0 - q_0)*normalized_scale_factor_a**3)
+    return np.array([Z, dZ_deta, normalized_scale_factor_a])
+
+
+def _make_end_time_event(end_time):
+    """時間座標Xが積分区間の終端に達したことを検出する終端イベント関数を作る関数"""
+    def end_time_event(eta, variables, *args):
+        return variables[2] - end_time
+    end_time_event.terminal = True
+    end_time_event.direction = 0
+    return end_time_event
+
+
+class RegularizedResult:
+    """
+    共形時間で積分した結果を，時間座標Xについてのsolve_ivpの戻り値と同じ形で保持するクラス
+    """
+
+    def __init__(self, conformal_sol, events):
+        """
+        コンストラクタ
+        Args:
+            conformal_sol: 共形時間ηについてのsolve_ivpの戻り値
+            events: 時間座標Xについて報告するイベント関数のリスト
+        """
+        self.conformal_sol = conformal_sol
+        self.t = conformal_sol.y[2]
+        self.y = self._to_time_derivative(conformal_sol.y)
+        self.nfev = conformal_sol.nfev
+        self.njev = conformal_sol.njev
+        self.nlu = conformal_sol.nlu
+        self.status = conformal_sol.status
+        self.message = conformal_sol.message
+        self.success = conformal_sol.success
+        # η で検出したイベントの時刻をXに変換する（最後のイベントはXの終端なので除く）
+        self.t_events = [conformal_sol.y_events[i][:, 2] if len(conformal_sol.y_events[i])
+                         else np.array([]) for i in range(len(events))]
+        self.y_events = [self._to_time_derivative(conformal_sol.y_events[i].T).T
+                         if len(conformal_sol.y_events[i]) else np.empty((0, 2))
+                         for i in range(len(events))]
+        if len(conformal_sol.t_events[-1]):
+            # Xの終端に達して止まった場合は正常終了として扱う
+            self.status = 0
+
+    @staticmethod
+    def _to_time_derivative(conformal_variables):
+        """[Y, Z, X] を [Y, dY_dX] に変換する"""
+        return np.array([conformal_variables[0],
+                         conformal_variables[1] / conformal_variables[0]])
+
+    def sol(self, t):
+        """
+        密な出力：任意の時間座標Xにおける [Y, dY_dX] を返すメソッド
+        X(η) は単調なので，節点での線形補間を初期値としたニュートン法で η(X) を求める
+        Args:
+            t: 時間座標X（スカラーまたは配列）
+
+        Returns:
+            np.array: [Y, dY_dX]
+        """
+        time = np.asarray(t, dtype=float)
+        conformal_times = self.conformal_sol.t
+        order = np.argsort(self.t)
+        eta = np.interp(time, self.t[order], conformal_times[order])
+        for _ in range(3):
+            conformal_variables = self.conformal_sol.sol(eta)
+            # dX/dη = Y
+            eta = eta - (conformal_variables[2] - time) / conformal_variables[0]
+        eta = np.clip(eta, min(conformal_times[0], conformal_times[-1]),
+                      max(conformal_times[0], conformal_times[-1]))
+        return self._to_time_derivative(self.conformal_sol.sol(eta))
+
+
+def solve_regularized(sigma_0, q_0, time_direction, initial_variables,
+                      events=(), method='RK45', rtol=1e-8, atol=1e-10):
+    """
+    共形時間でフリードマン方程式を積分し，時間座標Xについての結果を返す関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        time_direction: 時間座標Xの積分区間 (t0, t1)
+        initial_variables: 初期条件 [Y_0, dY_dX_0]
+        events: 時間座標Xについての積分で用いるイベント関数のリスト
+                （変数の並び [Y, Z, ...] の先頭2つを参照するもの）
+        method: solve_ivpの積分法
+        rtol: 相対許容誤差
+        atol: 絶対許容誤差
+
+    Returns:
+        RegularizedResult: 積分結果を含むオブジェクト
+    """
+    t0, t1 = float(time_direction[0]), float(time_direction[1])
+    scale_factor, derivative = initial_variables
+    conformal_variables = np.array([scale_factor, scale_factor * derivative, t0])
+    conformal_span = (0.0, np.sign(t1 - t0) * CONFORMAL_TIME_LIMIT)
+    events = list(events)
+    conformal_sol = solve_ivp(regularized_friedmann_equation,
+                              conformal_span,
+                              conformal_variables,
+                              method=method,
+                              rtol=rtol,
+                              atol=atol,
+                              args=(sigma_0, q_0),
+                              dense_output=True,
+                              events=events + [_make_end_time_event(t1)])
+    return RegularizedResult(conformal_sol, events)
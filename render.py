@@ -0,0 +1,151 @@
+"""GUIを用いずに回転面を描画するためのモジュール．
+
+Tkや対話的なバックエンドに依存せず，matplotlibのFigureとAggだけを用いるため，
+GUIのないバッチ処理からも利用できる．
+"""
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib.ticker as ptick
+from mpl_toolkits.mplot3d import Axes3D
+import numpy as np
+from surface import curve_segment_weights
+
+# 回転面の多角形の数の上限（詳細表示．従来のrcount=101と同程度）
+DEFAULT_POLYGON_BUDGET = 5000
+# 視点をドラッグしている間に用いる多角形の数の上限
+INTERACTION_POLYGON_BUDGET = 400
+# 詳細度の段階ごとの多角形の数の上限（ベンチマーク用）
+LOD_LEVELS = {"high": 5000, "medium": 1500, "low": 400}
+# 円周方向の分割数の下限
+MIN_COLUMNS = 12
+
+
+def select_lod_rows(time_array, scale_array, max_rows, curvature_weight=4.0):
+    """
+    曲線Y(X)の曲がり具合に応じて，描画に用いる時間方向の行を選ぶ関数
+    正規化した (X, Y) 平面上の弧長に，各点での曲線の向きの変化量を重みとして加えた量を
+    等間隔に区切るため，曲がりの強いところほど多くの行が残る
+    Args:
+        time_array: 時間座標Xの配列
+        scale_array: スケール因子Yの配列
+        max_rows: 選ぶ行数の上限
+        curvature_weight: 向きの変化量（ラジアン）に掛ける重み
+
+    Returns:
+        np.ndarray: 選んだ行の番号（昇順，両端を含む）
+    """
+    number_of_rows = len(time_array)
+    if number_of_rows <= max_rows:
+        return np.arange(number_of_rows)
+    # 過去と未来の積分結果の継ぎ目などで重なった点は，向きが定まらないため除く
+    points = np.flatnonzero(np.concatenate(
+        [[True], (np.diff(time_array) != 0) | (np.diff(scale_array) != 0)]))
+    if len(points) <= max_rows:
+        return points
+    weight = curve_segment_weights(time_array[points], scale_array[points], curvature_weight)
+    cumulative = np.concatenate([[0.0], np.cumsum(weight)])
+    targets = np.linspace(0.0, cumulative[-1], max_rows)
+    rows = np.searchsorted(cumulative, targets).clip(0, len(points) - 1)
+    return points[np.unique(np.concatenate([[0], rows, [len(points) - 1]]))]
+
+
+def decimate_mesh(surface, polygon_budget):
+    """
+    回転面のメッシュを多角形の数の上限に収まるよう間引く関数
+    円周方向は等間隔に，時間方向はselect_lod_rowsで曲線の曲がり具合に応じて間引く
+    Args:
+        surface: 回転面（RevolutionSurfaceまたはMeshSurface）
+        polygon_budget: 多角形の数の上限
+
+    Returns:
+        回転面と同じ型の間引いた回転面
+    """
+    number_of_rows, number_of_columns = surface.shape
+    columns_count = int(min(number_of_columns, max(MIN_COLUMNS, round(np.sqrt(polygon_budget)))))
+    # 円周を閉じるため，最初と最後の列は必ず残す
+    columns = np.unique(np.linspace(0, number_of_columns - 1, columns_count).round().astype(int))
+    max_rows = max(2, polygon_budget // max(len(columns) - 1, 1) + 1)
+    rows = select_lod_rows(*surface.profile(), max_rows)
+    return surface.take(rows, columns)
+
+
+def setup_surface_axes(ax):
+    """3次元グラフの背景色と軸ラベルを設定する"""
+    # 背景色の変更
+    ax.xaxis.set_pane_color((0., 0., 0., 0.))
+    ax.yaxis.set_pane_color((0., 0., 0., 0.))
+    ax.zaxis.set_pane_color((0., 0., 0., 0.))
+    ax.set_box_aspect((1, 1, 1))
+
+    # 軸ラベルの設定
+    ax.set_xlabel(r'$a_x$')
+    ax.set_ylabel(r'$a_y$')
+    ax.set_zlabel(r'$cosmic \ time$')
+
+
+def set_tick_format(ax, radial):
+    """
+    目盛りの値の表示を，スケール因子の最大値（x座標の最大値）の桁数に応じた指数表記に変更する
+    有限の値がない場合（描画できる行がない回転面）は既定の表示のままとする
+    """
+    radial = np.asarray(radial, dtype=float)
+    radial = radial[np.isfinite(radial)]
+    if len(radial) == 0:
+        return
+    max_number_of_digits = len(str(int(np.max(np.abs(radial)))))
+    ax.xaxis.set_major_formatter(ptick.ScalarFormatter(useMathText=True))
+    ax.yaxis.set_major_formatter(ptick.ScalarFormatter(useMathText=True))
+    ax.ticklabel_format(style="sci", axis="x", scilimits=(max_number_of_digits,
+                                                          max_number_of_digits))
+    ax.ticklabel_format(style="sci", axis="y", scilimits=(max_number_of_digits,
+                                                          max_number_of_digits))
+
+
+def set_radial_axes(ax, surface):
+    """
+    回転面の半径の表し方に応じて，x,y軸のラベルと目盛りの表示を設定する
+    半径が log(1 + Y) の回転面（radial_scaleが"log"）ではラベルにその旨を示す
+    """
+    if getattr(surface, "radial_scale", "linear") == "log":
+        ax.set_xlabel(r'$\log(1+a)_x$')
+        ax.set_ylabel(r'$\log(1+a)_y$')
+    else:
+        ax.set_xlabel(r'$a_x$')
+        ax.set_ylabel(r'$a_y$')
+    set_tick_format(ax, surface.profile()[1])
+
+
+def plot_surface(ax, surface, polygon_budget, **style):
+    """
+    回転面を多角形の数の上限に収まるよう間引いてプロットし，その描画オブジェクトを返す
+    styleを指定するとplot_surfaceの既定の引数（cmap='Blues'，alpha=0.4など）を上書きする
+    描画できる行が２行未満の場合（表示範囲に積分結果がない場合など）は何も描かずにNoneを返す
+    """
+    if surface.shape[0] < 2 or surface.shape[1] < 2:
+        return None
+    # 間引いた後の行と列についてだけx,y,z座標の配列を作る
+    x, y, z = decimate_mesh(surface, polygon_budget)
+    options = dict(cmap='Blues', alpha=0.4, rstride=1, cstride=1, antialiased=False, shade=True)
+    options.update(style)
+    return ax.plot_surface(x, y, z, **options)
+
+
+def render_surface(surface, path, polygon_budget=DEFAULT_POLYGON_BUDGET, dpi=100):
+    """
+    回転面を描画して画像ファイルに保存する関数
+    Args:
+        surface: 回転面（RevolutionSurfaceまたはMeshSurface）
+        path: 保存先のパス（拡張子で形式が決まる）
+        polygon_budget: 多角形の数の上限
+        dpi: 解像度
+    """
+    surface = surface.finite_rows()
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection=Axes3D.name)
+    setup_surface_axes(ax)
+    set_radial_axes(ax, surface)
+    surf = plot_surface(ax, surface, polygon_budget)
+    if surf is not None:
+        fig.colorbar(surf, ax=ax, shrink=0.75)
+    fig.savefig(path, dpi=dpi)
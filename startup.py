@@ -0,0 +1,97 @@
+"""起動時間の計測用モジュール．
+
+`python universe.py --profile-startup` のように起動すると，最初のウィンドウが表示される
+までの時間と，モジュールごとの読み込み時間の内訳を表示する．
+計測のため，このモジュールは他のモジュールより先に読み込む必要がある．
+"""
+import builtins
+import sys
+import time
+
+# 起動時間の計測を有効にするコマンドライン引数
+PROFILE_STARTUP_FLAG = "--profile-startup"
+# 最初のウィンドウを表示するまでの時間の目安（秒）
+STARTUP_BUDGET_SECONDS = 1.5
+# 起動時には読み込まないはずの重いモジュール
+DEFERRED_MODULES = ("scipy", "matplotlib", "mpl_toolkits")
+
+
+class ImportProfiler:
+    """
+    builtins.__import__ を置き換え，新たに読み込まれたモジュールごとの読み込み時間を計測するクラス
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.records = []
+        self._stack = []
+        self._original_import = None
+
+    @classmethod
+    def from_argv(cls, argv):
+        """
+        コマンドライン引数に計測のフラグがあれば計測を開始したインスタンスを返すメソッド
+        フラグはsys.argvから取り除く
+
+        Returns:
+            ImportProfiler or None: 計測しない場合はNone
+        """
+        if PROFILE_STARTUP_FLAG not in argv:
+            return None
+        argv.remove(PROFILE_STARTUP_FLAG)
+        profiler = cls()
+        profiler.start()
+        return profiler
+
+    def start(self):
+        """
+        計測を開始するメソッド
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        """
+        計測を終了するメソッド
+        """
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """読み込み済みでないモジュールについて，読み込みにかかった時間を記録する"""
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            # 入れ子の読み込みを含む時間と，このモジュール自身の時間を記録する
+            self.records.append((name, elapsed, elapsed - nested, len(self._stack)))
+
+    def report(self, label="最初のウィンドウの表示", limit=15, file=None):
+        """
+        計測を終了し，経過時間と読み込み時間の内訳を表示するメソッド
+        Args:
+            label: 経過時間の説明
+            limit: 表示するモジュールの数
+            file: 出力先．Noneの場合は標準エラー出力
+        """
+        self.stop()
+        file = sys.stderr if file is None else file
+        elapsed = time.perf_counter() - self.start_time
+        print("{}まで: {:.3f} s（目安 {:.1f} s）".format(label, elapsed, STARTUP_BUDGET_SECONDS),
+              file=file)
+        top_level = sorted((record for record in self.records if record[3] == 0),
+                           key=lambda record: record[1], reverse=True)
+        print("{:<32} {:>10} {:>10}".format("module", "total[ms]", "self[ms]"), file=file)
+        for name, total, own, _ in top_level[:limit]:
+            print("{:<32} {:>10.1f} {:>10.1f}".format(name, total * 1e3, own * 1e3), file=file)
+        loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+        if loaded:
+            print("起動時に読み込まれた重いモジュール: {}".format(", ".join(loaded)), file=file)
@@ -0,0 +1,311 @@
+"""長い時間範囲の積分結果をディスクに逐次書き出すためのモジュール．
+
+積分は一定の時間幅ごとの区間（チャンク）に分けて進め，各チャンクの結果を
+.npyファイルとして書き出す．スケール因子は u = log Y，v = dlogY/dX = Y'/Y の対数形式で
+積分・保存するため，宇宙項が優勢な指数関数的膨張でも桁あふれや精度の低下が起こらない．
+    du/dX = v,  dv/dX = -sigma_0 exp(-3u) + (sigma_0 - q_0) - v^2
+読み出しは np.load(mmap_mode='r') で必要な時間範囲のチャンクだけを対象に行う．
+"""
+import json
+import os
+import numpy as np
+from scipy.integrate import solve_ivp
+
+# 保存する列：時間座標X，log Y，dlogY/dX
+COLUMNS = ("X", "log_Y", "dlogY_dX")
+# チャンクの一覧を記録するファイル名
+INDEX_FILE = "index.json"
+
+
+def log_friedmann_equation(time, variables, sigma_0, q_0):
+    """
+    対数形式のフリードマン方程式の定義
+    Args:
+        time: 時間座標X
+        variables: 変数を格納した配列 [u = log Y, v = dlogY/dX]
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+
+    Returns:
+        np.array: [du_dX, dv_dX]
+    """
+    log_scale_factor = variables[0]
+    hubble = variables[1]
+    dv_dX = -sigma_0*np.exp(-3*log_scale_factor) + (sigma_0 - q_0) - hubble**2
+    return np.array([hubble, dv_dX])
+
+
+def _make_log_events(singularity_threshold):
+    """対数形式の変数についての特異点・転回点のイベント関数を作る"""
+    log_threshold = np.log(singularity_threshold)
+
+    def singularity_event(time, variables, *args):
+        return variables[0] - log_threshold
+    singularity_event.terminal = True
+    singularity_event.direction = -1
+
+    def turning_point_event(time, variables, *args):
+        return variables[1]
+    turning_point_event.terminal = False
+    turning_point_event.direction = 0
+    return [singularity_event, turning_point_event]
+
+
+class TrajectoryStore:
+    """
+    チャンクごとの.npyファイルと，その一覧（index.json）からなる積分結果の保存先を表すクラス
+    """
+
+    def __init__(self, directory, chunks=None, metadata=None):
+        """
+        コンストラクタ
+        Args:
+            directory: 保存先のディレクトリ
+            chunks: チャンクの情報（ファイル名，行数，時間座標の範囲）のリスト
+            metadata: 積分条件などの付加情報
+        """
+        self.directory = directory
+        self.chunks = [] if chunks is None else chunks
+        self.metadata = {} if metadata is None else metadata
+
+    @classmethod
+    def create(cls, directory, metadata=None):
+        """
+        空の保存先を作成するメソッド．既存のチャンクは削除する
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("chunk_") and name.endswith(".npy"):
+                os.remove(os.path.join(directory, name))
+        store = cls(directory, metadata=metadata)
+        store.flush()
+        return store
+
+    @classmethod
+    def open(cls, directory):
+        """
+        既存の保存先を開くメソッド
+        """
+        with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as file:
+            index = json.load(file)
+        return cls(directory, index["chunks"], index["metadata"])
+
+    def append(self, rows):
+        """
+        チャンクを書き出すメソッド
+        Args:
+            rows: 形状 (行数, 3) の配列（列はCOLUMNS）
+        """
+        rows = np.asarray(rows, dtype=float)
+        if len(rows) == 0:
+            return
+        name = "chunk_{:06d}.npy".format(len(self.chunks))
+        np.save(os.path.join(self.directory, name), rows)
+        self.chunks.append({"file": name, "rows": len(rows),
+                            "x_min": float(rows[:, 0].min()), "x_max": float(rows[:, 0].max())})
+        self.flush()
+
+    def flush(self):
+        """
+        チャンクの一覧を書き出すメソッド（途中で中断しても書き出し済みのチャンクは読める）
+        """
+        index = {"columns": list(COLUMNS), "chunks": self.chunks, "metadata": self.metadata}
+        temporary_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(index, file, indent=2)
+        os.replace(temporary_path, os.path.join(self.directory, INDEX_FILE))
+
+    @property
+    def num_rows(self):
+        """保存されている行数"""
+        return sum(chunk["rows"] for chunk in self.chunks)
+
+    def _load(self, chunk):
+        return np.load(os.path.join(self.directory, chunk["file"]), mmap_mode='r')
+
+    def read_window(self, x_min=-np.inf, x_max=np.inf, pad=False):
+        """
+        時間座標Xが [x_min, x_max] の範囲の行だけを読み出すメソッド
+        範囲と重なるチャンクだけをメモリマップで開き，該当する行だけをメモリに読み込む
+        Args:
+            x_min: 範囲の下限
+            x_max: 範囲の上限
+            pad: Trueの場合は範囲の両外側の１行ずつも含める（補間用）
+
+        Returns:
+            np.ndarray: 時間座標Xの昇順に並べた形状 (行数, 3) の配列
+        """
+        chunks = sorted(self.chunks, key=lambda chunk: chunk["x_min"])
+        selected = [i for i, chunk in enumerate(chunks)
+                    if chunk["x_max"] >= x_min and chunk["x_min"] <= x_max]
+        if pad:
+            # 範囲の外側の隣の行は，隣のチャンクにある場合がある
+            if selected:
+                first, last = selected[0] - 1, selected[-1] + 1
+            else:
+                first = last = int(np.searchsorted([chunk["x_min"] for chunk in chunks], x_min))
+                first -= 1
+            selected = list(range(max(first, 0), min(last, len(chunks) - 1) + 1))
+        if not selected:
+            return np.empty((0, len(COLUMNS)))
+        rows = np.concatenate([self._load(chunks[i]) for i in selected])
+        rows = rows[np.argsort(rows[:, 0], kind="stable")]
+        times = rows[:, 0]
+        start = np.searchsorted(times, x_min, side="left")
+        stop = np.searchsorted(times, x_max, side="right")
+        if pad:
+            start, stop = max(start - 1, 0), min(stop + 1, len(rows))
+        return np.array(rows[start:stop])
+
+
+class StreamedResult:
+    """
+    TrajectoryStoreに保存した積分結果を，solve_ivpの戻り値と同じように扱うためのクラス
+    t, y は全履歴を読み込むため，長い履歴では window や sol を用いる
+    """
+
+    def __init__(self, store, t_events, status, nfev, message):
+        self.store = store
+        self.t_events = t_events
+        self.status = status
+        self.success = status >= 0
+        self.nfev = nfev
+        self.message = message
+
+    @staticmethod
+    def _to_variables(rows):
+        """保存した行から [Y, dY_dX] を求める（倍精度の範囲を超えるYはinfとなる）"""
+        with np.errstate(over="ignore"):
+            scale_factor = np.exp(rows[:, 1])
+        return np.array([scale_factor, scale_factor * rows[:, 2]])
+
+    @property
+    def t(self):
+        """積分した順の時間座標X（全履歴を読み込む）"""
+        rows = self.store.read_window()
+        return rows[:, 0] if self.store.metadata.get("forward", True) else rows[::-1, 0]
+
+    @property
+    def y(self):
+        """積分した順の [Y, dY_dX]（全履歴を読み込む）"""
+        rows = self.store.read_window()
+        if not self.store.metadata.get("forward", True):
+            rows = rows[::-1]
+        return self._to_variables(rows)
+
+    @property
+    def span(self):
+        """保存されている時間座標Xの最小値と最大値（チャンクの一覧から求める）"""
+        return (min(chunk["x_min"] for chunk in self.store.chunks),
+                max(chunk["x_max"] for chunk in self.store.chunks))
+
+    def window(self, x_min, x_max, log_scale=False):
+        """
+        時間座標Xの範囲を指定して，その範囲の刻み点だけを読み出すメソッド
+        Args:
+            x_min: 範囲の下限
+            x_max: 範囲の上限
+            log_scale: Trueの場合は保存した対数形式 [log Y, dlogY/dX] のまま返す
+                       （指数関数的膨張でYが倍精度の範囲を超える場合に用いる）
+
+        Returns:
+            time_array: 昇順の時間座標X
+            variables: [Y, dY_dX] または [log Y, dlogY/dX]
+        """
+        rows = self.store.read_window(x_min, x_max)
+        if log_scale:
+            return rows[:, 0], rows[:, 1:].T
+        return rows[:, 0], self._to_variables(rows)
+
+    def sol(self, t, log_scale=False):
+        """
+        密な出力：任意の時間座標Xにおける [Y, dY_dX] を返すメソッド
+        log Yとその微分dlogY/dXを用いた３次エルミート補間で求め，
+        問い合わせた範囲のチャンクだけを読み込む
+        Args:
+            t: 時間座標X（スカラーまたは配列）
+            log_scale: Trueの場合は補間した対数形式 [log Y, dlogY/dX] のまま返す
+
+        Returns:
+            np.array: [Y, dY_dX] または [log Y, dlogY/dX]
+        """
+        time = np.asarray(t, dtype=float)
+        flat = np.atleast_1d(time).ravel()
+        # 問い合わせた範囲の両側の刻み点も含めて読み込む
+        rows = self.store.read_window(flat.min(), flat.max(), pad=True)
+        rows = rows[np.concatenate([[True], np.diff(rows[:, 0]) > 0])]
+        nodes, log_nodes, slope = rows[:, 0], rows[:, 1], rows[:, 2]
+        if len(nodes) == 1:
+            log_value = np.full_like(flat, log_nodes[0])
+            derivative = np.full_like(flat, slope[0])
+        else:
+            index = np.clip(np.searchsorted(nodes, flat) - 1, 0, len(nodes) - 2)
+            h = nodes[index + 1] - nodes[index]
+            s = (flat - nodes[index]) / h
+            h00, h10 = 2*s**3 - 3*s**2 + 1, s**3 - 2*s**2 + s
+            h01, h11 = -2*s**3 + 3*s**2, s**3 - s**2
+            log_value = (h00*log_nodes[index] + h10*h*slope[index]
+                         + h01*log_nodes[index + 1] + h11*h*slope[index + 1])
+            derivative = ((6*s**2 - 6*s)/h*log_nodes[index] + (3*s**2 - 4*s + 1)*slope[index]
+                          + (-6*s**2 + 6*s)/h*log_nodes[index + 1] + (3*s**2 - 2*s)*slope[index + 1])
+        if log_scale:
+            result = np.array([log_value, derivative])
+        else:
+            with np.errstate(over="ignore"):
+                scale_factor = np.exp(log_value)
+            result = np.array([scale_factor, scale_factor * derivative])
+        return result.reshape((2,) + time.shape)
+
+
+def integrate_streaming(sigma_0, q_0, time_direction, initial_variables, directory,
+                        chunk_span=10.0, singularity_threshold=1e-3,
+                        rtol=1e-8, atol=1e-10, progress=None, method='RK45'):
+    """
+    対数形式のフリードマン方程式をチャンクごとに積分し，結果をディスクに書き出す関数
+    Args:
+        sigma_0: 密度パラメーター
+        q_0: 減速パラメーター
+        time_direction: 時間方向を表すタプル (t0, t1)
+        initial_variables: 初期条件 [Y_0, dY_dX_0]
+        directory: 保存先のディレクトリ
+        chunk_span: １つのチャンクで積分する時間座標Xの幅
+        singularity_threshold: Yがこの値を下回ったら特異点として積分を打ち切る
+        rtol: 相対許容誤差
+        atol: 絶対許容誤差
+        progress: 進捗の割合を受け取る関数（チャンクごとに呼ばれる）
+        method: solve_ivpの積分法
+
+    Returns:
+        StreamedResult: 積分結果
+    """
+    t0, t1 = float(time_direction[0]), float(time_direction[1])
+    direction = 1.0 if t1 >= t0 else -1.0
+    scale_factor, derivative = initial_variables
+    variables = np.array([np.log(scale_factor), derivative / scale_factor])
+    store = TrajectoryStore.create(directory, metadata={
+        "sigma_0": float(sigma_0), "q_0": float(q_0), "time_direction": [t0, t1],
+        "forward": direction > 0, "chunk_span": float(chunk_span)})
+    store.append([[t0, variables[0], variables[1]]])
+    events = _make_log_events(singularity_threshold)
+    event_times = [[], []]
+    nfev = 0
+    status = 0
+    message = "The solver successfully reached the end of the integration interval."
+    start = t0
+    while direction * (t1 - start) > 0:
+        end = start + direction * min(chunk_span, abs(t1 - start))
+        sol = solve_ivp(log_friedmann_equation, (start, end), variables, method=method,
+                        rtol=rtol, atol=atol, args=(sigma_0, q_0), events=events)
+        nfev += sol.nfev
+        store.append(np.column_stack([sol.t[1:], sol.y[0, 1:], sol.y[1, 1:]]))
+        for times, new_times in zip(event_times, sol.t_events):
+            times.extend(float(time) for time in new_times)
+        if progress is not None:
+            progress((end - t0) / (t1 - t0))
+        if sol.status != 0:
+            status, message = sol.status, sol.message
+            break
+        start, variables = end, sol.y[:, -1]
+    # 発散のイベントは対数形式では不要なため，常に空とする
+    t_events = [np.array(event_times[0]), np.array(event_times[1]), np.array([])]
+    return StreamedResult(store, t_events, status, nfev, message)
@@ -0,0 +1,222 @@
+"""回転面を少ないメモリで表すためのモジュール．
+
+回転面の座標は x = Y(X)cos(phi)，y = Y(X)sin(phi)，z = X であり，
+時間座標X，スケール因子Y(X)，回転角phiの１次元配列だけで決まる．
+RevolutionSurfaceはこれらだけを保持し，x,y,z座標は参照されたときに求める
+（zはコピーを作らないnp.broadcast_toのビューとする）．
+Yが倍精度の範囲を超える長時間の積分では，半径を log(1 + Y) とした回転面を用いる
+（radial_scale が "log"）．
+"""
+import numpy as np
+
+
+class RevolutionSurface:
+    """
+    スケール因子Y(X)の曲線を時間軸の周りに回転させた回転面を表すクラス
+    """
+
+    def __init__(self, time_array, radial, phi, radial_scale="linear"):
+        """
+        コンストラクタ
+        Args:
+            time_array: 時間座標Xの配列（長さN_time）
+            radial: 半径の配列（長さN_time）．radial_scaleが"linear"ではスケール因子Y，
+                    "log"では log(1 + Y)
+            phi: 回転角の配列（長さN_phi）
+            radial_scale: 半径の表し方（"linear"または"log"）
+        """
+        self.radial_scale = radial_scale
+        self.time_array = np.asarray(time_array, dtype=float).ravel()
+        self.radial = np.asarray(radial, dtype=float).ravel()
+        self.phi = np.asarray(phi, dtype=float).ravel()
+        self._cos = np.cos(self.phi)
+        self._sin = np.sin(self.phi)
+
+    @property
+    def shape(self):
+        """x,y,z座標の配列の形状 (N_time, N_phi)"""
+        return (len(self.time_array), len(self.phi))
+
+    @property
+    def x(self):
+        """回転変換後のx座標（参照するたびに求める）"""
+        return np.multiply.outer(self.radial, self._cos)
+
+    @property
+    def y(self):
+        """回転変換後のy座標（参照するたびに求める）"""
+        return np.multiply.outer(self.radial, self._sin)
+
+    @property
+    def z(self):
+        """回転変換後のz座標（時間座標Xの読み取り専用のビュー）"""
+        return np.broadcast_to(self.time_array[:, np.newaxis], self.shape)
+
+    @property
+    def nbytes(self):
+        """保持している配列の合計サイズ（バイト）"""
+        return sum(array.nbytes for array in
+                   (self.time_array, self.radial, self.phi, self._cos, self._sin))
+
+    def __iter__(self):
+        """x, y, z = surface のように座標を取り出せるようにする"""
+        return iter((self.x, self.y, self.z))
+
+    def profile(self):
+        """
+        回転前の曲線を返すメソッド
+
+        Returns:
+            time_array: 時間座標X
+            radial: スケール因子Y
+        """
+        return self.time_array, self.radial
+
+    def take(self, rows, columns=slice(None)):
+        """
+        時間方向の行と回転角の列を選んだ回転面を返すメソッド
+        Args:
+            rows: 行の番号の配列，真偽値の配列またはスライス
+            columns: 列の番号の配列，真偽値の配列またはスライス
+
+        Returns:
+            RevolutionSurface: 選んだ行と列からなる回転面
+        """
+        return RevolutionSurface(self.time_array[rows], self.radial[rows], self.phi[columns],
+                                 self.radial_scale)
+
+    def finite_rows(self):
+        """
+        特異点で打ち切られた行など，有限でない値を含む行を除いた回転面を返すメソッド
+        """
+        return self.take(np.isfinite(self.time_array) & np.isfinite(self.radial))
+
+    def to_arrays(self):
+        """
+        保存用の配列の辞書を返すメソッド（surface_from_arraysで復元できる）
+        """
+        return _with_radial_scale(
+            {"time_array": self.time_array, "scale_array": self.radial, "phi": self.phi},
+            self.radial_scale)
+
+
+class MeshSurface:
+    """
+    任意の座標変換による回転面を，x,y,z座標の配列のまま表すクラス
+    RevolutionSurfaceと同じ方法で扱えるようにするためのもの
+    """
+
+    def __init__(self, x, y, z, radial_scale="linear"):
+        """
+        コンストラクタ
+        Args:
+            x, y, z: 座標の配列（行が時間方向，列が回転角の方向）
+            radial_scale: 回転前の半径の表し方（"linear"または"log"）
+        """
+        self.radial_scale = radial_scale
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.z = np.asarray(z, dtype=float)
+
+    @property
+    def shape(self):
+        """x,y,z座標の配列の形状"""
+        return self.z.shape
+
+    @property
+    def nbytes(self):
+        """保持している配列の合計サイズ（バイト）"""
+        return self.x.nbytes + self.y.nbytes + self.z.nbytes
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def profile(self):
+        """
+        回転角が0の列から求めた回転前の曲線を返すメソッド
+        """
+        return self.z[:, 0], np.hypot(self.x[:, 0], self.y[:, 0])
+
+    def take(self, rows, columns=slice(None)):
+        """
+        時間方向の行と回転角の列を選んだ回転面を返すメソッド
+        """
+        mesh = np.ix_(np.arange(self.shape[0])[rows], np.arange(self.shape[1])[columns])
+        return MeshSurface(self.x[mesh], self.y[mesh], self.z[mesh], self.radial_scale)
+
+    def finite_rows(self):
+        """
+        有限でない値を含む行を除いた回転面を返すメソッド
+        """
+        return self.take(np.isfinite(self.x).all(axis=1) &
+                         np.isfinite(self.y).all(axis=1) &
+                         np.isfinite(self.z).all(axis=1))
+
+    def to_arrays(self):
+        """
+        保存用の配列の辞書を返すメソッド（surface_from_arraysで復元できる）
+        """
+        time_array, scale_array = self.profile()
+        return _with_radial_scale(
+            {"time_array": time_array, "scale_array": scale_array,
+             "x_new": self.x, "y_new": self.y, "z_new": self.z},
+            self.radial_scale)
+
+
+def as_surface(x, y=None, z=None):
+    """
+    回転面のオブジェクト，またはx,y,z座標の配列を回転面のオブジェクトにそろえる関数
+    Args:
+        x: RevolutionSurface，MeshSurface，またはx座標の配列
+        y, z: xが配列の場合のy,z座標の配列
+
+    Returns:
+        RevolutionSurface or MeshSurface
+    """
+    if y is None and z is None:
+        return x
+    return MeshSurface(x, y, z)
+
+
+def _with_radial_scale(arrays, radial_scale):
+    """対数の半径の場合だけ，その表し方を保存用の配列の辞書に加える（従来の形式を変えないため）"""
+    if radial_scale != "linear":
+        arrays["radial_scale"] = np.array(radial_scale)
+    return arrays
+
+
+def surface_from_arrays(arrays):
+    """
+    to_arraysで保存した配列の辞書から回転面のオブジェクトを復元する関数
+    """
+    radial_scale = str(arrays["radial_scale"]) if "radial_scale" in arrays else "linear"
+    if "x_new" in arrays:
+        return MeshSurface(arrays["x_new"], arrays["y_new"], arrays["z_new"], radial_scale)
+    return RevolutionSurface(arrays["time_array"], arrays["scale_array"], arrays["phi"],
+                             radial_scale)
+
+
+def curve_segment_weights(time_array, scale_array, curvature_weight=4.0):
+    """
+    回転前の曲線Y(X)の各線分に，曲がり具合に応じた重みを与える関数
+    正規化した (X, Y) 平面上の線分の長さに，隣り合う線分の向きの差（-π〜π）に
+    curvature_weightを掛けた量を両側の線分に半分ずつ加える．
+    計算結果の標本化（answer_calculate.py）と描画時の間引き（render.py）で共通に用いる
+    Args:
+        time_array: 時間座標Xの配列（重なった点を含まないもの）
+        scale_array: スケール因子Yの配列
+        curvature_weight: 向きの変化量（ラジアン）に掛ける重み
+
+    Returns:
+        np.ndarray: 各線分の重み（長さは len(time_array) - 1）
+    """
+    normalized = []
+    for values in (time_array, scale_array):
+        extent = np.ptp(values)
+        normalized.append((values - values.min()) / (extent if extent > 0 else 1.0))
+    dt, dy = np.diff(normalized[0]), np.diff(normalized[1])
+    weights = np.hypot(dt, dy)
+    turning = np.abs(np.angle(np.exp(1j * np.diff(np.arctan2(dy, dt)))))
+    weights[:-1] += 0.5 * curvature_weight * turning
+    weights[1:] += 0.5 * curvature_weight * turning
+    return weights
@@ -0,0 +1,57 @@
+"""一括数値計算の軌道を，solve_ivpによるメンバーごとの数値積分と比べるテスト．
+
+実行方法:
+    python -m pytest test_batch_calculate.py
+"""
+import sys
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+import answer_calculate
+sys.modules.setdefault("calculate", answer_calculate)
+
+from batch_calculate import BatchFriedmannEquationIntegrator  # noqa: E402
+
+# 開いた・平坦・閉じた宇宙，宇宙項が正・負のモデルを混ぜる
+SIGMA_0 = np.array([0.0, 0.5, 0.1, 1.5, 0.05, 0.3, 2.0])
+Q_0 = np.array([0.0, 0.5, -0.5, 1.0, -1.0, 0.1, 0.8])
+
+
+def _reference(sigma_0, q_0, time_grid):
+    """X=0から両方向にsolve_ivpで積分し，time_gridの各点のYを返す"""
+    scale_array = np.full(time_grid.size, np.nan)
+    scale_array[time_grid == 0.0] = 1.0
+    for direction in (1.0, -1.0):
+        mask = direction * time_grid > 0.0
+        end = time_grid[mask][np.argmax(direction * time_grid[mask])]
+        sol = solve_ivp(answer_calculate.friedmann_equation, (0.0, end), [1.0, 1.0],
+                        args=(sigma_0, q_0), dense_output=True, rtol=1e-11, atol=1e-13)
+        reached = direction * time_grid[mask] <= direction * sol.t[-1]
+        scale_array[np.flatnonzero(mask)[reached]] = sol.sol(time_grid[mask][reached])[0]
+    return scale_array
+
+
+def test_batch_matches_scalar_solve_ivp():
+    instance = BatchFriedmannEquationIntegrator(SIGMA_0, Q_0, rtol=1e-10, atol=1e-12)
+    batch = instance.integrate()
+
+    assert batch.shape == (SIGMA_0.size, instance.time_grid.size)
+    for member, (sigma_0, q_0) in enumerate(zip(SIGMA_0, Q_0)):
+        reference = _reference(sigma_0, q_0, instance.time_grid)
+        # 特異点の近くではどちらの積分も不正確になるため，Yが十分に大きい点で比べる
+        compared = np.isfinite(batch[member]) & (batch[member] > 0.05)
+        assert compared.sum() > instance.time_grid.size // 4
+        np.testing.assert_allclose(batch[member, compared], reference[compared],
+                                   rtol=1e-6, err_msg="sigma_0={}, q_0={}".format(sigma_0, q_0))
+
+
+def test_parameter_shape_is_preserved():
+    sigma_0 = SIGMA_0[:6].reshape(2, 3)
+    q_0 = Q_0[:6].reshape(2, 3)
+    instance = BatchFriedmannEquationIntegrator(sigma_0, q_0)
+    batch = instance.integrate()
+
+    assert batch.shape == (2, 3, instance.time_grid.size)
+    flat = BatchFriedmannEquationIntegrator(sigma_0.ravel(), q_0.ravel()).integrate()
+    np.testing.assert_array_equal(batch.reshape(6, -1), flat)
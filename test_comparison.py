@@ -0,0 +1,48 @@
+"""比較のモデルをプロセスプールで計算する経路のテスト．
+
+実行方法:
+    python -m pytest test_comparison.py
+"""
+import sys
+
+import numpy as np
+import pytest
+
+import answer_calculate
+sys.modules.setdefault("calculate", answer_calculate)
+
+from comparison import ComparisonMember, ComparisonResult, compute_members  # noqa: E402
+
+MEMBERS = [ComparisonMember("Einstein-deSitter", 0.5, 0.5),
+           ComparisonMember("Lemaitre", 0.1, -0.5),
+           ComparisonMember("closed", 1.5, 1.0)]
+
+
+class Cancelled(Exception):
+    pass
+
+
+def test_pool_results_match_serial():
+    serial, computed = compute_members(MEMBERS, workers=1)
+    pooled, _ = compute_members(MEMBERS, workers=2)
+
+    assert computed == len(MEMBERS)
+    for expected, actual in zip(serial, pooled):
+        assert expected.keys() == actual.keys()
+        for name in expected:
+            np.testing.assert_array_equal(expected[name], actual[name])
+    result = ComparisonResult(MEMBERS, pooled)
+    assert result.scale_matrix.shape == (len(MEMBERS), result.time_grid.size)
+
+
+def test_pool_cancellation_propagates():
+    received = []
+
+    def progress(stage, fraction):
+        received.append(fraction)
+        if fraction > 0:
+            raise Cancelled
+
+    with pytest.raises(Cancelled):
+        compute_members(MEMBERS, workers=2, progress_callback=progress)
+    assert received[0] == 0 and len(received) == 2
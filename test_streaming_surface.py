@@ -0,0 +1,90 @@
+"""ストリーミング積分の回転面が倍精度の範囲を超えても描画できることを確かめるテスト．
+
+実行方法:
+    python -m pytest test_streaming_surface.py
+"""
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pytest
+
+import answer_calculate
+sys.modules.setdefault("calculate", answer_calculate)
+
+from phase import curvature_and_lambda  # noqa: E402
+import render  # noqa: E402
+from surface import RevolutionSurface  # noqa: E402
+
+# 宇宙項が支配するモデル（Y = exp(X)）．X ≈ 709.78 でYが倍精度の最大値を超える
+SIGMA_0, Q_0 = 0.0, -1.0
+WINDOW = (990.0, 1000.0)
+
+
+def _integrator(storage_dir, radial_scale="auto"):
+    K, Lambda = curvature_and_lambda(SIGMA_0, Q_0)
+    return answer_calculate.FriedmannEquationIntegrator(
+        answer_calculate.friedmann_equation, answer_calculate.rotate_coordinates,
+        SIGMA_0, Q_0, K, Lambda, time_plus=(0.0, WINDOW[1]), time_minus=(0.0, -1.0),
+        storage_dir=str(storage_dir), chunk_span=100.0, sampling="uniform",
+        radial_scale=radial_scale)
+
+
+def test_window_past_overflow_uses_log_radius(tmp_path):
+    instance = _integrator(tmp_path)
+    surface = instance.calculate_surface(window=WINDOW)
+
+    assert instance.resolved_radial_scale == "log"
+    assert surface.radial_scale == "log"
+    finite = surface.finite_rows()
+    assert finite.shape[0] > 1
+    time_array, radial = finite.profile()
+    # log(1 + exp(X)) ≈ X
+    np.testing.assert_allclose(radial, time_array, rtol=1e-6)
+
+
+def test_window_past_overflow_renders(tmp_path):
+    surface = _integrator(tmp_path / "store").calculate_surface(window=WINDOW)
+    path = tmp_path / "surface.png"
+    render.render_surface(surface, str(path), polygon_budget=2000, dpi=40)
+    assert path.stat().st_size > 0
+
+
+def test_window_before_overflow_stays_linear(tmp_path):
+    instance = _integrator(tmp_path)
+    surface = instance.calculate_surface(window=(0.0, 5.0))
+
+    assert surface.radial_scale == "linear"
+    time_array, radial = surface.finite_rows().profile()
+    np.testing.assert_allclose(radial, np.exp(time_array), rtol=1e-5)
+
+
+def test_linear_radius_past_overflow_renders_empty(tmp_path):
+    # 線形の半径を指定するとすべての行がinfになるが，描画は失敗しない
+    surface = _integrator(tmp_path / "store", radial_scale="linear").calculate_surface(
+        window=WINDOW)
+    assert surface.finite_rows().shape[0] == 0
+    path = tmp_path / "empty.png"
+    render.render_surface(surface, str(path), dpi=40)
+    assert path.stat().st_size > 0
+
+
+@pytest.mark.parametrize("rows", [0, 1])
+def test_render_surface_with_too_few_rows(tmp_path, rows):
+    surface = RevolutionSurface(np.arange(rows, dtype=float), np.ones(rows),
+                                np.linspace(0.0, 2*np.pi, 8).reshape(1, -1))
+    path = tmp_path / "few.png"
+    render.render_surface(surface, str(path), dpi=40)
+    assert path.stat().st_size > 0
+
+
+def test_frame_renderer_with_empty_surface(tmp_path):
+    from animation import FrameRenderer, frame_times
+
+    surface = RevolutionSurface(np.array([0.0, 1.0]), np.array([np.inf, np.inf]),
+                                np.linspace(0.0, 2*np.pi, 8).reshape(1, -1))
+    renderer = FrameRenderer(surface, dpi=40)
+    times = frame_times(surface, 2)
+    renderer.save(times[-1], str(tmp_path / "frame.png"))
+    assert renderer.artist is None
@@ -0,0 +1,235 @@
+"""計算と描画の主要な段階の所要時間を計測するためのモジュール．
+
+積分，積分結果の結合，回転変換，figureの作成，キャンバスへの描画などの段階を
+span で囲み，経過時間と右辺の評価回数・刻み数・配列の大きさなどを記録する．
+計測を有効にしていないとき span は何もしない共通のコンテキストマネージャーを返すだけなので，
+計算や描画の負荷はほとんど増えない．
+
+`python universe.py --trace trace.jsonl` のように起動すると計測を有効にし，
+１回の実行（計算から描画まで）ごとの記録をJSON Lines形式でファイルに追記する．
+"""
+import contextlib
+import json
+import threading
+import time
+
+# 計測を有効にするコマンドライン引数（続けてJSON Linesの出力先を指定できる）
+TRACE_FLAG = "--trace"
+# GUIの状態表示に用いる段階名
+SPAN_LABELS = {
+    "cache": "キャッシュ",
+    "integrate": "積分",
+    "concatenate": "結合",
+    "rotate": "回転",
+    "rotated_coordinates": "座標配列",
+    "figure": "図の作成",
+    "canvas": "キャンバス配置",
+    "render": "描画",
+}
+
+# 計測が無効のときに span が返す，何もしないコンテキストマネージャー
+_NULL_SPAN = contextlib.nullcontext()
+# 有効なTracer．Noneの場合は計測しない
+_tracer = None
+
+
+class RunTrace:
+    """
+    １回の実行（計算から描画まで）の計測結果を表すクラス
+    """
+
+    def __init__(self, label, **fields):
+        """
+        コンストラクタ
+        Args:
+            label: 実行の名前
+            fields: 実行全体に付ける情報（パラメーターなど）
+        """
+        self.label = label
+        self.fields = fields
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        """
+        段階の計測結果を追加するメソッド（計算用のスレッドからも呼ばれる）
+        """
+        with self._lock:
+            self.spans.append(record)
+
+    def status_text(self):
+        """
+        GUIの状態表示に用いる，段階ごとの経過時間の文字列を返すメソッド
+        """
+        with self._lock:
+            spans = list(self.spans)
+        parts = []
+        for record in spans:
+            text = SPAN_LABELS.get(record["name"], record["name"])
+            if record.get("stage") is not None:
+                text += "({})".format(record["stage"])
+            text += " {:.1f} ms".format(1000 * record["wall_time"])
+            if record.get("hit") is not None:
+                text += " ヒット" if record["hit"] else " ミス"
+            if record.get("nfev") is not None:
+                text += " nfev {}".format(record["nfev"])
+            parts.append(text)
+        return " | ".join(parts)
+
+    def to_dict(self):
+        """
+        JSON Linesの１行として書き出す辞書を返すメソッド
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return dict(label=self.label, **self.fields, started=self.started,
+                    total_time=sum(record["wall_time"] for record in spans), spans=spans)
+
+
+class Tracer:
+    """
+    段階の計測結果を現在の実行にまとめ，実行ごとにファイルへ書き出すクラス
+    """
+
+    def __init__(self, path=None):
+        """
+        コンストラクタ
+        Args:
+            path: JSON Linesの出力先．Noneの場合はファイルに書き出さない
+        """
+        self.path = path
+        self.current = None
+
+    def start_run(self, label, **fields):
+        """
+        新しい実行を開始するメソッド．前の実行が終わっていなければ先に書き出す
+        """
+        self.finish_run()
+        self.current = RunTrace(label, **fields)
+        return self.current
+
+    def finish_run(self):
+        """
+        現在の実行を終了し，出力先が指定されていれば追記するメソッド
+
+        Returns:
+            RunTrace or None: 終了した実行
+        """
+        run, self.current = self.current, None
+        if run is not None and run.spans and self.path is not None:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(run.to_dict(), ensure_ascii=False) + "\n")
+        return run
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """
+        段階の経過時間を計測するコンテキストマネージャー
+        with文で受け取る辞書に項目を追加すると，計測結果に含まれる
+        """
+        record = dict(name=name, **fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - start
+            run = self.current
+            if run is not None:
+                run.add(record)
+
+
+def enable(path=None):
+    """
+    計測を有効にする関数
+    Args:
+        path: JSON Linesの出力先．Noneの場合はファイルに書き出さない
+
+    Returns:
+        Tracer: 有効にしたTracer
+    """
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def disable():
+    """
+    計測を無効にする関数．終了していない実行があれば書き出す
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.finish_run()
+    _tracer = None
+
+
+def is_enabled():
+    """
+    計測が有効かどうかを返す関数
+    """
+    return _tracer is not None
+
+
+def span(name, **fields):
+    """
+    段階の経過時間を計測するコンテキストマネージャーを返す関数
+    計測が無効の場合はNoneを受け取る何もしないコンテキストマネージャーを返す
+
+    使い方:
+        with timing.span("integrate", stage="future") as record:
+            sol = ...
+            if record is not None:
+                record["nfev"] = sol.nfev
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **fields)
+
+
+def start_run(label, **fields):
+    """
+    計測が有効であれば新しい実行を開始する関数
+
+    Returns:
+        RunTrace or None: 開始した実行．計測が無効の場合はNone
+    """
+    if _tracer is None:
+        return None
+    return _tracer.start_run(label, **fields)
+
+
+def current_run():
+    """
+    現在の実行を返す関数．計測が無効の場合や実行を開始していない場合はNone
+    """
+    return _tracer.current if _tracer is not None else None
+
+
+def finish_run():
+    """
+    計測が有効であれば現在の実行を終了して書き出す関数
+
+    Returns:
+        RunTrace or None: 終了した実行
+    """
+    if _tracer is None:
+        return None
+    return _tracer.finish_run()
+
+
+def trace_path_from_argv(argv):
+    """
+    コマンドライン引数に計測のフラグがあれば，JSON Linesの出力先を返す関数
+    フラグと出力先はargvから取り除く
+
+    Returns:
+        (bool, str or None): 計測するかどうかと出力先（出力先を省略した場合はNone）
+    """
+    if TRACE_FLAG not in argv:
+        return False, None
+    index = argv.index(TRACE_FLAG)
+    argv.pop(index)
+    if index < len(argv) and not argv[index].startswith("-"):
+        return True, argv.pop(index)
+    return True, None
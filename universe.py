@@ -1,33 +1,63 @@
 """メインの実行部分．"""
-import configparser
+import sys
+from startup import ImportProfiler
+# 起動時間を計測する場合は，他のモジュールを読み込む前に計測を始める
+PROFILER = ImportProfiler.from_argv(sys.argv)
+
 import PySimpleGUI as sg
 from guidesign import Widget
 from eventhandlers import EventHandlers
+import timing
+from worker import (
+    COMPARE_DONE_EVENT,
+    COMPUTE_CANCELLED_EVENT,
+    COMPUTE_DONE_EVENT,
+    COMPUTE_ERROR_EVENT,
+    COMPUTE_PROGRESS_EVENT,
+    PRECOMPUTE_DONE_EVENT,
+)
 
 
 def main():
     """
     メイン関数
     """
+    # --trace [出力先] を指定すると，起動時から所要時間を計測する
+    tracing, trace_path = timing.trace_path_from_argv(sys.argv)
+    if tracing:
+        timing.enable(trace_path)
     Widget.make_dpi_aware()
-    window = Widget.create_main_window()
-    config_ini = configparser.ConfigParser()
-
-    handlers = EventHandlers(window, config_ini)
+    window = Widget.create_main_window(tracing)
+    if PROFILER is not None:
+        PROFILER.report()
+    handlers = EventHandlers(window, trace_path=trace_path)
 
     while True:
-        event, values = window.read()
+        # ライブプレビューの予約があれば，その時刻にタイムアウトイベントを受け取る
+        event, values = window.read(timeout=handlers.preview.timeout())
+
+        if event == sg.WINDOW_CLOSED:
+            break
 
-        if event in (sg.WINDOW_CLOSED, '中止'):
+        if event == '中止':
+            # 計算中であれば計算だけを中止し，そうでなければアプリを終了する
+            if handlers.cancel_computation():
+                continue
             sg.popup_ok('中止しました。')
             break
 
-        if event == "-FILE-":
+        if event == sg.TIMEOUT_KEY:
+            handlers.handle_timeout_event(values)
+
+        elif event == "-FILE-":
             handlers.handle_file_event(values)
 
         elif event == "-MODEL-":
             handlers.handle_model_event(values)
 
+        elif event == "-MODEL-FILTER-":
+            handlers.handle_model_filter_event(values)
+
         elif event == "-SIGMA-":
             handlers.handle_sigma_event(values)
 
@@ -40,12 +70,44 @@ def main():
         elif event == "-Q-TEXT-":
             handlers.handle_q_text_event(values)
 
+        elif event == "-LIVE-PREVIEW-":
+            handlers.handle_live_preview_event(values)
+
+        elif event == "-TIMING-":
+            handlers.handle_timing_event(values)
+
         elif event == "実行":
             handlers.handle_execute_event(values)
 
         elif event == "グラフ表示":
             handlers.handle_plot_event(values)
 
+        elif event == "-COMPARE-ADD-":
+            handlers.handle_compare_add_event(values)
+
+        elif event == "-COMPARE-":
+            handlers.handle_compare_event(values)
+
+        elif event == COMPARE_DONE_EVENT:
+            handlers.handle_compare_done_event(values)
+
+        elif event == PRECOMPUTE_DONE_EVENT:
+            handlers.handle_precompute_done_event(values)
+
+        elif event == COMPUTE_PROGRESS_EVENT:
+            handlers.handle_compute_progress_event(values)
+
+        elif event == COMPUTE_DONE_EVENT:
+            handlers.handle_compute_done_event(values)
+
+        elif event == COMPUTE_CANCELLED_EVENT:
+            handlers.handle_compute_cancelled_event(values)
+
+        elif event == COMPUTE_ERROR_EVENT:
+            handlers.handle_compute_error_event(values)
+
+    handlers.close()
+    timing.disable()
     window.close()
 
 
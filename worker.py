@@ -0,0 +1,191 @@
+"""計算をバックグラウンドで実行するためのモジュール．
+
+計算は別スレッドで行い，結果や進捗は window.write_event_value でGUIのイベントループに送る．
+"""
+import itertools
+import threading
+from cache import calculate_with_cache
+
+# ワーカーからGUIのイベントループへ送るイベントのキー
+COMPUTE_DONE_EVENT = "-COMPUTE-DONE-"
+COMPUTE_PROGRESS_EVENT = "-COMPUTE-PROGRESS-"
+COMPUTE_CANCELLED_EVENT = "-COMPUTE-CANCELLED-"
+COMPUTE_ERROR_EVENT = "-COMPUTE-ERROR-"
+# 複数モデルの比較の計算が完了したときのイベントのキー（中止・失敗・進捗は上と共通）
+COMPARE_DONE_EVENT = "-COMPARE-DONE-"
+# 設定ファイルの全モデルの事前計算が完了したときのイベントのキー
+PRECOMPUTE_DONE_EVENT = "-PRECOMPUTE-DONE-"
+
+# 各段階が全体の進捗に占める範囲（開始, 終了）
+STAGE_RANGES = {
+    "future": (0.0, 0.45),
+    "past": (0.45, 0.9),
+    "rotate": (0.9, 1.0),
+    "compare": (0.0, 1.0),
+    "precompute": (0.0, 1.0),
+}
+
+# 計算の番号．複数のワーカーの番号が重ならないよう，すべてのワーカーで共有する
+_JOB_IDS = itertools.count(1)
+
+
+class ComputationCancelled(Exception):
+    """
+    計算が中止されたことを表す例外
+    """
+
+
+class ComputationWorker:
+    """
+    FriedmannEquationIntegratorの計算（または複数モデルの比較）を1件ずつバックグラウンドで実行するクラス
+
+    新しい計算を投入すると実行中の計算は中止され，その結果は破棄される．
+    """
+
+    def __init__(self, window, cache=None):
+        """
+        コンストラクタ
+        Args:
+            window: 結果を送るPySimpleGUIのウィンドウ
+            cache: 計算結果のキャッシュ（ResultCache）．Noneの場合はキャッシュを使わない
+        """
+        self.window = window
+        self.cache = cache
+        self.current_job = None
+        self.cancel_event = None
+        self.lock = threading.Lock()
+
+    def submit(self, instance):
+        """
+        計算を投入するメソッド．実行中の計算があれば中止する
+        Args:
+            instance: FriedmannEquationIntegratorのインスタンス
+
+        Returns:
+            int: 投入した計算の番号
+        """
+        def task(progress_callback):
+            instance.progress_callback = progress_callback
+            return calculate_with_cache(instance, self.cache)
+        return self._start(task, COMPUTE_DONE_EVENT)
+
+    def submit_comparison(self, comparison):
+        """
+        複数モデルの比較の計算を投入するメソッド．実行中の計算があれば中止する
+        完了するとCOMPARE_DONE_EVENTでComparisonResultを送る
+        Args:
+            comparison: ModelComparisonのインスタンス
+
+        Returns:
+            int: 投入した計算の番号
+        """
+        def task(progress_callback):
+            return comparison.compute(self.cache, progress_callback)
+        return self._start(task, COMPARE_DONE_EVENT)
+
+    def submit_precompute(self, catalog):
+        """
+        モデルの一覧のすべてのモデルを事前に計算してキャッシュに格納する計算を投入するメソッド
+        キャッシュにあるモデルは計算しない．実行中の計算があれば中止する
+        完了するとPRECOMPUTE_DONE_EVENTで (モデルの数, 新たに計算したモデルの数) を送る
+        Args:
+            catalog: ModelCatalogのインスタンス
+
+        Returns:
+            int: 投入した計算の番号
+        """
+        members = catalog.members()
+
+        def task(progress_callback):
+            from comparison import compute_members
+
+            _, computed = compute_members(members, self.cache,
+                                          progress_callback=progress_callback,
+                                          stage="precompute", keep_results=False)
+            return len(members), computed
+        return self._start(task, PRECOMPUTE_DONE_EVENT)
+
+    def _start(self, task, done_event):
+        """計算の番号を割り当て，別スレッドで計算を開始する"""
+        with self.lock:
+            if self.cancel_event is not None:
+                self.cancel_event.set()
+            job_id = next(_JOB_IDS)
+            cancel_event = threading.Event()
+            self.current_job = job_id
+            self.cancel_event = cancel_event
+        progress_callback = self._make_progress_callback(job_id, cancel_event)
+        thread = threading.Thread(target=self._run,
+                                  args=(job_id, task, progress_callback, cancel_event, done_event),
+                                  daemon=True)
+        thread.start()
+        return job_id
+
+    def cancel(self):
+        """
+        実行中の計算を中止するメソッド
+
+        Returns:
+            bool: 中止する計算があった場合はTrue
+        """
+        with self.lock:
+            if self.current_job is None:
+                return False
+            self.cancel_event.set()
+            self.current_job = None
+            self.cancel_event = None
+            return True
+
+    def is_running(self):
+        """
+        計算の実行中かどうかを返すメソッド
+        """
+        with self.lock:
+            return self.current_job is not None
+
+    def accept(self, job_id):
+        """
+        完了した計算の結果を受け取るかどうかを判定するメソッド
+        最新の計算の結果であれば受け取り，実行中の状態を解除する．古い計算の結果は破棄する
+        Args:
+            job_id: 完了した計算の番号
+
+        Returns:
+            bool: 結果を受け取る場合はTrue
+        """
+        with self.lock:
+            if job_id != self.current_job:
+                return False
+            self.current_job = None
+            self.cancel_event = None
+            return True
+
+    def _make_progress_callback(self, job_id, cancel_event):
+        """進捗をGUIに送り，中止されていれば例外を送出する関数を作る"""
+        last_percent = [-1]
+
+        def progress_callback(stage, fraction):
+            if cancel_event.is_set():
+                raise ComputationCancelled()
+            start, stop = STAGE_RANGES.get(stage, (0.0, 1.0))
+            percent = int(100 * (start + (stop - start) * fraction))
+            # イベントの送りすぎを避けるため，1%単位で変化したときだけ送る
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.window.write_event_value(COMPUTE_PROGRESS_EVENT, (job_id, percent))
+        return progress_callback
+
+    def _run(self, job_id, task, progress_callback, cancel_event, done_event):
+        """別スレッドで計算を実行し，結果をGUIのイベントとして送る"""
+        try:
+            result = task(progress_callback)
+        except ComputationCancelled:
+            self.window.write_event_value(COMPUTE_CANCELLED_EVENT, job_id)
+            return
+        except Exception as error:  # 計算中のあらゆる失敗をGUIに伝える
+            self.window.write_event_value(COMPUTE_ERROR_EVENT, (job_id, error))
+            return
+        if cancel_event.is_set():
+            self.window.write_event_value(COMPUTE_CANCELLED_EVENT, job_id)
+            return
+        self.window.write_event_value(done_event, (job_id, result))